@@ -146,3 +146,21 @@ CHATBOT_KNOWLEDGE_FILE = BASE_DIR / 'data' / 'productos_bronz.txt'
 
 # Permitir iframes desde cualquier origen (para Vista Previa del sandbox)
 X_FRAME_OPTIONS = 'ALLOWALL'
+
+# Libro unificado (union_debitos / union_creditos)
+# 'tabla' (default, sirve en SQLite) o 'vista_materializada' (solo PostgreSQL,
+# instalar con: python manage.py vistas_materializadas crear)
+BRONZ_UNION_BACKEND = os.getenv('BRONZ_UNION_BACKEND', 'tabla')
+
+# Trabajos en segundo plano (procesar_todo, regeneraciones del admin, …)
+# 'hilo' (default): un pool de hilos dentro del proceso web los ejecuta.
+# 'worker': solo se encolan; los ejecuta `python manage.py trabajos_worker`.
+BRONZ_TRABAJOS_MODO = os.getenv('BRONZ_TRABAJOS_MODO', 'hilo')
+
+# Cada escritura (rango sucio) encola la regeneración y los snapshots de reportes;
+# las vistas sirven el último snapshot y solo regeneran con ?refrescar=1.
+BRONZ_REGENERAR_EN_FONDO = os.getenv('BRONZ_REGENERAR_EN_FONDO', '1') == '1'
+
+# Hilos para las etapas independientes de la regeneración (bronz_app.etapas).
+# Solo se usan con PostgreSQL; en SQLite las etapas corren en orden.
+BRONZ_ETAPAS_HILOS = int(os.getenv('BRONZ_ETAPAS_HILOS', '4'))
@@ -2,16 +2,41 @@ from django.contrib import admin
 from django.urls import path
 from django.shortcuts import redirect
 from django.contrib import messages
-from bronz_app.utils import regenerar_ventas_consulta
 from bronz_app.models import MovimientoUnificadoCredito, MovimientoUnificadoDebito, AjusteInventario
-from bronz_app.models import ResumenCredito, ResumenDebito
+from bronz_app.models import (
+    ComponenteKit,
+    CostoPromedio,
+    CuboCuentaMes,
+    CuentaPlan,
+    Kit,
+    MovimientoStock,
+    ResumenCredito,
+    ResumenDebito,
+    RollupCuentaMes,
+    SaldoDiario,
+    StockUbicacion,
+)
 from .models import Inventario, InvEP, InvVP, InvEPVP
-from bronz_app.utils import regenerar_resumenes_credito_debito
 from .models import AsientosContables, Envios, EntradaProductos, Catalogo
 from .models import OtrosGastos, SueldosHonorarios, BalanceInicial, InventarioInicial, Ventas, VentasConsulta
 #from .models import InventarioActual
 from django.db import models
 from bronz_app.admin_export_excel_mixin import ExportExcelMixin
+from django.db.models import Min, Max
+from bronz_app.rangos_sucios import marcar_rango_sucio
+from bronz_app.trabajos import encolar
+
+
+@admin.action(description="🔁 Marcar fechas para regenerar el libro")
+def marcar_para_regenerar(modeladmin, request, queryset):
+    rango = queryset.aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+    marcar_rango_sucio(rango['desde'], rango['hasta'], modeladmin.model._meta.db_table)
+    modeladmin.message_user(
+        request,
+        f"✅ Fechas {rango['desde']} → {rango['hasta']} marcadas para regenerar.",
+        level=messages.SUCCESS
+    )
+
 
 @admin.register(AsientosContables)
 class AsientosContablesAdmin(ExportExcelMixin, admin.ModelAdmin):
@@ -19,6 +44,7 @@ class AsientosContablesAdmin(ExportExcelMixin, admin.ModelAdmin):
     list_filter = ('fecha',)
     search_fields = ('cuenta_debito', 'cuenta_credito')
     ordering = ('-fecha',)  # más reciente → más antigua
+    actions = [marcar_para_regenerar]
     
     # Opcionalmente, puedes definir campos a exportar:
     # export_excel_fields = ('id', 'fecha', 'monto', ...)
@@ -53,6 +79,7 @@ class EntradaProductosAdmin(ExportExcelMixin,admin.ModelAdmin):
     )
     list_filter = ('documento_anticipo', 'fecha')
     ordering = ('-fecha',)  # más reciente → más antigua
+    actions = [marcar_para_regenerar]
     search_fields = ('sku__sku',)  # permite buscar por valor de SKU
 
     # Para que los campos calculados aparezcan en el formulario como sólo lectura:
@@ -108,6 +135,7 @@ class OtrosGastosAdmin(ExportExcelMixin, admin.ModelAdmin):
     search_fields = ('otros_gastos', 'comentario')
     list_filter = ('otros_gastos', 'fecha')
     ordering = ('-fecha',)  # más reciente → más antigua
+    actions = [marcar_para_regenerar]
 
 
 @admin.register(SueldosHonorarios)
@@ -115,6 +143,7 @@ class SueldosHonorariosAdmin(admin.ModelAdmin):
     list_display = ('fecha', 'tipo_remuneracion', 'nombre', 'monto_total_pagado','comentario')
     list_filter = ('tipo_remuneracion', 'fecha')
     ordering = ('-fecha',)  # más reciente → más antigua
+    actions = [marcar_para_regenerar]
     readonly_fields = (
         'debito', 'credito', 'credito2', 
         'cuenta_debito', 'cuenta_credito', 'cuenta_credito2',
@@ -127,6 +156,7 @@ class BalanceInicialAdmin(ExportExcelMixin, admin.ModelAdmin):
     search_fields = ('comentario',)
     list_filter = ('fecha',)
     ordering = ('-fecha',)  # más reciente → más antigua
+    actions = [marcar_para_regenerar]
 
 @admin.register(InventarioInicial)
 class InventarioInicialAdmin(ExportExcelMixin, admin.ModelAdmin):
@@ -202,6 +232,7 @@ class VentasAdmin(ExportExcelMixin, admin.ModelAdmin):
     list_filter = ('fecha', 'comprador','sku__sku', 'sku__producto', 'sku__categoria')
     search_fields = ('numero_pedido', 'comprador', 'sku__sku', 'sku__producto', 'sku__categoria')
     ordering = ('-fecha',)  # más reciente → más antigua
+    actions = [marcar_para_regenerar]
 
 @admin.register(VentasConsulta)
 class VentasConsultaAdmin(ExportExcelMixin, admin.ModelAdmin):
@@ -216,8 +247,8 @@ class VentasConsultaAdmin(ExportExcelMixin, admin.ModelAdmin):
     actions = ['regenerar_tabla']
 
     def regenerar_tabla(self, request, queryset):
-        total = regenerar_ventas_consulta()
-        self.message_user(request, f"✅ Regenerado con éxito: {total} registros.", level=messages.SUCCESS)
+        trabajo = encolar('ventas_consulta', usuario=request.user)
+        self.message_user(request, f"⏳ Trabajo #{trabajo.pk} en cola: regenerar VentasConsulta.", level=messages.INFO)
 
     regenerar_tabla.short_description = "🔁 Regenerar tabla VentasConsulta"
 
@@ -236,23 +267,78 @@ class MovimientoUnificadoDebitoAdmin(ExportExcelMixin,admin.ModelAdmin):
 
 @admin.register(ResumenCredito)
 class ResumenCreditoAdmin(ExportExcelMixin,admin.ModelAdmin):
-    list_display = ['cuenta_credito', 'total_credito']
-    ordering = ['cuenta_credito']
+    list_display = ['anio', 'mes', 'cuenta_credito', 'total_credito']
+    list_filter = ['anio', 'mes']
+    ordering = ['anio', 'mes', 'cuenta_credito']
     actions = ['regenerar_resumen']
 
     def regenerar_resumen(self, request, queryset):
-        total_creditos, total_debitos = regenerar_resumenes_credito_debito()
-        self.message_user(
-            request,
-            f"✅ Resúmenes regenerados: {total_creditos} créditos y {total_debitos} débitos.",
-            level=messages.SUCCESS
-        )
+        trabajo = encolar('resumenes', usuario=request.user)
+        self.message_user(request, f"⏳ Trabajo #{trabajo.pk} en cola: regenerar resúmenes.", level=messages.INFO)
     regenerar_resumen.short_description = "🔁 Regenerar Resumen Crédito/Débito"
 
 @admin.register(ResumenDebito)
 class ResumenDebitoAdmin(ExportExcelMixin,admin.ModelAdmin):
-    list_display = ['cuenta_debito', 'total_debito']
-    ordering = ['cuenta_debito']
+    list_display = ['anio', 'mes', 'cuenta_debito', 'total_debito']
+    list_filter = ['anio', 'mes']
+    ordering = ['anio', 'mes', 'cuenta_debito']
+
+@admin.register(SaldoDiario)
+class SaldoDiarioAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['fecha', 'cuenta', 'debito_dia', 'credito_dia', 'debito_acum', 'credito_acum']
+    list_filter = ['fecha']
+    search_fields = ['cuenta']
+    ordering = ['cuenta', 'fecha']
+
+@admin.register(CuboCuentaMes)
+class CuboCuentaMesAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['anio', 'mes', 'cuenta', 'debito', 'credito', 'n_debitos', 'n_creditos']
+    list_filter = ['anio', 'mes']
+    search_fields = ['cuenta']
+    ordering = ['anio', 'mes', 'cuenta']
+
+@admin.register(CuentaPlan)
+class CuentaPlanAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['prefijo', 'nivel', 'nombre', 'padre']
+    list_filter = ['nivel']
+    search_fields = ['prefijo', 'nombre']
+
+@admin.register(RollupCuentaMes)
+class RollupCuentaMesAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['anio', 'mes', 'nodo', 'debito', 'credito', 'n_movimientos']
+    list_filter = ['anio', 'mes', 'nodo__nivel']
+    search_fields = ['nodo__prefijo', 'nodo__nombre']
+    ordering = ['anio', 'mes', 'nodo__prefijo']
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['fecha', 'sku', 'ubicacion', 'cantidad', 'tabla_origen', 'id_origen', 'creado']
+    list_filter = ['ubicacion', 'tabla_origen']
+    search_fields = ['sku']
+    ordering = ['sku', 'fecha', 'id']
+
+@admin.register(StockUbicacion)
+class StockUbicacionAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['sku', 'ubicacion', 'cantidad']
+    list_filter = ['ubicacion']
+    search_fields = ['sku']
+    ordering = ['sku', 'ubicacion']
+
+@admin.register(CostoPromedio)
+class CostoPromedioAdmin(ExportExcelMixin,admin.ModelAdmin):
+    list_display = ['sku', 'fecha', 'stock_previo', 'cantidad', 'costo_entradas', 'costo_promedio']
+    search_fields = ['sku']
+    ordering = ['sku', 'fecha']
+
+class ComponenteKitInline(admin.TabularInline):
+    model = ComponenteKit
+    extra = 1
+
+@admin.register(Kit)
+class KitAdmin(admin.ModelAdmin):
+    list_display = ['sku', 'descuenta_stock_propio']
+    search_fields = ['sku__sku', 'componentes__componente__sku']
+    inlines = [ComponenteKitInline]
 
 @admin.register(AjusteInventario)
 class AjusteInventarioAdmin(ExportExcelMixin,admin.ModelAdmin):
@@ -285,6 +371,7 @@ from .models import (
 
 from django.urls import path  # Añade esto si no lo tienes
 from django.db import models  # Asegúrate de importar models
+from .stock import anotar_stock
 
 @admin.register(inventarioactualproxy)
 class inventarioactualadmin(admin.ModelAdmin):
@@ -298,54 +385,46 @@ class inventarioactualadmin(admin.ModelAdmin):
     search_fields = ('sku', 'categoria', 'producto')
     change_list_template = "admin/bronz_app/inventarioactualproxy/change_list.html"
 
-    # Tus métodos originales...
+    # Todas las columnas vienen anotadas en una sola consulta (bronz_app.stock);
+    # en_oficina, en_bodega y total se leen del libro de stock.
+    def get_queryset(self, request):
+        return anotar_stock(super().get_queryset(request))
+
+    @admin.display(description="Inicial", ordering='inicial')
     def stock_display(self, obj):
-        ini = InventarioInicial.objects.filter(sku=obj.sku).first()
-        return ini.stock if ini else 0
-    stock_display.short_description = "Inicial"
+        return obj.inicial
 
+    @admin.display(description="Bodega", ordering='bodega')
     def bodega_display(self, obj):
-        ini = InventarioInicial.objects.filter(sku=obj.sku).first()
-        return ini.bodega if ini else 0
-    bodega_display.short_description = "Bodega"
+        return obj.bodega
 
+    @admin.display(description="Ingresos", ordering='ingresos')
     def ingresos_display(self, obj):
-        return EntradaProductos.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad_ingresada'))['total'] or 0
-    ingresos_display.short_description = "Ingresos"
+        return obj.ingresos
 
+    @admin.display(description="Envios", ordering='enviado')
     def envios_display(self, obj):
-        return Envios.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-    envios_display.short_description = "Envios"
+        return obj.enviado
 
+    @admin.display(description="Ventas", ordering='vendido')
     def ventas_display(self, obj):
-        return Ventas.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-    ventas_display.short_description = "Ventas"
+        return obj.vendido
 
+    @admin.display(description="Ajustes", ordering='ajustes')
     def ajustes_display(self, obj):
-        return AjusteInventario.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-    ajustes_display.short_description = "Ajustes"
+        return obj.ajustes
 
-    # ——— NUEVOS MÉTODOS CALCULADOS ———
+    @admin.display(description="En Oficina", ordering='en_oficina')
     def en_oficina_display(self, obj):
-        inicial = self.stock_display(obj)
-        ingresos = self.ingresos_display(obj)
-        envios = self.envios_display(obj)
-        return inicial + ingresos - envios
-    en_oficina_display.short_description = "En Oficina"
+        return obj.en_oficina
 
+    @admin.display(description="En Bodega", ordering='en_bodega')
     def en_bodega_display(self, obj):
-        bodega = self.bodega_display(obj)
-        envios = self.envios_display(obj)
-        ventas = self.ventas_display(obj)
-        return bodega + envios - ventas
-    en_bodega_display.short_description = "En Bodega"
+        return obj.en_bodega
 
+    @admin.display(description="Total", ordering='total')
     def total_display(self, obj):
-        en_oficina = self.en_oficina_display(obj)
-        en_bodega = self.en_bodega_display(obj)
-        ajustes = self.ajustes_display(obj)
-        return en_oficina + en_bodega - ajustes
-    total_display.short_description = "Total"
+        return obj.total
 
     def get_urls(self):
         urls = super().get_urls()
@@ -359,7 +438,7 @@ class inventarioactualadmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def exportar_excel_view(self, request):
-        queryset = Catalogo.objects.all()
+        queryset = anotar_stock(Catalogo.objects.order_by('id'))
         wb = Workbook()
         ws = wb.active
         ws.title = "Inventario Actual"
@@ -489,4 +568,46 @@ class ShopifyOrderAdmin(ExportExcelMixin, admin.ModelAdmin):
         ('Metadatos', {
             'fields': ('imported_at',)
         }),
-    )
\ No newline at end of file
+    )
+
+# ——————————————————————————————————————————————————————————————
+# Admin: RangoSucio (fechas pendientes de regenerar)
+# ——————————————————————————————————————————————————————————————
+
+from .models import RangoSucio
+
+@admin.register(RangoSucio)
+class RangoSucioAdmin(admin.ModelAdmin):
+    list_display = ('tabla_origen', 'fecha_desde', 'fecha_hasta', 'creado')
+    list_filter = ('tabla_origen',)
+    ordering = ('-creado',)
+
+# ——————————————————————————————————————————————————————————————
+# Admin: MetricaRegeneracion (coordinador de regeneración)
+# ——————————————————————————————————————————————————————————————
+
+from .models import MetricaRegeneracion
+
+@admin.register(MetricaRegeneracion)
+class MetricaRegeneracionAdmin(admin.ModelAdmin):
+    list_display = ('ejecutadas', 'coalescidas', 'sin_cambios', 'espera_total_ms', 'ultima_duracion_ms', 'actualizado')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# ——————————————————————————————————————————————————————————————
+# Admin: TrabajoFondo (cola de trabajos en segundo plano)
+# ——————————————————————————————————————————————————————————————
+
+from .models import TrabajoFondo
+
+@admin.register(TrabajoFondo)
+class TrabajoFondoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'progreso', 'usuario', 'creado', 'iniciado', 'terminado', 'worker')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('mensaje',)
+    readonly_fields = ('iniciado', 'terminado', 'worker')
+    ordering = ('-creado',)
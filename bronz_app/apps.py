@@ -3,4 +3,14 @@ from django.apps import AppConfig
 class BronzAppConfig(AppConfig):
     name = 'bronz_app'
 
-    
+    def ready(self):
+        from bronz_app.rangos_sucios import conectar_senales
+        conectar_senales()
+        from bronz_app.libro_stock import conectar_senales as conectar_senales_stock
+        conectar_senales_stock()
+        from bronz_app.costo_promedio import conectar_senales as conectar_senales_costo
+        conectar_senales_costo()
+        from bronz_app.kits import conectar_senales as conectar_senales_kits
+        conectar_senales_kits()
+        # Compila los planes de fórmulas al arrancar: ciclos o líneas inexistentes fallan aquí
+        from bronz_app import eerr, utils_financiero  # noqa: F401
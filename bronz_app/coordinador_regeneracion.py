@@ -0,0 +1,192 @@
+import os
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+from bronz_app.models import MetricaRegeneracion, RangoSucio
+from bronz_app.utils import regenerar_rangos_sucios
+
+# Clave del advisory lock de PostgreSQL (entero de 32 bits estable entre procesos)
+CLAVE_CANDADO = zlib.crc32(b'bronz_app.regeneracion')
+
+_local = threading.local()
+
+
+# ——————————————————————————————————————————————————————————————
+# CANDADO DEL PIPELINE
+# ——————————————————————————————————————————————————————————————
+
+def _ruta_archivo_candado(alias):
+    ruta = getattr(settings, 'BRONZ_REGENERACION_LOCK', None)
+    if ruta:
+        return str(ruta)
+    nombre_db = str(settings.DATABASES[alias].get('NAME', alias))
+    return os.path.join(tempfile.gettempdir(), f'bronz_regeneracion_{zlib.crc32(nombre_db.encode()):08x}.lock')
+
+
+class CandadoPipeline:
+    """
+    Candado entre procesos para la regeneración de tablas derivadas.
+    PostgreSQL: pg_advisory_lock de sesión. Otros motores (SQLite): flock sobre un archivo.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self.connection = connections[alias]
+        self._archivo = None
+
+    def adquirir(self, bloquear=True):
+        if self.connection.vendor == 'postgresql':
+            funcion = 'pg_advisory_lock' if bloquear else 'pg_try_advisory_lock'
+            with self.connection.cursor() as cursor:
+                cursor.execute(f'SELECT {funcion}(%s)', [CLAVE_CANDADO])
+                fila = cursor.fetchone()
+            return True if bloquear else bool(fila[0])
+        return self._adquirir_archivo(bloquear)
+
+    def liberar(self):
+        if self.connection.vendor == 'postgresql':
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [CLAVE_CANDADO])
+            return
+        self._liberar_archivo()
+
+    def _adquirir_archivo(self, bloquear):
+        archivo = open(_ruta_archivo_candado(self.alias), 'a+b')
+        try:
+            _bloquear_archivo(archivo, bloquear)
+        except OSError:
+            archivo.close()
+            return False
+        self._archivo = archivo
+        return True
+
+    def _liberar_archivo(self):
+        if self._archivo is None:
+            return
+        try:
+            _desbloquear_archivo(self._archivo)
+        finally:
+            self._archivo.close()
+            self._archivo = None
+
+
+try:
+    import fcntl
+
+    def _bloquear_archivo(archivo, bloquear):
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX if bloquear else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _desbloquear_archivo(archivo):
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _bloquear_archivo(archivo, bloquear):
+        archivo.seek(0)
+        while True:
+            try:
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if not bloquear:
+                    raise
+                time.sleep(0.1)
+
+    def _desbloquear_archivo(archivo):
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ——————————————————————————————————————————————————————————————
+# MÉTRICAS
+# ——————————————————————————————————————————————————————————————
+
+def _registrar(campo, espera_ms, duracion_ms):
+    cambios = {
+        campo: F(campo) + 1,
+        'espera_total_ms': F('espera_total_ms') + espera_ms,
+    }
+    if campo == 'ejecutadas':
+        cambios['ultima_duracion_ms'] = duracion_ms
+    if not MetricaRegeneracion.objects.filter(pk=1).update(**cambios):
+        MetricaRegeneracion.objects.get_or_create(pk=1)
+        MetricaRegeneracion.objects.filter(pk=1).update(**cambios)
+
+
+def metricas_regeneracion():
+    """Contadores acumulados del coordinador como dict."""
+    metrica = MetricaRegeneracion.objects.filter(pk=1).first() or MetricaRegeneracion()
+    return {
+        'ejecutadas': metrica.ejecutadas,
+        'coalescidas': metrica.coalescidas,
+        'sin_cambios': metrica.sin_cambios,
+        'espera_total_ms': metrica.espera_total_ms,
+        'ultima_duracion_ms': metrica.ultima_duracion_ms,
+        'ultimas_etapas': metrica.ultimas_etapas,
+        'actualizado': metrica.actualizado.isoformat() if metrica.actualizado else None,
+        'pendientes': RangoSucio.objects.count(),
+    }
+
+
+# ——————————————————————————————————————————————————————————————
+# REGENERACIÓN COORDINADA
+# ——————————————————————————————————————————————————————————————
+
+@contextmanager
+def candado_regeneracion(alias='default'):
+    """
+    Ejecuta el bloque con el candado del pipeline tomado (reentrante en el mismo hilo).
+    Entrega True si tuvo que esperar a que otro proceso terminara.
+    """
+    if getattr(_local, 'dentro', False):
+        yield False
+        return
+
+    candado = CandadoPipeline(alias)
+    espero = not candado.adquirir(bloquear=False)
+    if espero:
+        candado.adquirir(bloquear=True)
+    _local.dentro = True
+    try:
+        yield espero
+    finally:
+        _local.dentro = False
+        candado.liberar()
+
+
+def regenerar_coordinado(alias='default'):
+    """
+    Punto de entrada único para regenerar las tablas derivadas desde las vistas.
+    - Sin rangos sucios: lectura pura, no toma el candado.
+    - Si otro proceso ya está regenerando, espera a que termine y reutiliza su
+      trabajo: al tomar el candado ya no quedan rangos pendientes (coalescida).
+    Devuelve la lista de rangos regenerados por esta llamada.
+    """
+    if getattr(_local, 'dentro', False):
+        return regenerar_rangos_sucios()
+    if not RangoSucio.objects.exists():
+        return []
+
+    t0 = time.monotonic()
+    with candado_regeneracion(alias) as espero:
+        espera_ms = int((time.monotonic() - t0) * 1000)
+        t1 = time.monotonic()
+        rangos = regenerar_rangos_sucios()
+    duracion_ms = int((time.monotonic() - t1) * 1000)
+
+    if rangos:
+        campo = 'ejecutadas'
+    elif espero:
+        campo = 'coalescidas'
+    else:
+        campo = 'sin_cambios'
+    _registrar(campo, espera_ms, duracion_ms)
+    return rangos
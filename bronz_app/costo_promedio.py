@@ -0,0 +1,269 @@
+# bronz_app/costo_promedio.py
+
+import threading
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from bronz_app.models import Catalogo, CostoPromedio, EntradaProductos, MovimientoStock, VentasConsulta
+from bronz_app.rangos_sucios import al_cerrar_lote, en_lote, marcar_rango_sucio
+
+CENTAVO = Decimal('0.01')
+_DECIMAL = DecimalField(max_digits=12, decimal_places=2)
+
+# {sku: desde} pedidos dentro de agrupar_rangos_sucios(), por hilo
+_pendientes = threading.local()
+
+
+# ——————————————————————————————————————————————————————————————
+# LECTURA: COSTO VIGENTE A UNA FECHA
+# ——————————————————————————————————————————————————————————————
+
+def costo_vigente(sku, fecha):
+    """
+    Subconsulta: costo promedio del SKU vigente en `fecha` (OuterRef o
+    expresiones), la última fila con fecha <= `fecha` por el índice (sku, fecha).
+    NULL antes de la primera entrada: combinar con el costo de apertura del Catálogo.
+    """
+    return Subquery(
+        CostoPromedio.objects.filter(sku=sku, fecha__lte=fecha)
+        .order_by('-fecha')
+        .values('costo_promedio')[:1],
+        output_field=_DECIMAL,
+    )
+
+
+def costos_al(fecha, skus=None):
+    """{sku: costo vigente en `fecha`} del Catálogo (o de los SKUs dados), en una consulta."""
+    qs = Catalogo.objects.all()
+    if skus is not None:
+        qs = qs.filter(sku__in=list(skus))
+    return dict(
+        qs.annotate(costo=Coalesce(costo_vigente(OuterRef('sku'), Value(fecha)), F('costo_promedio_neto')))
+        .values_list('sku', 'costo')
+    )
+
+
+# ——————————————————————————————————————————————————————————————
+# CÁLCULO INCREMENTAL POR SKU
+# ——————————————————————————————————————————————————————————————
+
+def _historial(skus, desde):
+    """
+    Filas de costo_promedio de `skus` con fecha >= desde (None: desde el inicio).
+    Parte del último costo anterior a `desde` (o el del Catálogo) y del stock
+    del libro a esa fecha; en cada día con entradas:
+        promedio = (stock_previo × promedio + costo_entradas) / (stock_previo + cantidad)
+    con stock_previo = existencias al cierre del día anterior (0 si es negativo).
+    """
+    costo = dict(Catalogo.objects.filter(sku__in=skus).values_list('sku', 'costo_promedio_neto'))
+    stock = defaultdict(int)
+    entradas = EntradaProductos.objects.filter(sku__in=skus, cantidad_ingresada__gt=0)
+    movimientos = MovimientoStock.objects.filter(sku__in=skus)
+    if desde is not None:
+        previos = CostoPromedio.objects.filter(sku__in=skus, fecha__lt=desde).order_by('sku', 'fecha')
+        costo.update(previos.values_list('sku', 'costo_promedio'))  # queda el último de cada SKU
+        stock.update(movimientos.filter(fecha__lt=desde).values_list('sku').annotate(total=Sum('cantidad')).order_by())
+        entradas = entradas.filter(fecha__gte=desde)
+        movimientos = movimientos.filter(fecha__gte=desde)
+
+    entradas_por_dia = defaultdict(list)
+    filas_entradas = (
+        entradas.values_list('sku', 'fecha')
+        .annotate(cantidad=Sum('cantidad_ingresada'), costo=Sum('costo_neto'))
+        .order_by('sku', 'fecha')
+    )
+    for sku, fecha, cantidad, costo_entradas in filas_entradas:
+        entradas_por_dia[sku].append((fecha, cantidad, costo_entradas or Decimal('0')))
+
+    movimientos_por_dia = defaultdict(list)
+    filas_movimientos = movimientos.values_list('sku', 'fecha').annotate(total=Sum('cantidad')).order_by('sku', 'fecha')
+    for sku, fecha, total in filas_movimientos:
+        movimientos_por_dia[sku].append((fecha, total))
+
+    filas = []
+    for sku, dias in entradas_por_dia.items():
+        promedio = Decimal(costo.get(sku) or 0)
+        saldo = stock[sku]
+        movimientos_sku = movimientos_por_dia[sku]
+        i = 0
+        for fecha, cantidad, costo_entradas in dias:
+            while i < len(movimientos_sku) and movimientos_sku[i][0] < fecha:
+                saldo += movimientos_sku[i][1]
+                i += 1
+            previo = max(saldo, 0)
+            promedio = ((previo * promedio + costo_entradas) / (previo + cantidad)).quantize(CENTAVO)
+            filas.append(CostoPromedio(
+                sku=sku, fecha=fecha, stock_previo=saldo, cantidad=cantidad,
+                costo_entradas=costo_entradas, costo_promedio=promedio,
+            ))
+    return filas
+
+
+def _recostear_ventas(cambios):
+    """
+    Actualiza costo_promedio_neto y costo_venta de VentasConsulta solo para las
+    ventas de cada SKU desde la fecha en que cambió su costo (búsqueda indexada
+    por (codigo_producto, fecha)) y marca esas fechas para las uniones.
+    """
+    from bronz_app.utils import incrementar_version_libro
+
+    apertura = dict(Catalogo.objects.filter(sku__in=list(cambios)).values_list('sku', 'costo_promedio_neto'))
+    actualizadas = 0
+    for sku, desde in cambios.items():
+        ventas = VentasConsulta.objects.filter(codigo_producto=sku, fecha__gte=desde)
+        hasta = ventas.aggregate(hasta=Max('fecha'))['hasta']
+        if hasta is None:
+            continue
+        costo = Coalesce(
+            costo_vigente(OuterRef('codigo_producto'), OuterRef('fecha')),
+            Value(apertura.get(sku) or Decimal('0'), output_field=_DECIMAL),
+        )
+        actualizadas += ventas.update(costo_promedio_neto=costo, costo_venta=costo * F('cantidad'))
+        # Las uniones leen costo_venta de VentasConsulta: esas fechas se regeneran en la próxima pasada
+        marcar_rango_sucio(desde, hasta, CostoPromedio._meta.db_table)
+    if actualizadas:
+        incrementar_version_libro()
+    return actualizadas
+
+
+def recalcular_costos(desde_por_sku=None, recostear_ventas=True):
+    """
+    Recalcula costo_promedio de los SKUs {sku: desde} (desde=None: toda su
+    historia; sin argumento: todos los SKUs) y reescribe solo las filas que
+    cambian. Si cambia el costo, re-costea las ventas posteriores de ese SKU.
+    Devuelve {sku: primera fecha con costo distinto}. Dentro de
+    agrupar_rangos_sucios() los SKUs se acumulan y se recalculan una vez al
+    cierre del bloque (devuelve {}).
+    """
+    if desde_por_sku is not None and en_lote():
+        pendientes = getattr(_pendientes, 'desde', None)
+        if pendientes is None:
+            pendientes = _pendientes.desde = {}
+        for sku, desde in desde_por_sku.items():
+            desde = _a_fecha(desde)
+            previo = pendientes.get(sku, desde)
+            pendientes[sku] = None if desde is None or previo is None else min(desde, previo)
+        return {}
+    return _recalcular_costos(desde_por_sku, recostear_ventas)
+
+
+def _recalcular_pendientes():
+    pendientes, _pendientes.desde = getattr(_pendientes, 'desde', None), None
+    if pendientes:
+        _recalcular_costos(pendientes)
+
+
+al_cerrar_lote(_recalcular_pendientes, orden=20)
+
+
+def _recalcular_costos(desde_por_sku, recostear_ventas=True):
+    if desde_por_sku is None:
+        skus = set(EntradaProductos.objects.values_list('sku', flat=True).distinct())
+        skus |= set(CostoPromedio.objects.values_list('sku', flat=True).distinct())
+        desde_por_sku = dict.fromkeys(skus)
+    if not desde_por_sku:
+        return {}
+    skus = list(desde_por_sku)
+    fechas = [_a_fecha(d) for d in desde_por_sku.values()]
+    desde = None if None in fechas else min(fechas)
+
+    with transaction.atomic():
+        nuevas = defaultdict(dict)
+        for fila in _historial(skus, desde):
+            nuevas[fila.sku][fila.fecha] = fila
+        actuales = defaultdict(dict)
+        qs = CostoPromedio.objects.filter(sku__in=skus)
+        if desde is not None:
+            qs = qs.filter(fecha__gte=desde)
+        for sku, fecha, *valores in qs.values_list(
+            'sku', 'fecha', 'stock_previo', 'cantidad', 'costo_entradas', 'costo_promedio',
+        ):
+            actuales[sku][fecha] = tuple(valores)
+
+        reescribir, cambios = {}, {}
+        for sku in skus:
+            antes = actuales[sku]
+            despues = {
+                fecha: (f.stock_previo, f.cantidad, f.costo_entradas, f.costo_promedio)
+                for fecha, f in nuevas[sku].items()
+            }
+            distintas = [fecha for fecha in set(antes) | set(despues) if antes.get(fecha) != despues.get(fecha)]
+            if not distintas:
+                continue
+            reescribir[sku] = min(distintas)
+            costo_distinto = [
+                fecha for fecha in distintas
+                if (antes.get(fecha) or (None,) * 4)[3] != (despues.get(fecha) or (None,) * 4)[3]
+            ]
+            if costo_distinto:
+                cambios[sku] = min(costo_distinto)
+
+        if reescribir:
+            borrar = Q()
+            for sku, fecha in reescribir.items():
+                borrar |= Q(sku=sku, fecha__gte=fecha)
+            CostoPromedio.objects.filter(borrar).delete()
+            CostoPromedio.objects.bulk_create(
+                [f for sku, fecha in reescribir.items() for f in nuevas[sku].values() if f.fecha >= fecha],
+                batch_size=2000,
+            )
+        if cambios and recostear_ventas:
+            _recostear_ventas(cambios)
+    return cambios
+
+
+def primera_fecha_por_sku(movimientos):
+    """{sku: fecha más antigua} de filas MovimientoStock recién agregadas al libro."""
+    desde = {}
+    for m in movimientos:
+        desde[m.sku] = min(m.fecha, desde.get(m.sku, m.fecha))
+    return desde
+
+
+# ——————————————————————————————————————————————————————————————
+# SEÑALES (las cantidades llegan por el libro de stock; aquí, costos y SKU/fecha de entradas)
+# ——————————————————————————————————————————————————————————————
+
+def _a_fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _antes_de_guardar_entrada(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._costo_anterior = sender.objects.filter(pk=instance.pk).values_list('sku', 'fecha').first()
+
+
+def _despues_de_guardar_entrada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    desde = {instance.sku_id: _a_fecha(instance.fecha)}
+    anterior = getattr(instance, '_costo_anterior', None)
+    if anterior:
+        sku, fecha = anterior
+        desde[sku] = min(fecha, desde.get(sku, fecha))
+    recalcular_costos(desde)
+
+
+def _despues_de_borrar_entrada(sender, instance, **kwargs):
+    recalcular_costos({instance.sku_id: _a_fecha(instance.fecha)})
+
+
+def _catalogo_guardado(sender, instance, raw=False, **kwargs):
+    # Otro costo de apertura cambia toda la historia del SKU
+    if raw:
+        return
+    recalcular_costos({instance.sku: None})
+
+
+def conectar_senales():
+    pre_save.connect(_antes_de_guardar_entrada, sender=EntradaProductos, dispatch_uid='costo_promedio_EntradaProductos_pre')
+    post_save.connect(_despues_de_guardar_entrada, sender=EntradaProductos, dispatch_uid='costo_promedio_EntradaProductos_post')
+    post_delete.connect(_despues_de_borrar_entrada, sender=EntradaProductos, dispatch_uid='costo_promedio_EntradaProductos_del')
+    post_save.connect(_catalogo_guardado, sender=Catalogo, dispatch_uid='costo_promedio_Catalogo')
@@ -0,0 +1,91 @@
+# bronz_app/cubo.py
+
+import calendar
+
+from django.db.models import Count, Q, Sum
+
+from bronz_app.models import CuboCuentaMes, MovimientoUnificadoCredito, MovimientoUnificadoDebito
+from bronz_app.utils import _q_periodos
+
+
+# ——————————————————————————————————————————————————————————————
+# LECTURA DEL CUBO CUENTA × MES
+# Los reportes leen cubo_cuenta_mes (a lo más 12 × cuentas filas por año)
+# en vez de recorrer union_debitos / union_creditos.
+# ——————————————————————————————————————————————————————————————
+
+def es_meses_completos(desde, hasta):
+    """True si [desde, hasta] empieza el día 1 y termina el último día de un mes."""
+    return desde.day == 1 and hasta.day == calendar.monthrange(hasta.year, hasta.month)[1]
+
+
+def filtro_meses(desde, hasta):
+    """Filtro (anio, mes) del cubo para los meses entre las fechas desde y hasta."""
+    return _q_periodos(desde, hasta)
+
+
+def cubo(anio=None, hasta_mes=None, desde=None, hasta=None, cuentas=None):
+    """
+    QuerySet de CuboCuentaMes. Un año (opcionalmente hasta el mes `hasta_mes`),
+    o los meses que tocan [desde, hasta]. Sin filtros, todos los años.
+    """
+    filtro = Q()
+    if anio is not None:
+        filtro &= Q(anio=anio)
+        if hasta_mes is not None:
+            filtro &= Q(mes__lte=hasta_mes)
+    if desde is not None and hasta is not None:
+        filtro &= filtro_meses(desde, hasta)
+    if cuentas is not None:
+        filtro &= Q(cuenta__in=list(cuentas))
+    return CuboCuentaMes.objects.filter(filtro)
+
+
+def por_cuenta(qs):
+    """(cuenta, débito, crédito, n_débitos, n_créditos) sumando los meses de `qs`."""
+    return (
+        qs.values_list('cuenta')
+        .annotate(
+            t_debito=Sum('debito'),
+            t_credito=Sum('credito'),
+            t_n_debitos=Sum('n_debitos'),
+            t_n_creditos=Sum('n_creditos'),
+        )
+        .order_by()
+    )
+
+
+def movimientos_por_cuenta(desde, hasta):
+    """
+    Totales y número de movimientos por cuenta entre dos fechas (incluidas):
+    [{'cuenta', 'total_debito', 'n_debito', 'total_credito', 'n_credito'}].
+    Con meses completos lee el cubo; si no, agrupa el libro en el rango.
+    """
+    if es_meses_completos(desde, hasta):
+        filas = por_cuenta(cubo(desde=desde, hasta=hasta))
+    else:
+        index = {}
+        rango = {'fecha__gte': desde, 'fecha__lte': hasta}
+        for lado, modelo, cuenta, monto in (
+            (0, MovimientoUnificadoDebito, 'cta_debito', 'monto_debito'),
+            (1, MovimientoUnificadoCredito, 'cta_credito', 'monto_credito'),
+        ):
+            for cta, total, n in (
+                modelo.objects.filter(**rango).values_list(cuenta)
+                .annotate(total=Sum(monto), n=Count('id')).order_by()
+            ):
+                item = index.setdefault(cta, [cta, 0, 0, 0, 0])
+                item[1 + lado] += total or 0
+                item[3 + lado] += n
+        filas = index.values()
+
+    return [
+        {
+            'cuenta': cta,
+            'total_debito': debito or 0,
+            'n_debito': n_debitos or 0,
+            'total_credito': credito or 0,
+            'n_credito': n_creditos or 0,
+        }
+        for cta, debito, credito, n_debitos, n_creditos in filas
+    ]
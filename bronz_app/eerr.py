@@ -1,88 +1,139 @@
 # bronz_app/eerr.py
 
+import calendar
 from datetime import date
-from django.db.models import Sum
+
+import numpy as np
+
 from .codigos_eerr import EERR, SUBTOTALES_EERR
-from .models import MovimientoUnificadoDebito, MovimientoUnificadoCredito
+from .motor_balance import _DEBITO, consulta_periodos
+from .utils_financiero import PlanFormulas
 
 
-def generar_estado_resultados(fecha_corte=None):
+def _compilar_eerr():
     """
-    Genera el Estado de Resultados hasta la fecha indicada (valor_fecha)
-    y para el año 2024 completo (valor_2024), devolviendo una lista de filas:
-    [{ 'nombre': ..., 'valor_2024': ..., 'valor_fecha': ..., 'tipo': 'item'|'total' }]
+    EERR y SUBTOTALES_EERR como plan compilado sobre claves 'S:cuenta'
+    (débito - crédito). Un subtotal puede usar líneas o subtotales anteriores;
+    si un nombre es a la vez línea y subtotal, se toma la línea.
     """
-    # 1) Preparar querysets con y sin fecha de corte
-    debit_qs_fecha = MovimientoUnificadoDebito.objects.all()
-    credit_qs_fecha = MovimientoUnificadoCredito.objects.all()
-    if fecha_corte:
-        debit_qs_fecha = debit_qs_fecha.filter(fecha__lte=fecha_corte)
-        credit_qs_fecha = credit_qs_fecha.filter(fecha__lte=fecha_corte)
-
-    # Para todo 2024
-    debit_qs_2024 = MovimientoUnificadoDebito.objects.filter(fecha__year=2024)
-    credit_qs_2024 = MovimientoUnificadoCredito.objects.filter(fecha__year=2024)
-
-    # 2) Agregar montos por cuenta, convirtiendo a float
-    agg_d_fecha = {
-        r['cta_debito']: float(r['total_debito'] or 0)
-        for r in debit_qs_fecha.values('cta_debito')
-                           .annotate(total_debito=Sum('monto_debito'))
-    }
-    agg_c_fecha = {
-        r['cta_credito']: float(r['total_credito'] or 0)
-        for r in credit_qs_fecha.values('cta_credito')
-                            .annotate(total_credito=Sum('monto_credito'))
-    }
-    agg_d_2024 = {
-        r['cta_debito']: float(r['total_debito'] or 0)
-        for r in debit_qs_2024.values('cta_debito')
-                          .annotate(total_debito=Sum('monto_debito'))
-    }
-    agg_c_2024 = {
-        r['cta_credito']: float(r['total_credito'] or 0)
-        for r in credit_qs_2024.values('cta_credito')
-                           .annotate(total_credito=Sum('monto_credito'))
-    }
-
-    # 3) Calcular cada línea del EERR
-    rows = []
-    vals_fecha = {}
-    vals_2024 = {}
-
-    for nombre, items in EERR.items():
-        total_fecha = 0.0
-        total_2024 = 0.0
-        for cta, signo in items:
-            # Saldo hasta fecha de corte
-            d_fecha = agg_d_fecha.get(cta, 0.0)
-            k_fecha = agg_c_fecha.get(cta, 0.0)
-            saldo_fecha = (d_fecha - k_fecha) * signo
-            total_fecha += saldo_fecha
-            # Saldo para todo 2024
-            d_2024 = agg_d_2024.get(cta, 0.0)
-            k_2024 = agg_c_2024.get(cta, 0.0)
-            saldo_2024 = (d_2024 - k_2024) * signo
-            total_2024 += saldo_2024
-        # Agregar fila detalle
-        rows.append({
-            'nombre': nombre,
-            'valor_2024': total_2024,
-            'valor_fecha': total_fecha,
-            'tipo': 'item'
-        })
-        vals_fecha[nombre] = total_fecha
-        vals_2024[nombre] = total_2024
-
-    # 4) Insertar subtotales según SUBTOTALES_EERR
+    items = []
+    for nombre, cuentas in EERR.items():
+        forma = {}
+        for cta, signo in cuentas:
+            forma[('clave', f'S:{cta}')] = forma.get(('clave', f'S:{cta}'), 0.0) + signo
+        items.append((nombre, forma))
+    subtotales = []
     for grupos, etiqueta in SUBTOTALES_EERR:
-        sum_fecha = sum(vals_fecha.get(g, 0.0) for g in grupos)
-        sum_2024 = sum(vals_2024.get(g, 0.0) for g in grupos)
-        rows.append({
-            'nombre': etiqueta,
-            'valor_2024': sum_2024,
-            'valor_fecha': sum_fecha,
-            'tipo': 'total'
-        })
+        forma = {}
+        for grupo in grupos:
+            forma[('linea', grupo)] = forma.get(('linea', grupo), 0.0) + 1.0
+        subtotales.append((etiqueta, forma))
+    return PlanFormulas([
+        ('items', items, ('items',)),
+        ('subtotales', subtotales, ('items', 'subtotales')),
+    ])
+
+
+PLAN_EERR = _compilar_eerr()
+
+
+# Cuentas que usa el plan (claves 'S:cuenta'), en el orden de PLAN_EERR.claves
+CUENTAS_EERR = [int(clave.split(':')[1]) for clave in PLAN_EERR.claves]
+_POSICION = {cuenta: i for i, cuenta in enumerate(CUENTAS_EERR)}
+
+
+# ——————————————————————————————————————————————————————————————
+# PERÍODOS
+# ——————————————————————————————————————————————————————————————
+
+def periodos_anio(anio, detalle='anio', hasta=None):
+    """
+    [(desde, hasta, etiqueta)] del año: 'anio' (uno), 'trimestres' (4) o 'meses' (12).
+    Con `hasta`, los períodos se cortan en esa fecha y se omiten los posteriores.
+    """
+    if detalle == 'meses':
+        limites = [(m, m) for m in range(1, 13)]
+        etiqueta = lambda i, m: f'{anio}-{m:02d}'
+    elif detalle == 'trimestres':
+        limites = [(m, m + 2) for m in (1, 4, 7, 10)]
+        etiqueta = lambda i, m: f'{anio}-T{i + 1}'
+    else:
+        limites = [(1, 12)]
+        etiqueta = lambda i, m: str(anio)
+
+    periodos = []
+    for i, (mes_inicio, mes_fin) in enumerate(limites):
+        inicio = date(anio, mes_inicio, 1)
+        fin = date(anio, mes_fin, calendar.monthrange(anio, mes_fin)[1])
+        if hasta is not None:
+            if inicio > hasta:
+                break
+            fin = min(fin, hasta)
+        periodos.append((inicio, fin, etiqueta(i, mes_inicio)))
+    return periodos
+
+
+# ——————————————————————————————————————————————————————————————
+# MOTOR
+# ——————————————————————————————————————————————————————————————
 
+def saldos_periodos(periodos):
+    """
+    Saldos débito - crédito de las cuentas del EERR: arreglo (CUENTAS_EERR × períodos),
+    todos los períodos [(desde, hasta), ...] desde una sola consulta agrupada.
+    """
+    saldos = np.zeros((len(CUENTAS_EERR), len(periodos)), dtype=np.float64)
+    if not periodos or not CUENTAS_EERR:
+        return saldos
+    for cuenta, lado, *totales in consulta_periodos(periodos, cuentas=CUENTAS_EERR):
+        fila = _POSICION.get(int(cuenta)) if cuenta is not None else None
+        if fila is None:
+            continue
+        signo = 1.0 if lado == _DEBITO else -1.0
+        saldos[fila] += signo * np.array([float(t or 0) for t in totales])
+    return saldos
+
+
+def estado_resultados(periodos):
+    """
+    EERR para una lista de períodos [(desde, hasta) o (desde, hasta, etiqueta)]:
+    una consulta para todas las columnas y las líneas/subtotales del plan compilado.
+    Devuelve [{'nombre': ..., 'tipo': 'item'|'total', 'valores': [uno por período]}].
+    """
+    periodos = [tuple(p[:2]) for p in periodos]
+    resultados = PLAN_EERR.evaluar_columnas(saldos_periodos(periodos))
+    rows = []
+    for hoja, tipo, nombres in (('items', 'item', list(EERR)), ('subtotales', 'total', [e for _, e in SUBTOTALES_EERR])):
+        for nombre, valores in zip(nombres, resultados[hoja].tolist()):
+            rows.append({'nombre': nombre, 'tipo': tipo, 'valores': valores})
     return rows
+
+
+def estado_resultados_anio(anio, detalle='meses', hasta=None):
+    """
+    EERR del año con columnas por mes o trimestre más el total del año,
+    todo en la misma consulta. Devuelve (etiquetas, filas).
+    """
+    periodos = periodos_anio(anio, detalle, hasta)
+    if detalle != 'anio':
+        periodos += periodos_anio(anio, 'anio', hasta)
+    return [etiqueta for _, _, etiqueta in periodos], estado_resultados(periodos)
+
+
+def generar_estado_resultados(fecha_corte=None, anio=None):
+    """
+    Genera el Estado de Resultados del 1 de enero a la fecha indicada (valor_fecha)
+    y para el año `anio` completo (valor_anio; por defecto el año anterior al corte),
+    devolviendo una lista de filas:
+    [{ 'nombre': ..., 'valor_anio': ..., 'valor_fecha': ..., 'tipo': 'item'|'total' }]
+    """
+    fecha_corte = fecha_corte or date.today()
+    anio = anio or fecha_corte.year - 1
+    filas = estado_resultados([
+        (date(anio, 1, 1), date(anio, 12, 31)),
+        (date(fecha_corte.year, 1, 1), fecha_corte),
+    ])
+    return [
+        {'nombre': f['nombre'], 'valor_anio': f['valores'][0], 'valor_fecha': f['valores'][1], 'tipo': f['tipo']}
+        for f in filas
+    ]
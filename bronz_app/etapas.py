@@ -0,0 +1,256 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from bronz_app.libro_stock import sincronizar_libro_stock
+from bronz_app.models import MetricaRegeneracion, MovimientoUnificadoCredito, MovimientoUnificadoDebito
+from bronz_app.plan_cuentas import regenerar_rollups_cuenta_mes
+from bronz_app.utils import (
+    fusionar_rangos,
+    limites_de_mes,
+    poblar_movimientos_unificados_credito,
+    poblar_movimientos_unificados_debito,
+    regenerar_cubo_cuenta_mes,
+    regenerar_resumen_mensual,
+    regenerar_resumenes_credito_debito,
+    regenerar_saldos_diarios,
+    regenerar_ventas_consulta,
+)
+
+logger = logging.getLogger(__name__)
+
+ETAPAS_HILOS = getattr(settings, 'BRONZ_ETAPAS_HILOS', 1)
+
+
+# ——————————————————————————————————————————————————————————————
+# DAG DE ETAPAS
+# ——————————————————————————————————————————————————————————————
+
+class Etapa:
+    """Un paso del pipeline: nombre único, función sin argumentos y dependencias."""
+
+    def __init__(self, nombre, funcion, depende_de=()):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende_de = tuple(depende_de)
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r})"
+
+
+class ResultadoEtapas:
+    """Tiempos por etapa (segundos desde el inicio) y camino crítico del DAG."""
+
+    def __init__(self, etapas, tiempos, total, hilos):
+        self.etapas = etapas
+        self.tiempos = tiempos      # {nombre: (inicio, fin)}
+        self.total = total
+        self.hilos = hilos
+
+    def duracion(self, nombre):
+        inicio, fin = self.tiempos[nombre]
+        return fin - inicio
+
+    @property
+    def suma(self):
+        return sum(self.duracion(n) for n in self.tiempos)
+
+    def camino_critico(self):
+        """Cadena de dependencias con mayor duración acumulada: ([nombres], segundos)."""
+        mejor = {}
+        for etapa in _orden_topologico(self.etapas):
+            previo = max(
+                (mejor[d] for d in etapa.depende_de),
+                key=lambda camino: camino[1],
+                default=([], 0.0),
+            )
+            mejor[etapa.nombre] = (previo[0] + [etapa.nombre], previo[1] + self.duracion(etapa.nombre))
+        return max(mejor.values(), key=lambda camino: camino[1], default=([], 0.0))
+
+    def como_dict(self):
+        camino, segundos = self.camino_critico()
+        return {
+            'hilos': self.hilos,
+            'total_s': round(self.total, 3),
+            'suma_s': round(self.suma, 3),
+            'camino_critico': camino,
+            'camino_critico_s': round(segundos, 3),
+            'etapas': {
+                nombre: {'inicio_s': round(inicio, 3), 'segundos': round(fin - inicio, 3)}
+                for nombre, (inicio, fin) in self.tiempos.items()
+            },
+        }
+
+    def resumen(self):
+        camino, segundos = self.camino_critico()
+        return (
+            f"{len(self.tiempos)} etapas en {self.total:.2f} s con {self.hilos} hilo(s) "
+            f"(suma {self.suma:.2f} s; camino crítico {segundos:.2f} s: {' → '.join(camino)})"
+        )
+
+
+def _orden_topologico(etapas):
+    """Orden estable (respeta el orden declarado). ValueError si hay ciclos o dependencias desconocidas."""
+    por_nombre = {e.nombre: e for e in etapas}
+    if len(por_nombre) != len(etapas):
+        raise ValueError("Hay etapas con nombre repetido")
+    for etapa in etapas:
+        faltantes = [d for d in etapa.depende_de if d not in por_nombre]
+        if faltantes:
+            raise ValueError(f"La etapa {etapa.nombre} depende de etapas inexistentes: {faltantes}")
+
+    orden, hechas = [], set()
+    pendientes = list(etapas)
+    while pendientes:
+        listas = [e for e in pendientes if all(d in hechas for d in e.depende_de)]
+        if not listas:
+            raise ValueError(f"Ciclo entre etapas: {[e.nombre for e in pendientes]}")
+        for etapa in listas:
+            orden.append(etapa)
+            hechas.add(etapa.nombre)
+        pendientes = [e for e in pendientes if e.nombre not in hechas]
+    return orden
+
+
+def puede_paralelizar(hilos=None, alias='default'):
+    """
+    Paralelo solo en PostgreSQL y fuera de una transacción abierta: las
+    conexiones de los hilos no verían lo que aún no está confirmado.
+    SQLite serializa las escrituras, así que ahí no hay nada que ganar.
+    """
+    hilos = ETAPAS_HILOS if hilos is None else hilos
+    connection = connections[alias]
+    return hilos > 1 and connection.vendor == 'postgresql' and not connection.in_atomic_block
+
+
+def _correr_en_hilo(etapa, t0, alias):
+    inicio = time.perf_counter() - t0
+    try:
+        with transaction.atomic(using=alias):
+            etapa.funcion()
+    finally:
+        connections.close_all()
+    return inicio, time.perf_counter() - t0
+
+
+def ejecutar_etapas(etapas, hilos=1, alias='default'):
+    """
+    Ejecuta el DAG. Con hilos=1 corre en orden en la conexión actual; con más,
+    lanza cada etapa apenas sus dependencias terminan. Si una etapa falla se
+    dejan de lanzar nuevas, se espera a las que están corriendo y se relanza el error.
+    """
+    orden = _orden_topologico(etapas)
+    t0 = time.perf_counter()
+    tiempos = {}
+
+    if hilos <= 1:
+        for etapa in orden:
+            inicio = time.perf_counter() - t0
+            etapa.funcion()
+            tiempos[etapa.nombre] = (inicio, time.perf_counter() - t0)
+    else:
+        faltan = {e.nombre: set(e.depende_de) for e in orden}
+        por_nombre = {e.nombre: e for e in orden}
+        en_curso = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='bronz-etapa') as pool:
+            while (faltan and error is None) or en_curso:
+                if error is None:
+                    for nombre in [n for n, deps in faltan.items() if not deps]:
+                        del faltan[nombre]
+                        en_curso[pool.submit(_correr_en_hilo, por_nombre[nombre], t0, alias)] = nombre
+                listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    nombre = en_curso.pop(futuro)
+                    try:
+                        tiempos[nombre] = futuro.result()
+                    except Exception as e:
+                        logger.exception("Falló la etapa %s", nombre)
+                        error = error or e
+                        continue
+                    for deps in faltan.values():
+                        deps.discard(nombre)
+        if error is not None:
+            raise error
+
+    resultado = ResultadoEtapas(orden, tiempos, time.perf_counter() - t0, hilos)
+    logger.info("Regeneración: %s", resultado.resumen())
+    return resultado
+
+
+def guardar_tiempos_etapas(resultado):
+    """Deja los tiempos de la última pasada en metrica_regeneracion (endpoint de métricas)."""
+    if not MetricaRegeneracion.objects.filter(pk=1).update(ultimas_etapas=resultado.como_dict()):
+        MetricaRegeneracion.objects.get_or_create(pk=1, defaults={'ultimas_etapas': resultado.como_dict()})
+
+
+# ——————————————————————————————————————————————————————————————
+# PIPELINE DE REGENERACIÓN
+# libro de stock y costo promedio → VentasConsulta → uniones (débito / crédito) → resúmenes
+#                                                                             → cubo cuenta × mes → ResumenMensual
+#                                                                                                 → totales por nivel
+#                                                                             → saldo_diario
+# ——————————————————————————————————————————————————————————————
+
+def _etapa_union(nombre, modelo, desde, hasta, depende_vc):
+    """
+    Etapa de una unión para un rango: el borrado y todos sus INSERT … SELECT en
+    una sola transacción (_reemplazar_union), así quien lea la tabla fuera del
+    pipeline nunca ve el rango vacío o a medio llenar. El paralelismo viene de
+    correr débitos, créditos y rangos distintos a la vez, no de partir la unión.
+    """
+    poblar = (
+        poblar_movimientos_unificados_debito if modelo is MovimientoUnificadoDebito
+        else poblar_movimientos_unificados_credito
+    )
+    return Etapa(nombre, lambda: poblar(start_date=desde, end_date=hasta), [depende_vc])
+
+
+def etapas_regeneracion(rangos):
+    """
+    DAG de la regeneración de los rangos (ya fusionados). Los rangos son
+    disjuntos, así que las etapas de rangos distintos no dependen entre sí.
+    Los resúmenes se agrupan por meses completos en una sola etapa porque dos
+    rangos pueden caer en el mismo mes. El libro de stock va antes que
+    VentasConsulta: al sincronizarlo se actualiza el costo promedio que ella lee.
+    """
+    def libro_stock():
+        for desde, hasta in rangos:
+            sincronizar_libro_stock(desde, hasta)
+
+    etapas, uniones = [Etapa('libro_stock', libro_stock)], []
+    for i, (desde, hasta) in enumerate(rangos):
+        sufijo = f'[{desde}..{hasta}]' if len(rangos) > 1 else ''
+        vc = f'ventas_consulta{sufijo}'
+        etapas.append(Etapa(vc, lambda d=desde, h=hasta: regenerar_ventas_consulta(start_date=d, end_date=h), ['libro_stock']))
+        for prefijo, modelo in (('union_debito', MovimientoUnificadoDebito), ('union_credito', MovimientoUnificadoCredito)):
+            etapa = _etapa_union(f'{prefijo}{sufijo}', modelo, desde, hasta, vc)
+            etapas.append(etapa)
+            uniones.append(etapa.nombre)
+
+    if rangos == [(None, None)]:
+        meses = [(None, None)]
+    else:
+        meses = fusionar_rangos([limites_de_mes(desde, hasta) for desde, hasta in rangos])
+
+    def resumenes():
+        for desde, hasta in meses:
+            regenerar_resumenes_credito_debito(start_date=desde, end_date=hasta)
+
+    def cubo():
+        for desde, hasta in meses:
+            regenerar_cubo_cuenta_mes(start_date=desde, end_date=hasta)
+
+    def rollups():
+        for desde, hasta in meses:
+            regenerar_rollups_cuenta_mes(start_date=desde, end_date=hasta)
+
+    etapas.append(Etapa('resumenes', resumenes, uniones))
+    etapas.append(Etapa('cubo_cuenta_mes', cubo, uniones))
+    etapas.append(Etapa('saldos_diarios', lambda: regenerar_saldos_diarios(rangos), uniones))
+    etapas.append(Etapa('resumen_mensual', regenerar_resumen_mensual, ['cubo_cuenta_mes']))
+    etapas.append(Etapa('rollups_cuenta_mes', rollups, ['cubo_cuenta_mes']))
+    return etapas
@@ -1,163 +1,229 @@
 # bronz_app/indicadores.py
 
-from .ficha import generar_ficha_financiera
-from .eerr import generar_estado_resultados
+import calendar
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractMonth
+
+from bronz_app.coordinador_regeneracion import regenerar_coordinado
+from bronz_app.cubo import cubo
+from bronz_app.models import BalanceInicial, RangoSucio, SnapshotIndicadores, VentasConsulta
+from bronz_app.utils import CUENTAS_VENTAS, version_libro
+
+# Grupos del plan (ver plan_cuentas.GRUPOS)
+ACTIVO_CIRCULANTE = '101'
+PASIVO_CIRCULANTE = '201'
+PASIVO_LARGO_PLAZO = '202'
+PATRIMONIO = '203'
+RESULTADOS = '3'
+
+EXISTENCIAS = [
+    1010900, 1010901,
+    1011300, 1011301, 1011302, 1011303, 1011304, 1011305, 1011306, 1011307, 1011308,
+    1011400, 1011500,
+]
+
+# (clave, nombre, unidad) en el orden de la tabla
+INDICADORES = [
+    ('razon_corriente', 'Act. Circ. / Pas. Circ.', 'veces'),
+    ('prueba_acida', 'Prueba ácida (Act. Circ. - Existencias) / Pas. Circ.', 'veces'),
+    ('margen_bruto', 'Margen Bruto / Ventas (%)', '%'),
+    ('margen_neto', 'Utilidad / Ventas (%)', '%'),
+    ('rotacion_inventario', 'Rotación de Existencias', 'veces'),
+    ('dias_inventario', 'Permanencia Existencias (ds)', 'días'),
+    ('endeudamiento', 'Pasivo Exigible / Patrimonio Neto', 'veces'),
+]
+
+
+# ——————————————————————————————————————————————————————————————
+# DATOS: CUBO CUENTA × MES Y COSTO DE VENTAS
+# ——————————————————————————————————————————————————————————————
+
+def _movimientos_anio(anio):
+    """
+    (cuentas, débitos, créditos) del año desde el cubo en una sola lectura:
+    arreglos (cuentas × 12 meses).
+    """
+    filas = list(cubo(anio=anio).values_list('cuenta', 'mes', 'debito', 'credito'))
+    cuentas = np.array(sorted({cuenta for cuenta, _, _, _ in filas}), dtype=np.int64)
+    debitos = np.zeros((len(cuentas), 12), dtype=np.float64)
+    creditos = np.zeros((len(cuentas), 12), dtype=np.float64)
+    if filas:
+        cuenta, mes, debito, credito = zip(*filas)
+        fila = np.searchsorted(cuentas, np.array(cuenta, dtype=np.int64))
+        columna = np.array(mes, dtype=np.int64) - 1
+        np.add.at(debitos, (fila, columna), np.array(debito, dtype=np.float64))
+        np.add.at(creditos, (fila, columna), np.array(credito, dtype=np.float64))
+    return cuentas, debitos, creditos
+
+
+def _costo_ventas_anio(anio):
+    """Costo de ventas por mes (12,): cantidad × costo promedio del Catálogo, ya en ventas_consulta."""
+    costo = np.zeros(12, dtype=np.float64)
+    for mes, total in (
+        VentasConsulta.objects.filter(fecha__year=anio)
+        .annotate(mes=ExtractMonth('fecha'))
+        .values_list('mes')
+        .annotate(total=Sum('costo_venta'))
+        .order_by()
+    ):
+        costo[mes - 1] = float(total or 0)
+    return costo
+
+
+def _existencias_iniciales(anio):
+    """
+    Saldo de existencias al abrir el año: el Balance Inicial del año (el cubo
+    lo suma en el mes de su fecha). Es la misma base de los cierres, que son
+    acumulados del año: sin Balance Inicial el año abre en 0.
+    """
+    inicial = BalanceInicial.objects.filter(fecha__year=anio).aggregate(
+        debe=Sum('debito', filter=Q(cuenta_debito__in=EXISTENCIAS)),
+        haber=Sum('credito', filter=Q(cuenta_credito__in=EXISTENCIAS)),
+    )
+    return float((inicial['debe'] or 0) - (inicial['haber'] or 0))
+
+
+def _mascara(cuentas, prefijo):
+    return np.char.startswith(cuentas.astype(str), prefijo)
 
-def _get_eerr_val(rows, nombre):
+
+def _dividir(numerador, denominador, factor=1.0):
+    """numerador / denominador × factor; NaN donde el denominador es 0."""
+    resultado = np.full(np.broadcast(numerador, denominador).shape, np.nan)
+    np.divide(numerador * factor, denominador, out=resultado, where=denominador != 0)
+    return resultado
+
+
+# ——————————————————————————————————————————————————————————————
+# MOTOR
+# ——————————————————————————————————————————————————————————————
+
+def calcular_indicadores(anio, hasta_mes=12):
     """
-    Busca en la lista de filas EERR la fila cuyo 'nombre' coincida
-    y devuelve (valor_2024, valor_fecha). Si no encuentra, retorna (0.0, 0.0).
+    Indicadores del año por mes (1..hasta_mes) y del año completo, en una
+    pasada vectorizada sobre el cubo (una consulta), el costo de ventas (otra)
+    y el saldo inicial de existencias (otra).
+
+    Los saldos de balance son al cierre de cada mes (acumulado del año, que
+    incluye el balance inicial); los de resultado, los del mes. La columna
+    del año usa el saldo al último mes y los flujos sumados.
+    Devuelve {'periodos': [...], 'indicadores': [{'clave', 'nombre', 'unidad', 'valores'}]}.
     """
-    for r in rows:
-        if r.get('nombre') == nombre:
-            return r.get('valor_2024', 0.0), r.get('valor_fecha', 0.0)
-    return 0.0, 0.0
-
-def generar_indicadores(fecha_corte=None):
-    # 1) Traer balance y EERR
-    ficha = generar_ficha_financiera(fecha_corte)
-    eerr_rows = generar_estado_resultados(fecha_corte)
-
-    # 2) Extraer los valores clave del EERR
-    ventas_2024, ventas_fecha = _get_eerr_val(eerr_rows, 'Ventas netas')
-    cogs_2024,  cogs_fecha  = _get_eerr_val(eerr_rows, 'Costo de Ventas y GAVs')
-    rob_2024,   rob_fecha   = _get_eerr_val(eerr_rows, 'Resultado Operacional Bruto (ROB)')
-    gf_2024,    gf_fecha    = _get_eerr_val(eerr_rows, 'Gastos Financieros')
-    unet_2024,  unet_fecha  = _get_eerr_val(eerr_rows, 'Utilidad (pérd.) Neta')
-    ron_2024,   ron_fecha   = _get_eerr_val(eerr_rows, 'Resultado Operacional Neto')
-
-    # 3) Extraer saldos del Balance
-    act_corr_2024 = sum(ficha.get('ACTIVOS_CIRCULANTES', {}).values())
-    act_corr_fecha = act_corr_2024
-    pas_corr_2024 = sum(ficha.get('PASIVOS_CORRIENTES', {}).values())
-    pas_corr_fecha = pas_corr_2024
-
-    exist_2024 = ficha.get('ACTIVOS_CIRCULANTES', {}).get('Existencias', 0.0)
-    exist_fecha = exist_2024
-    cxc_2024 = ficha.get('ACTIVOS_CIRCULANTES', {}).get('Cuentas por Cobrar Giro', 0.0)
-    cxc_fecha = cxc_2024
-    cxp_2024 = (
-        ficha.get('PASIVOS_CORRIENTES', {}).get('Ctas por Pagar', 0.0)
-        + ficha.get('PASIVOS_CORRIENTES', {}).get('Ctas x Pagar Relacionados', 0.0)
+    cuentas, debitos, creditos = _movimientos_anio(anio)
+    debitos, creditos = debitos[:, :hasta_mes], creditos[:, :hasta_mes]
+    neto = debitos - creditos
+    saldo_cierre = np.cumsum(neto, axis=1)
+    costo_mes = _costo_ventas_anio(anio)[:hasta_mes]
+
+    # Saldos al cierre (activos en débito, pasivos y patrimonio en crédito)
+    activo_circ = saldo_cierre[_mascara(cuentas, ACTIVO_CIRCULANTE)].sum(axis=0)
+    pasivo_circ = -saldo_cierre[_mascara(cuentas, PASIVO_CIRCULANTE)].sum(axis=0)
+    pasivo_lp = -saldo_cierre[_mascara(cuentas, PASIVO_LARGO_PLAZO)].sum(axis=0)
+    patrimonio = -saldo_cierre[_mascara(cuentas, PATRIMONIO)].sum(axis=0)
+    existencias = saldo_cierre[np.isin(cuentas, EXISTENCIAS)].sum(axis=0)
+    pasivo_exig = pasivo_circ + pasivo_lp
+
+    # Flujos del mes
+    ventas_mes = -neto[np.isin(cuentas, CUENTAS_VENTAS)].sum(axis=0)
+    utilidad_mes = -neto[_mascara(cuentas, RESULTADOS)].sum(axis=0)
+
+    # Existencias promedio: (cierre anterior + cierre) / 2; enero parte del saldo inicial
+    apertura = np.concatenate(([_existencias_iniciales(anio)], existencias[:-1]))
+    existencias_prom = (apertura + existencias) / 2
+    existencias_anio = existencias.mean()
+    dias = np.array([calendar.monthrange(anio, m)[1] for m in range(1, hasta_mes + 1)], dtype=np.float64)
+
+    # Columna del año: saldos al último cierre, flujos sumados, existencias promedio de los cierres
+    al_cierre = lambda v: np.append(v, v[-1])
+    sumado = lambda v: np.append(v, v.sum())
+    activo_circ, pasivo_circ, pasivo_exig, patrimonio, existencias = map(
+        al_cierre, (activo_circ, pasivo_circ, pasivo_exig, patrimonio, existencias)
     )
-    cxp_fecha = cxp_2024
-
-    deuda_cp_2024 = ficha.get('PASIVOS_CORRIENTES', {}).get('Obligaciones Bancarias C.P.', 0.0)
-    deuda_lp_2024 = ficha.get('PASIVOS_LP', {}).get('Oblig. Bancarias L.P.', 0.0)
-    deuda_fin_2024 = deuda_cp_2024 + deuda_lp_2024
-    deuda_fin_fecha = deuda_fin_2024
-
-    pas_lp_2024 = sum(ficha.get('PASIVOS_LP', {}).values())
-    pn_2024 = sum(ficha.get('PATRIMONIO_NETO', {}).values())
-    pas_exig_2024 = pas_corr_2024 + pas_lp_2024
-    pas_exig_fecha = pas_exig_2024
-
-    # 4) Calcular cada indicador
-    indicadores = []
-
-    # EBITDA
-    indicadores.append({
-        'nombre': 'EBITDA',
-        'valor_2024': rob_2024,
-        'valor_fecha': rob_fecha
-    })
-
-    # Margen Bruto / Ventas (%)
-    mb_2024 = ventas_2024 and (ventas_2024 - cogs_2024) / ventas_2024 * 100 or 0.0
-    mb_fecha = ventas_fecha and (ventas_fecha - cogs_fecha) / ventas_fecha * 100 or 0.0
-    indicadores.append({
-        'nombre': 'Margen Bruto / Ventas (%)',
-        'valor_2024': mb_2024,
-        'valor_fecha': mb_fecha
-    })
-
-    # Resultado Oper. Bruto / Ventas (%)
-    robv_2024 = ventas_2024 and rob_2024 / ventas_2024 * 100 or 0.0
-    robv_fecha = ventas_fecha and rob_fecha / ventas_fecha * 100 or 0.0
-    indicadores.append({
-        'nombre': 'Resultado Operacional Bruto / Ventas (%)',
-        'valor_2024': robv_2024,
-        'valor_fecha': robv_fecha
-    })
-
-    # Current Ratio
-    cr_2024 = pas_corr_2024 and act_corr_2024 / pas_corr_2024 or 0.0
-    cr_fecha = pas_corr_fecha and act_corr_fecha / pas_corr_fecha or 0.0
-    indicadores.append({
-        'nombre': 'Act. Circ. / Pas. Circ.',
-        'valor_2024': cr_2024,
-        'valor_fecha': cr_fecha
-    })
-
-    # Utilidad / Ventas (%)
-    uv_2024 = ventas_2024 and unet_2024 / ventas_2024 * 100 or 0.0
-    uv_fecha = ventas_fecha and unet_fecha / ventas_fecha * 100 or 0.0
-    indicadores.append({
-        'nombre': 'Utilidad / Ventas (%)',
-        'valor_2024': uv_2024,
-        'valor_fecha': uv_fecha
-    })
-
-    # Días de Inventario
-    di_2024 = cogs_2024 and exist_2024 / cogs_2024 * 360 or 0.0
-    di_fecha = cogs_fecha and exist_fecha / cogs_fecha * 360 or 0.0
-    indicadores.append({
-        'nombre': 'Permanencia Existencias (ds)',
-        'valor_2024': di_2024,
-        'valor_fecha': di_fecha
-    })
-
-    # Días CxC
-    dcxc_2024 = ventas_2024 and cxc_2024 / ventas_2024 * 360 or 0.0
-    dcxc_fecha = ventas_fecha and cxc_fecha / ventas_fecha * 360 or 0.0
-    indicadores.append({
-        'nombre': 'Permanencia Ctas. X Cobrar (ds)',
-        'valor_2024': dcxc_2024,
-        'valor_fecha': dcxc_fecha
-    })
-
-    # Días CxP
-    dcp_2024 = cogs_2024 and cxp_2024 / cogs_2024 * 360 or 0.0
-    dcp_fecha = cogs_fecha and cxp_fecha / cogs_fecha * 360 or 0.0
-    indicadores.append({
-        'nombre': 'Permanencia Ctas. X Pagar (ds)',
-        'valor_2024': dcp_2024,
-        'valor_fecha': dcp_fecha
-    })
-
-    # EBITDA / Gastos Financieros
-    egf_2024 = gf_2024 and rob_2024 / gf_2024 or 0.0
-    egf_fecha = gf_fecha and rob_fecha / gf_fecha or 0.0
-    indicadores.append({
-        'nombre': 'EBITDA / Gastos Financieros',
-        'valor_2024': egf_2024,
-        'valor_fecha': egf_fecha
-    })
-
-    # Deudas Financieras / EBITDA
-    dfe_2024 = rob_2024 and deuda_fin_2024 / rob_2024 or 0.0
-    dfe_fecha = rob_fecha and deuda_fin_fecha / rob_fecha or 0.0
-    indicadores.append({
-        'nombre': 'Deudas financieras / EBITDA',
-        'valor_2024': dfe_2024,
-        'valor_fecha': dfe_fecha
-    })
-
-    # Pasivo Exigible / Patrimonio Neto
-    pen_2024 = pn_2024 and pas_exig_2024 / pn_2024 or 0.0
-    pen_fecha = pn_2024 and pas_exig_fecha / pn_2024 or 0.0
-    indicadores.append({
-        'nombre': 'Pasivo Exigible / Patrimonio Neto',
-        'valor_2024': pen_2024,
-        'valor_fecha': pen_fecha
-    })
-
-    # Pasivo Exigible / Patr. Neto + Int. Min.
-    # (si tuvieras interés minoritario, súmalo a pn_2024; aquí lo omitimos)
-    indicadores.append({
-        'nombre': 'Pasivo Exigible / Patr. Neto+ Int. Min.',
-        'valor_2024': pen_2024,
-        'valor_fecha': pen_fecha
-    })
-
-    return indicadores
+    ventas, costo, utilidad, dias = map(sumado, (ventas_mes, costo_mes, utilidad_mes, dias))
+    existencias_prom = np.append(existencias_prom, existencias_anio)
+
+    valores = {
+        'razon_corriente': _dividir(activo_circ, pasivo_circ),
+        'prueba_acida': _dividir(activo_circ - existencias, pasivo_circ),
+        'margen_bruto': _dividir(ventas - costo, ventas, 100),
+        'margen_neto': _dividir(utilidad, ventas, 100),
+        'rotacion_inventario': _dividir(costo, existencias_prom),
+        'dias_inventario': _dividir(existencias_prom * dias, costo),
+        'endeudamiento': _dividir(pasivo_exig, patrimonio),
+    }
+
+    return {
+        'periodos': [f'{anio}-{m:02d}' for m in range(1, hasta_mes + 1)] + [str(anio)],
+        'indicadores': [
+            {
+                'clave': clave,
+                'nombre': nombre,
+                'unidad': unidad,
+                # NaN (sin denominador) → None, para que el JSON quede válido
+                'valores': [None if np.isnan(v) else round(float(v), 2) for v in valores[clave]],
+            }
+            for clave, nombre, unidad in INDICADORES
+        ],
+    }
+
+
+# ——————————————————————————————————————————————————————————————
+# SNAPSHOT POR (AÑO PANEL, VERSIÓN)
+# ——————————————————————————————————————————————————————————————
+
+def _hasta_mes(panel_year):
+    hoy = date.today()
+    return hoy.month if panel_year == hoy.year else 12
+
+
+def construir_indicadores(panel_year, version):
+    hasta_mes = _hasta_mes(panel_year)
+    datos = {'anio': panel_year, 'version': version, 'hasta_mes': hasta_mes, **calcular_indicadores(panel_year, hasta_mes)}
+    with transaction.atomic():
+        SnapshotIndicadores.objects.update_or_create(
+            panel_year=panel_year, version=version, defaults={'datos': datos},
+        )
+        # Las versiones anteriores del mismo año ya no se leen
+        SnapshotIndicadores.objects.filter(panel_year=panel_year, version__lt=version).delete()
+    return datos
+
+
+def obtener_indicadores(panel_year, refrescar=False):
+    """
+    Indicadores vigentes del año. Como snapshot_libro.obtener_snapshot: sirve
+    el último snapshot (la regeneración por escrituras va en segundo plano),
+    con 'desactualizado' si hay escrituras aún no reflejadas, y solo recalcula
+    aquí si se pide refrescar, si el año nunca se consultó o si cambió el mes
+    en curso (el año actual llega hasta el mes de hoy y el snapshot se guarda
+    por versión, no por fecha).
+    """
+    if refrescar:
+        regenerar_coordinado()
+        return {**construir_indicadores(panel_year, version_libro()), 'desactualizado': False}
+
+    version = version_libro()
+    snapshot = SnapshotIndicadores.objects.filter(panel_year=panel_year).order_by('-version').first()
+    if snapshot is None or snapshot.datos.get('hasta_mes') != _hasta_mes(panel_year):
+        datos = construir_indicadores(panel_year, version)
+    else:
+        datos = snapshot.datos
+    desactualizado = datos['version'] != version or RangoSucio.objects.exists()
+    if desactualizado:
+        from bronz_app.trabajos import encolar
+        encolar('regenerar_pendientes')
+    return {**datos, 'desactualizado': desactualizado}
+
+
+def actualizar_indicadores():
+    """Rehace, con la versión actual, los indicadores de los años ya consultados."""
+    version = version_libro()
+    anios = sorted(set(
+        SnapshotIndicadores.objects.filter(version__lt=version).values_list('panel_year', flat=True)
+    ))
+    for panel_year in anios:
+        construir_indicadores(panel_year, version)
+    return anios
@@ -0,0 +1,144 @@
+# bronz_app/kits.py
+
+from django.core.checks import Tags, Warning, register
+from django.db.models import F, IntegerField, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+
+from bronz_app.models import Catalogo, ComponenteKit, Kit, Ventas
+from bronz_app.rangos_sucios import agrupar_rangos_sucios
+
+# Ruta de Ventas a la lista de materiales de su SKU
+_COMPONENTES = 'sku__kit__componentes'
+
+# Packs que estaban fijos en el código antes de la lista de materiales
+# (misma tabla que la migración 0028_kits): sku → (descuenta_stock_propio, componentes)
+KITS_INICIALES = {
+    'BB0003': (False, ['BB0001', 'BB0002']),
+    'BB0012': (True, ['BB0001', 'BB0002', 'BB0009', 'BB0010']),
+}
+_SKUS_KITS_INICIALES = {s for sku, (_, componentes) in KITS_INICIALES.items() for s in [sku, *componentes]}
+
+
+# ——————————————————————————————————————————————————————————————
+# EXPLOSIÓN DE VENTAS EN COMPONENTES
+# ——————————————————————————————————————————————————————————————
+
+def explotar_ventas(ventas=None):
+    """
+    Ventas ⋈ componente_kit: una fila por (venta de un kit, componente), anotada
+    con `componente` (SKU) y `consumo` (cantidad vendida × unidades por kit).
+    Las ventas de SKUs que no son kit no aparecen. Acepta un QuerySet de Ventas
+    ya filtrado o anotado; agrupar y sumar queda en la base de datos.
+    """
+    qs = Ventas.objects.all() if ventas is None else ventas
+    return (
+        qs.filter(**{f'{_COMPONENTES}__isnull': False})
+        .annotate(
+            componente=F(f'{_COMPONENTES}__componente_id'),
+            consumo=F('cantidad') * F(f'{_COMPONENTES}__cantidad'),
+        )
+    )
+
+
+def consumo_en_kits(sku):
+    """Subconsulta: unidades de `sku` (OuterRef o literal) consumidas por ventas de kits; 0 si ninguna."""
+    return Coalesce(
+        Subquery(
+            explotar_ventas()
+            .filter(componente=sku)
+            .values('componente')
+            .annotate(total=Sum('consumo'))
+            .values('total')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+# ——————————————————————————————————————————————————————————————
+# LISTA DE MATERIALES EN MEMORIA
+# ——————————————————————————————————————————————————————————————
+
+def lista_de_materiales(skus=None):
+    """
+    {SKU kit: (descuenta_stock_propio, [(componente, unidades)])} en una consulta,
+    para la lógica fila a fila (libro de stock, informe por tienda). Con `skus`,
+    solo los kits entre ellos.
+    """
+    kits = {}
+    qs = Kit.objects.all() if skus is None else Kit.objects.filter(sku__in=list(skus))
+    filas = qs.values_list('sku', 'descuenta_stock_propio', 'componentes__componente', 'componentes__cantidad')
+    for sku, descuenta_stock_propio, componente, cantidad in filas:
+        _, componentes = kits.setdefault(sku, (descuenta_stock_propio, []))
+        if componente is not None:
+            componentes.append((componente, cantidad))
+    return kits
+
+
+# ——————————————————————————————————————————————————————————————
+# KITS INICIALES
+# ——————————————————————————————————————————————————————————————
+
+def asegurar_kits_iniciales(skus=None):
+    """
+    Crea los kits de KITS_INICIALES que aún no existen y cuyo SKU y componentes
+    ya están en el Catálogo (la migración solo los crea si el Catálogo ya estaba
+    cargado). Con `skus` (p. ej. los recién importados) solo considera los kits
+    que los involucran, para no recrear uno borrado a propósito en el admin.
+    Idempotente; devuelve los SKUs de kit creados.
+    """
+    candidatos = {
+        sku: definicion for sku, definicion in KITS_INICIALES.items()
+        if skus is None or {sku, *definicion[1]} & set(skus)
+    }
+    if not candidatos:
+        return []
+    todos = {s for sku, (_, componentes) in candidatos.items() for s in [sku, *componentes]}
+    existentes = set(Catalogo.objects.filter(sku__in=todos).values_list('sku', flat=True))
+    con_kit = set(Kit.objects.filter(sku__in=list(candidatos)).values_list('sku', flat=True))
+
+    creados = []
+    # Un solo resincronizado del libro de stock y de los cierres por tienda al final
+    with agrupar_rangos_sucios():
+        for sku, (descuenta_stock_propio, componentes) in candidatos.items():
+            if sku in con_kit or not {sku, *componentes} <= existentes:
+                continue
+            kit = Kit.objects.create(sku_id=sku, descuenta_stock_propio=descuenta_stock_propio)
+            for componente in componentes:
+                ComponenteKit.objects.create(kit=kit, componente_id=componente, cantidad=1)
+            creados.append(sku)
+    return creados
+
+
+def _catalogo_guardado(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and instance.sku in _SKUS_KITS_INICIALES:
+        asegurar_kits_iniciales([instance.sku])
+
+
+def conectar_senales():
+    post_save.connect(_catalogo_guardado, sender=Catalogo, dispatch_uid='kits_Catalogo')
+
+
+@register(Tags.database)
+def revisar_kits_iniciales(app_configs, databases=None, **kwargs):
+    """
+    manage.py check --database default (y migrate): packs de KITS_INICIALES que
+    están en el Catálogo sin su Kit, cuyas ventas no descuentan componentes.
+    """
+    if not databases:
+        return []
+    try:
+        en_catalogo = set(Catalogo.objects.filter(sku__in=list(KITS_INICIALES)).values_list('sku', flat=True))
+        con_kit = set(Kit.objects.filter(sku__in=list(KITS_INICIALES)).values_list('sku', flat=True))
+    except Exception:
+        return []  # base sin migrar todavía
+    faltan = sorted(en_catalogo - con_kit)
+    if not faltan:
+        return []
+    return [Warning(
+        f"SKUs de pack en el Catálogo sin lista de materiales: {', '.join(faltan)}",
+        hint="Crearlos en el admin (Kits) o con bronz_app.kits.asegurar_kits_iniciales(); "
+             "mientras tanto sus ventas no descuentan componentes.",
+        id='bronz_app.W002',
+    )]
@@ -0,0 +1,277 @@
+# bronz_app/libro_stock.py
+
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+
+from bronz_app.models import (
+    AjusteInventario,
+    ComponenteKit,
+    EntradaProductos,
+    Envios,
+    InventarioInicial,
+    Kit,
+    MovimientoStock,
+    StockUbicacion,
+    Ventas,
+)
+from bronz_app.costo_promedio import primera_fecha_por_sku, recalcular_costos
+from bronz_app.kits import lista_de_materiales
+from bronz_app.rangos_sucios import al_cerrar_lote, en_lote
+
+OFICINA = MovimientoStock.OFICINA
+BODEGA = MovimientoStock.BODEGA
+AJUSTE = MovimientoStock.AJUSTE
+
+# InventarioInicial no tiene fecha: cuenta desde antes de cualquier movimiento
+FECHA_INICIAL = date(2000, 1, 1)
+
+# Filas {modelo: {pk}} tocadas dentro de agrupar_rangos_sucios(), por hilo
+_pendientes = threading.local()
+
+
+def _venta(kits, sku, cantidad):
+    """Una venta descuenta en bodega su SKU y, si es kit, sus componentes × unidades por kit."""
+    descuenta_stock_propio, componentes = kits.get(sku, (True, []))
+    propios = [(sku, BODEGA, -cantidad)] if descuenta_stock_propio else []
+    return propios + [(componente, BODEGA, -cantidad * unidades) for componente, unidades in componentes]
+
+
+# Tabla fuente → (campos que usa, movimientos [(sku, ubicación, cantidad)] de una fila,
+# dada la lista de materiales de kits). Misma lógica que stock.anotar_stock.
+FUENTES = {
+    InventarioInicial: (('sku', 'stock', 'bodega'), lambda kits, sku, stock, bodega: [(sku, OFICINA, stock), (sku, BODEGA, bodega)]),
+    EntradaProductos: (('sku', 'cantidad_ingresada'), lambda kits, sku, cantidad: [(sku, OFICINA, cantidad)]),
+    Envios: (('sku', 'cantidad'), lambda kits, sku, cantidad: [(sku, OFICINA, -cantidad), (sku, BODEGA, cantidad)]),
+    Ventas: (('sku', 'cantidad'), _venta),
+    AjusteInventario: (('sku', 'cantidad'), lambda kits, sku, cantidad: [(sku, AJUSTE, -cantidad)]),
+}
+
+
+# ——————————————————————————————————————————————————————————————
+# MOVIMIENTOS ESPERADOS vs REGISTRADOS
+# ——————————————————————————————————————————————————————————————
+
+def _a_fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _esperados(modelo, filas, kits):
+    """{(id_origen, fecha, sku, ubicación): cantidad} de filas (id, fecha, sku, *cantidades) de la fuente."""
+    _, movimientos = FUENTES[modelo]
+    esperados = defaultdict(int)
+    for id_origen, fecha, sku, *cantidades in filas:
+        for sku_movimiento, ubicacion, cantidad in movimientos(kits, sku, *[c or 0 for c in cantidades]):
+            esperados[(id_origen, _a_fecha(fecha), sku_movimiento, ubicacion)] += cantidad
+    return esperados
+
+
+def _registrados(tabla, **filtro):
+    """Lo mismo desde movimiento_stock: suma neta por (id_origen, fecha, sku, ubicación)."""
+    return {
+        (id_origen, fecha, sku, ubicacion): total
+        for id_origen, fecha, sku, ubicacion, total in (
+            MovimientoStock.objects.filter(tabla_origen=tabla, **filtro)
+            .values_list('id_origen', 'fecha', 'sku', 'ubicacion')
+            .annotate(total=Sum('cantidad'))
+            .order_by()
+        )
+    }
+
+
+def _agregar_diferencias(tabla, esperados, registrados):
+    """Agrega las filas que llevan el libro de `registrados` a `esperados` y las devuelve."""
+    nuevos = []
+    for clave in set(esperados) | set(registrados):
+        diferencia = esperados.get(clave, 0) - registrados.get(clave, 0)
+        if diferencia:
+            id_origen, fecha, sku, ubicacion = clave
+            nuevos.append(MovimientoStock(
+                fecha=fecha, sku=sku, ubicacion=ubicacion, cantidad=diferencia,
+                tabla_origen=tabla, id_origen=id_origen,
+            ))
+    MovimientoStock.objects.bulk_create(nuevos, batch_size=2000)
+    return nuevos
+
+
+def recalcular_stock_ubicacion(skus=None):
+    """Recalcula stock_ubicacion de los SKUs dados (o de todos) sumando su libro: una lectura indexada y un upsert."""
+    qs = MovimientoStock.objects.all()
+    if skus is not None:
+        if not skus:
+            return 0
+        qs = qs.filter(sku__in=list(skus))
+    filas = [
+        StockUbicacion(sku=sku, ubicacion=ubicacion, cantidad=total)
+        for sku, ubicacion, total in qs.values_list('sku', 'ubicacion').annotate(total=Sum('cantidad')).order_by()
+    ]
+    StockUbicacion.objects.bulk_create(
+        filas,
+        update_conflicts=True,
+        unique_fields=['sku', 'ubicacion'],
+        update_fields=['cantidad'],
+        batch_size=2000,
+    )
+    return len(filas)
+
+
+# ——————————————————————————————————————————————————————————————
+# ESCRITURA: FILA A FILA (SEÑALES) Y POR RANGO (IMPORTS / REGENERACIÓN)
+# ——————————————————————————————————————————————————————————————
+
+def registrar_filas(modelo, pks):
+    """
+    Lleva al libro los movimientos actuales de las filas `pks` de la fuente:
+    agrega la diferencia con lo ya registrado para esos id_origen (una
+    modificación compensa la fila anterior, en su fecha; una fila que ya no
+    existe se anula) y actualiza stock_ubicacion y el costo promedio de esos
+    SKUs desde la fecha más antigua que cambió.
+    """
+    pks = list(pks)
+    if not pks:
+        return []
+    campos, _ = FUENTES[modelo]
+    tabla = modelo._meta.db_table
+    with transaction.atomic():
+        if modelo is InventarioInicial:
+            filas = [(pk, FECHA_INICIAL, *resto) for pk, *resto in modelo.objects.filter(pk__in=pks).values_list('pk', *campos)]
+        else:
+            filas = list(modelo.objects.filter(pk__in=pks).values_list('pk', 'fecha', *campos))
+        kits = lista_de_materiales({fila[2] for fila in filas}) if modelo is Ventas else {}
+        registrados = _registrados(tabla, id_origen__in=pks)
+        nuevos = _agregar_diferencias(tabla, _esperados(modelo, filas, kits), registrados)
+        recalcular_stock_ubicacion({m.sku for m in nuevos})
+        recalcular_costos(primera_fecha_por_sku(nuevos))
+    return nuevos
+
+
+def registrar_fila(modelo, instancia):
+    """registrar_filas() de una fila; dentro de agrupar_rangos_sucios() se difiere al cierre del bloque."""
+    if en_lote():
+        pendientes = getattr(_pendientes, 'filas', None)
+        if pendientes is None:
+            pendientes = _pendientes.filas = defaultdict(set)
+        pendientes[modelo].add(instancia.pk)
+        return
+    registrar_filas(modelo, [instancia.pk])
+
+
+def _registrar_pendientes():
+    pendientes, _pendientes.filas = getattr(_pendientes, 'filas', None) or {}, None
+    kits, _pendientes.kits = getattr(_pendientes, 'kits', False), False
+    if kits:
+        # Resincroniza todas las ventas: cubre también las filas de Ventas pendientes
+        sincronizar_libro_stock(modelos=[Ventas])
+        pendientes.pop(Ventas, None)
+    for modelo, pks in pendientes.items():
+        registrar_filas(modelo, pks)
+
+
+al_cerrar_lote(_registrar_pendientes, orden=10)
+
+
+def sincronizar_libro_stock(desde=None, hasta=None, modelos=None):
+    """
+    Compara las tablas fuente con el libro en [desde, hasta] (sin rango: todo) y
+    agrega solo las diferencias. Para lo que entra sin señales (bulk_create de
+    los imports) y para la carga inicial. InventarioInicial, sin fecha, entra
+    solo sin rango. El costo promedio se recalcula para los SKUs con movimientos
+    nuevos y, con rango, para los que tienen entradas en él (un costo corregido
+    no mueve stock); sin rango ni modelos, para todos. Devuelve el número de
+    filas agregadas.
+    """
+    con_rango = desde is not None and hasta is not None
+    nuevos = []
+    kits = lista_de_materiales()
+    with transaction.atomic():
+        for modelo, (campos, _) in FUENTES.items():
+            if modelos is not None and modelo not in modelos:
+                continue
+            tabla = modelo._meta.db_table
+            if modelo is InventarioInicial:
+                if con_rango:
+                    continue
+                filas = [(pk, FECHA_INICIAL, *resto) for pk, *resto in modelo.objects.values_list('pk', *campos)]
+                registrados = _registrados(tabla)
+            elif con_rango:
+                filas = modelo.objects.filter(fecha__gte=desde, fecha__lte=hasta).values_list('pk', 'fecha', *campos)
+                registrados = _registrados(tabla, fecha__gte=desde, fecha__lte=hasta)
+            else:
+                filas = modelo.objects.values_list('pk', 'fecha', *campos)
+                registrados = _registrados(tabla)
+            nuevos += _agregar_diferencias(tabla, _esperados(modelo, filas, kits), registrados)
+        recalcular_stock_ubicacion({m.sku for m in nuevos})
+
+        if not con_rango and modelos is None:
+            recalcular_costos()
+        else:
+            desde_costos = primera_fecha_por_sku(nuevos)
+            if con_rango and (modelos is None or EntradaProductos in modelos):
+                entradas = EntradaProductos.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+                for sku in entradas.values_list('sku', flat=True).distinct():
+                    desde_costos[sku] = min(_a_fecha(desde), desde_costos.get(sku, _a_fecha(desde)))
+            recalcular_costos(desde_costos)
+    return len(nuevos)
+
+
+# ——————————————————————————————————————————————————————————————
+# LECTURA
+# ——————————————————————————————————————————————————————————————
+
+def stock_actual(skus=None):
+    """{(sku, ubicación): cantidad} desde stock_ubicacion."""
+    qs = StockUbicacion.objects.all()
+    if skus is not None:
+        qs = qs.filter(sku__in=list(skus))
+    return {(sku, ubicacion): cantidad for sku, ubicacion, cantidad in qs.values_list('sku', 'ubicacion', 'cantidad')}
+
+
+def stock_al(fecha, skus=None):
+    """{(sku, ubicación): cantidad} al cierre de `fecha`: suma del libro hasta esa fecha."""
+    qs = MovimientoStock.objects.filter(fecha__lte=fecha)
+    if skus is not None:
+        qs = qs.filter(sku__in=list(skus))
+    return {
+        (sku, ubicacion): total
+        for sku, ubicacion, total in qs.values_list('sku', 'ubicacion').annotate(total=Sum('cantidad')).order_by()
+    }
+
+
+# ——————————————————————————————————————————————————————————————
+# SEÑALES
+# ——————————————————————————————————————————————————————————————
+
+def _despues_de_guardar(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    registrar_fila(sender, instance)
+
+
+def _despues_de_borrar(sender, instance, **kwargs):
+    registrar_fila(sender, instance)
+
+
+def _kits_cambiados(sender, instance, raw=False, **kwargs):
+    # Otra lista de materiales cambia lo que descuenta cada venta: se compensan
+    # todas (dentro de agrupar_rangos_sucios(), una vez al cierre del bloque)
+    if raw:
+        return
+    if en_lote():
+        _pendientes.kits = True
+        return
+    sincronizar_libro_stock(modelos=[Ventas])
+
+
+def conectar_senales():
+    for modelo in FUENTES:
+        uid = f'libro_stock_{modelo.__name__}'
+        post_save.connect(_despues_de_guardar, sender=modelo, dispatch_uid=f'{uid}_post')
+        post_delete.connect(_despues_de_borrar, sender=modelo, dispatch_uid=f'{uid}_del')
+    for modelo in (Kit, ComponenteKit):
+        uid = f'libro_stock_{modelo.__name__}'
+        post_save.connect(_kits_cambiados, sender=modelo, dispatch_uid=f'{uid}_post')
+        post_delete.connect(_kits_cambiados, sender=modelo, dispatch_uid=f'{uid}_del')
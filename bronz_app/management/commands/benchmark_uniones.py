@@ -0,0 +1,143 @@
+# management/commands/benchmark_uniones.py
+
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bronz_app.models import (
+    AsientosContables,
+    Catalogo,
+    MovimientoUnificadoCredito,
+    MovimientoUnificadoDebito,
+    Ventas,
+    VentasConsulta,
+)
+from bronz_app.utils import (
+    poblar_movimientos_unificados_credito,
+    poblar_movimientos_unificados_debito,
+    regenerar_ventas_consulta,
+)
+
+# Año lejano para no mezclar los datos sintéticos con los reales
+INICIO = date(2099, 1, 1)
+FIN = date(2099, 12, 31)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _medir(funcion, *args, **kwargs):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    segundos = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico / (1024 * 1024)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el camino INSERT … SELECT ('sql') con el de bulk_create ('python') "
+        "al poblar union_debitos/union_creditos o ventas_consulta. "
+        "Los datos sintéticos se revierten al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+            help='Cantidades de asientos fuente a generar (default: 10000 100000 1000000)',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Tamaño de lote del bulk_create de datos sintéticos')
+        parser.add_argument(
+            '--tabla', choices=['uniones', 'ventas_consulta'], default='uniones',
+            help='Tabla derivada a medir (default: uniones)',
+        )
+
+    def handle(self, *args, **options):
+        if options['tabla'] == 'ventas_consulta':
+            return self._benchmark_ventas_consulta(options)
+
+        self.stdout.write(f"{'filas':>10} {'modo':>7} {'débitos s':>10} {'créditos s':>11} {'pico MB':>9}")
+        for n in options['filas']:
+            try:
+                with transaction.atomic():
+                    self._generar(n, options['lote'])
+                    for modo in ('python', 'sql'):
+                        _, t_deb, mem_deb = _medir(poblar_movimientos_unificados_debito, INICIO, FIN, modo=modo)
+                        _, t_cre, mem_cre = _medir(poblar_movimientos_unificados_credito, INICIO, FIN, modo=modo)
+                        total = (
+                            MovimientoUnificadoDebito.objects.filter(fecha__gte=INICIO, fecha__lte=FIN).count()
+                            + MovimientoUnificadoCredito.objects.filter(fecha__gte=INICIO, fecha__lte=FIN).count()
+                        )
+                        if total != 2 * n:
+                            self.stderr.write(f"⚠️ {modo}: se esperaban {2 * n} movimientos y hay {total}")
+                        self.stdout.write(
+                            f"{n:>10} {modo:>7} {t_deb:>10.2f} {t_cre:>11.2f} {max(mem_deb, mem_cre):>9.1f}"
+                        )
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _benchmark_ventas_consulta(self, options):
+        self.stdout.write(f"{'filas':>10} {'modo':>7} {'segundos':>9} {'pico MB':>9}")
+        for n in options['filas']:
+            try:
+                with transaction.atomic():
+                    self._generar_ventas(n, options['lote'])
+                    for modo in ('python', 'sql'):
+                        _, segundos, pico = _medir(regenerar_ventas_consulta, INICIO, FIN, modo=modo)
+                        total = VentasConsulta.objects.filter(fecha__gte=INICIO, fecha__lte=FIN).count()
+                        if total != n:
+                            self.stderr.write(f"⚠️ {modo}: se esperaban {n} filas y hay {total}")
+                        self.stdout.write(f"{n:>10} {modo:>7} {segundos:>9.2f} {pico:>9.1f}")
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _generar_ventas(self, n, lote):
+        producto = Catalogo.objects.create(
+            sku='BZBNCH', fecha_ingreso=INICIO, categoria='Benchmark', producto='Benchmark',
+            numero_lote='0', costo_promedio_neto=Decimal('1234.50'),
+        )
+        objetos = []
+        for i in range(n):
+            objetos.append(Ventas(
+                fecha=INICIO + timedelta(days=i % 365),
+                sku=producto,
+                cantidad=1 + i % 5,
+                valor_unitario_venta=9990,
+                iva_calculo=0,
+                iva=0,
+                venta_neta_de_iva=8395,
+                comentario=f'benchmark {i}',
+            ))
+            if len(objetos) >= lote:
+                Ventas.objects.bulk_create(objetos)
+                objetos = []
+        if objetos:
+            Ventas.objects.bulk_create(objetos)
+
+    def _generar(self, n, lote):
+        objetos = []
+        for i in range(n):
+            monto = Decimal(1000 + i % 997)
+            objetos.append(AsientosContables(
+                fecha=INICIO + timedelta(days=i % 365),
+                monto=monto,
+                debito=monto,
+                credito=monto,
+                cuenta_debito='1010100',
+                cuenta_credito='3010300',
+                comentario=f'benchmark {i}',
+            ))
+            if len(objetos) >= lote:
+                AsientosContables.objects.bulk_create(objetos)
+                objetos = []
+        if objetos:
+            AsientosContables.objects.bulk_create(objetos)
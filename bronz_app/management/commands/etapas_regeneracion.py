@@ -0,0 +1,39 @@
+# management/commands/etapas_regeneracion.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bronz_app.coordinador_regeneracion import candado_regeneracion
+from bronz_app.etapas import ejecutar_etapas, etapas_regeneracion, puede_paralelizar
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera las tablas derivadas con el DAG de etapas e imprime el tiempo de "
+        "cada etapa y el camino crítico (VentasConsulta → uniones → resúmenes → ResumenMensual)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, nargs='+', default=[1, 4],
+                            help='Cantidades de hilos a medir, en orden (default: 1 4)')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial YYYY-MM-DD (default: todo)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final YYYY-MM-DD (default: todo)')
+
+    def handle(self, *args, **options):
+        if bool(options['desde']) != bool(options['hasta']):
+            raise CommandError("Indique --desde y --hasta juntos, o ninguno.")
+        rangos = [(options['desde'], options['hasta'])]
+
+        for hilos in options['hilos']:
+            if hilos > 1 and not puede_paralelizar(hilos):
+                self.stderr.write(f"⚠️ hilos={hilos}: el paralelo solo aplica en PostgreSQL; se omite.")
+                continue
+            with candado_regeneracion():
+                resultado = ejecutar_etapas(etapas_regeneracion(rangos), hilos=hilos)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\nhilos={hilos}"))
+            self.stdout.write(f"{'etapa':<48} {'inicio s':>9} {'segundos':>9}")
+            for nombre, (inicio, fin) in sorted(resultado.tiempos.items(), key=lambda t: t[1][0]):
+                self.stdout.write(f"{nombre:<48} {inicio:>9.2f} {fin - inicio:>9.2f}")
+            self.stdout.write(self.style.SUCCESS(resultado.resumen()))
@@ -0,0 +1,106 @@
+# management/commands/explain_reportes.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from bronz_app.models import (
+    AsientosContables,
+    BalanceInicial,
+    EntradaProductos,
+    MovimientoUnificadoCredito,
+    MovimientoUnificadoDebito,
+    OtrosGastos,
+    SaldoDiario,
+    SueldosHonorarios,
+    Ventas,
+    VentasConsulta,
+)
+from bronz_app.motor_balance import consulta_al_corte
+
+# Modelos cuyos índices (Meta.indexes) se comparan
+MODELOS_INDEXADOS = (
+    MovimientoUnificadoDebito,
+    MovimientoUnificadoCredito,
+    Ventas,
+    OtrosGastos,
+    SueldosHonorarios,
+    AsientosContables,
+    EntradaProductos,
+    BalanceInicial,
+    VentasConsulta,
+    SaldoDiario,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def consultas_reportes(cuenta, desde, hasta):
+    """Las consultas más pesadas de los reportes, tal como las arman las vistas."""
+    rango = {'fecha__gte': desde, 'fecha__lte': hasta}
+    return [
+        # consult_app.views.movimientos_cuenta_view
+        ('movimientos_cuenta: débitos de la cuenta',
+         MovimientoUnificadoDebito.objects.filter(cta_debito=cuenta, **rango)
+         .values('fecha', 'cta_debito', 'monto_debito', 'texto_coment', 'tabla_origen').order_by('fecha', 'id')),
+        ('movimientos_cuenta: total créditos de la cuenta',
+         MovimientoUnificadoCredito.objects.filter(cta_credito=cuenta, **rango)
+         .values('cta_credito').annotate(total=Sum('monto_credito')).order_by()),
+        # consult_app.views.movimientos_por_rango_view
+        ('movimientos_por_rango: débitos por cuenta',
+         MovimientoUnificadoDebito.objects.filter(**rango)
+         .values('cta_debito').annotate(total_debito=Sum('monto_debito'), n_debito=Count('id')).order_by()),
+        ('movimientos_por_rango: créditos por cuenta',
+         MovimientoUnificadoCredito.objects.filter(**rango)
+         .values('cta_credito').annotate(total_credito=Sum('monto_credito'), n_credito=Count('id')).order_by()),
+        # bronz_app.views.balance_segun_fecha_view (motor_balance.balance_al_corte)
+        ('balance_segun_fecha: acumulados al corte (saldo_diario)', consulta_al_corte(hasta)),
+        # Borrado por rango al regenerar (VentasConsulta / uniones leen las fuentes por fecha)
+        ('regeneración: ventas del rango', Ventas.objects.filter(**rango).values('id')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Imprime EXPLAIN (ANALYZE en PostgreSQL) de las consultas de movimientos_cuenta, "
+        "movimientos_por_rango y balance_segun_fecha, sin y con los índices de fecha/cuenta."
+    )
+
+    def add_arguments(self, parser):
+        hoy = date.today()
+        parser.add_argument('--cuenta', type=int, default=1010100, help='Cuenta a consultar (default: 1010100)')
+        parser.add_argument('--desde', type=date.fromisoformat, default=date(hoy.year, 1, 1), help='YYYY-MM-DD (default: 1 de enero)')
+        parser.add_argument('--hasta', type=date.fromisoformat, default=hoy, help='YYYY-MM-DD (default: hoy)')
+        parser.add_argument('--solo-actual', action='store_true', help='No compara sin índices; solo el plan actual')
+
+    def handle(self, *args, **options):
+        consultas = consultas_reportes(options['cuenta'], options['desde'], options['hasta'])
+
+        if not options['solo_actual']:
+            # DROP INDEX es transaccional en PostgreSQL y SQLite: se revierte al final.
+            # Mientras dura, las tablas quedan bloqueadas: correr fuera de horario.
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    for modelo in MODELOS_INDEXADOS:
+                        for indice in modelo._meta.indexes:
+                            cursor.execute(f"DROP INDEX {connection.ops.quote_name(indice.name)}")
+                    self._imprimir('SIN ÍNDICES', consultas)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        self._imprimir('CON ÍNDICES', consultas)
+
+    def _imprimir(self, titulo, consultas):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n======== {titulo} ========"))
+        analizar = connection.vendor == 'postgresql'
+        for nombre, qs in consultas:
+            self.stdout.write(self.style.SUCCESS(f"\n— {nombre}"))
+            if analizar:
+                self.stdout.write(qs.explain(analyze=True, buffers=True))
+            else:
+                self.stdout.write(qs.explain())
@@ -0,0 +1,42 @@
+# management/commands/trabajos_worker.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from bronz_app.trabajos import nombre_worker, procesar_pendientes, recuperar_colgados
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta los trabajos en segundo plano encolados en trabajos_fondo "
+        "(procesar_todo, regeneraciones del admin, resultados mensuales)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=1, help='Trabajos en paralelo (default: 1)')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas a la cola (default: 2)')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+        parser.add_argument(
+            '--colgados-min', type=int, default=120,
+            help="Al iniciar, marca como error los trabajos 'en curso' más viejos que N minutos (default: 120)",
+        )
+
+    def handle(self, *args, **options):
+        worker = nombre_worker('worker')
+        colgados = recuperar_colgados(options['colgados_min'])
+        if colgados:
+            self.stdout.write(self.style.WARNING(f"⚠️ {colgados} trabajos colgados marcados como error"))
+
+        self.stdout.write(f"👷 {worker} esperando trabajos (hilos={options['hilos']})")
+        try:
+            while True:
+                n = procesar_pendientes(hilos=options['hilos'], worker=worker)
+                if n:
+                    self.stdout.write(self.style.SUCCESS(f"✅ {n} trabajos procesados"))
+                if options['una_vez']:
+                    break
+                if not n:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write("Worker detenido.")
@@ -0,0 +1,48 @@
+# management/commands/vistas_materializadas.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bronz_app.vistas_materializadas import (
+    MODELOS_UNION,
+    crear_vista_materializada,
+    eliminar_vista_materializada,
+    es_vista_materializada,
+    refrescar_vista_materializada,
+    usar_vistas_materializadas,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Administra el backend de vistas materializadas (PostgreSQL) para "
+        "union_debitos/union_creditos. Requiere BRONZ_UNION_BACKEND='vista_materializada'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('accion', choices=['crear', 'eliminar', 'refrescar', 'estado'])
+
+    def handle(self, *args, **options):
+        accion = options['accion']
+        if not usar_vistas_materializadas():
+            raise CommandError(
+                "Backend no disponible: se requiere PostgreSQL y BRONZ_UNION_BACKEND='vista_materializada'."
+            )
+
+        for modelo in MODELOS_UNION:
+            tabla = modelo._meta.db_table
+            instalada = es_vista_materializada(modelo)
+
+            if accion == 'estado':
+                self.stdout.write(f"{tabla}: {'vista materializada' if instalada else 'tabla'}")
+            elif accion == 'crear':
+                crear_vista_materializada(modelo)
+                self.stdout.write(self.style.SUCCESS(f"✅ {tabla} creada como vista materializada."))
+            elif accion == 'eliminar':
+                if instalada:
+                    eliminar_vista_materializada(modelo)
+                    self.stdout.write(self.style.SUCCESS(f"✅ {tabla} vuelve a ser tabla (ejecute procesar_todo)."))
+            elif accion == 'refrescar':
+                if not instalada:
+                    raise CommandError(f"{tabla} no es vista materializada; use 'crear' primero.")
+                total = refrescar_vista_materializada(modelo)
+                self.stdout.write(self.style.SUCCESS(f"✅ {tabla} refrescada: {total} filas."))
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    # Primera regeneración incremental: reconstruir todo el libro una vez.
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Migración inicial')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0014_shopify_textfields_definitive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RangoSucio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField(blank=True, null=True)),
+                ('fecha_hasta', models.DateField(blank=True, null=True)),
+                ('tabla_origen', models.CharField(max_length=50)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Rango Sucio',
+                'verbose_name_plural': 'Rangos Sucios',
+                'db_table': 'rangos_sucios',
+                'ordering': ['fecha_desde'],
+            },
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0015_rangosucio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionLibro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión Libro',
+                'verbose_name_plural': 'Versión Libro',
+                'db_table': 'version_libro',
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotLibro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('panel_year', models.IntegerField()),
+                ('version', models.PositiveBigIntegerField()),
+                ('debitos', models.JSONField(default=dict)),
+                ('creditos', models.JSONField(default=dict)),
+                ('matriz', models.JSONField(default=dict)),
+                ('calculado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot Libro',
+                'verbose_name_plural': 'Snapshots Libro',
+                'db_table': 'snapshot_libro',
+                'unique_together': {('panel_year', 'version')},
+            },
+        ),
+    ]
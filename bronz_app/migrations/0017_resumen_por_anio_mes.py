@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+
+def vaciar_resumenes(apps, schema_editor):
+    # Los resúmenes son derivados y no tienen año: se vacían y se recalculan.
+    apps.get_model('bronz_app', 'ResumenCredito').objects.all().delete()
+    apps.get_model('bronz_app', 'ResumenDebito').objects.all().delete()
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Resúmenes por año')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0016_versionlibro_snapshotlibro'),
+    ]
+
+    operations = [
+        migrations.RunPython(vaciar_resumenes, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='resumencredito',
+            name='anio',
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='resumencredito',
+            name='mes',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='resumendebito',
+            name='anio',
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='resumendebito',
+            name='mes',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='resumencredito',
+            unique_together={('anio', 'mes', 'cuenta_credito')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='resumendebito',
+            unique_together={('anio', 'mes', 'cuenta_debito')},
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0017_resumen_por_anio_mes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaRegeneracion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ejecutadas', models.PositiveBigIntegerField(default=0)),
+                ('coalescidas', models.PositiveBigIntegerField(default=0)),
+                ('sin_cambios', models.PositiveBigIntegerField(default=0)),
+                ('espera_total_ms', models.PositiveBigIntegerField(default=0)),
+                ('ultima_duracion_ms', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Métrica Regeneración',
+                'verbose_name_plural': 'Métricas Regeneración',
+                'db_table': 'metrica_regeneracion',
+            },
+        ),
+    ]
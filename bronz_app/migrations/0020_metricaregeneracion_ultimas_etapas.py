@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0019_trabajofondo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metricaregeneracion',
+            name='ultimas_etapas',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0020_metricaregeneracion_ultimas_etapas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asientoscontables',
+            index=models.Index(fields=['fecha'], name='asientos_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entradaproductos',
+            index=models.Index(fields=['fecha'], name='entrada_prod_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entradaproductos',
+            index=models.Index(fields=['sku', 'fecha'], name='entrada_prod_sku_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otrosgastos',
+            index=models.Index(fields=['fecha'], name='otros_gastos_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sueldoshonorarios',
+            index=models.Index(fields=['fecha'], name='sueldos_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balanceinicial',
+            index=models.Index(fields=['fecha'], name='balance_ini_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['fecha'], name='ventas_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['sku', 'fecha'], name='ventas_sku_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientounificadocredito',
+            index=models.Index(fields=['fecha'], name='union_cred_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientounificadocredito',
+            index=models.Index(fields=['cta_credito', 'fecha'], name='union_cred_cta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientounificadodebito',
+            index=models.Index(fields=['fecha'], name='union_deb_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientounificadodebito',
+            index=models.Index(fields=['cta_debito', 'fecha'], name='union_deb_cta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventasconsulta',
+            index=models.Index(fields=['fecha'], name='ventas_consulta_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def vaciar_snapshots(apps, schema_editor):
+    # La matriz de los snapshots se armaba con Pe/G hasta 3010300; el motor de
+    # balance usa 3030300 como el balance. Se recalculan en la próxima lectura.
+    apps.get_model('bronz_app', 'SnapshotLibro').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0021_indices_fecha_cuenta'),
+    ]
+
+    operations = [
+        migrations.RunPython(vaciar_snapshots, migrations.RunPython.noop),
+    ]
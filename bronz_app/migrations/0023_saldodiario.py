@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    # saldo_diario nace vacío: se llena en la próxima regeneración completa
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Saldo diario')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0022_vaciar_snapshots_libro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuenta', models.IntegerField()),
+                ('fecha', models.DateField()),
+                ('debito_dia', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credito_dia', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('debito_acum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('credito_acum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Saldo Diario',
+                'verbose_name_plural': 'Saldos Diarios',
+                'db_table': 'saldo_diario',
+                'unique_together': {('cuenta', 'fecha')},
+                'indexes': [models.Index(fields=['fecha'], name='saldo_diario_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    # cubo_cuenta_mes nace vacío: se llena en la próxima regeneración completa
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Cubo cuenta-mes')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0023_saldodiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuboCuentaMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('cuenta', models.IntegerField()),
+                ('debito', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('credito', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('n_debitos', models.PositiveIntegerField(default=0)),
+                ('n_creditos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Cubo Cuenta-Mes',
+                'verbose_name_plural': 'Cubo Cuenta-Mes',
+                'db_table': 'cubo_cuenta_mes',
+                'unique_together': {('anio', 'mes', 'cuenta')},
+                'indexes': [models.Index(fields=['cuenta', 'anio', 'mes'], name='cubo_cuenta_mes_cta_idx')],
+            },
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    # plan_cuentas y rollup_cuenta_mes se llenan en la próxima regeneración completa
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Plan de cuentas')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0024_cubocuentames'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuentaPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=7, unique=True)),
+                ('nivel', models.PositiveSmallIntegerField(choices=[(1, 'Clase'), (2, 'Grupo'), (3, 'Subgrupo'), (4, 'Cuenta')])),
+                ('nombre', models.CharField(blank=True, default='', max_length=200)),
+                ('padre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hijos', to='bronz_app.cuentaplan')),
+            ],
+            options={
+                'verbose_name': 'Cuenta del Plan',
+                'verbose_name_plural': 'Plan de Cuentas',
+                'db_table': 'plan_cuentas',
+                'ordering': ['prefijo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupCuentaMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('debito', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('credito', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('n_movimientos', models.PositiveIntegerField(default=0)),
+                ('nodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='bronz_app.cuentaplan')),
+            ],
+            options={
+                'verbose_name': 'Total por Nivel y Mes',
+                'verbose_name_plural': 'Totales por Nivel y Mes',
+                'db_table': 'rollup_cuenta_mes',
+                'unique_together': {('nodo', 'anio', 'mes')},
+                'indexes': [models.Index(fields=['anio', 'mes'], name='rollup_cuenta_mes_mes_idx')],
+            },
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0025_plan_cuentas_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotIndicadores',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('panel_year', models.IntegerField()),
+                ('version', models.PositiveBigIntegerField()),
+                ('datos', models.JSONField(default=dict)),
+                ('calculado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot Indicadores',
+                'verbose_name_plural': 'Snapshots Indicadores',
+                'db_table': 'snapshot_indicadores',
+                'unique_together': {('panel_year', 'version')},
+            },
+        ),
+    ]
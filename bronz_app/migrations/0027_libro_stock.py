@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    # movimiento_stock y stock_ubicacion se llenan en la próxima regeneración completa
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Libro de stock')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0026_snapshotindicadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('sku', models.CharField(max_length=6)),
+                ('ubicacion', models.CharField(choices=[('oficina', 'Oficina'), ('bodega', 'Bodega'), ('ajuste', 'Ajustes')], max_length=10)),
+                ('cantidad', models.IntegerField()),
+                ('tabla_origen', models.CharField(max_length=50)),
+                ('id_origen', models.IntegerField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'db_table': 'movimiento_stock',
+                'indexes': [
+                    models.Index(fields=['sku', 'ubicacion', 'fecha'], name='movimiento_stock_sku_idx'),
+                    models.Index(fields=['tabla_origen', 'id_origen'], name='movimiento_stock_origen_idx'),
+                    models.Index(fields=['fecha'], name='movimiento_stock_fecha_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockUbicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=6)),
+                ('ubicacion', models.CharField(choices=[('oficina', 'Oficina'), ('bodega', 'Bodega'), ('ajuste', 'Ajustes')], max_length=10)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Stock por Ubicación',
+                'verbose_name_plural': 'Stock por Ubicación',
+                'db_table': 'stock_ubicacion',
+                'unique_together': {('sku', 'ubicacion')},
+            },
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
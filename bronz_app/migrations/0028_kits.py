@@ -0,0 +1,63 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Packs que estaban fijos en el código (stock.VENTAS_ADICIONALES / SIN_DESCUENTO_PROPIO
+# y consult_app._ajustar_pack_bb0003): sku → (descuenta_stock_propio, componentes)
+KITS_INICIALES = {
+    'BB0003': (False, ['BB0001', 'BB0002']),
+    'BB0012': (True, ['BB0001', 'BB0002', 'BB0009', 'BB0010']),
+}
+
+
+def crear_kits_iniciales(apps, schema_editor):
+    Catalogo = apps.get_model('bronz_app', 'Catalogo')
+    Kit = apps.get_model('bronz_app', 'Kit')
+    ComponenteKit = apps.get_model('bronz_app', 'ComponenteKit')
+    existentes = set(Catalogo.objects.values_list('sku', flat=True))
+    for sku, (descuenta_stock_propio, componentes) in KITS_INICIALES.items():
+        if sku not in existentes:
+            continue
+        kit = Kit.objects.create(sku_id=sku, descuenta_stock_propio=descuenta_stock_propio)
+        ComponenteKit.objects.bulk_create([
+            ComponenteKit(kit=kit, componente_id=componente, cantidad=1)
+            for componente in componentes if componente in existentes
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0027_libro_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Kit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descuenta_stock_propio', models.BooleanField(default=False, verbose_name='Descuenta stock propio')),
+                ('sku', models.OneToOneField(db_column='sku', on_delete=django.db.models.deletion.PROTECT, related_name='kit', to='bronz_app.catalogo', to_field='sku', verbose_name='SKU del kit')),
+            ],
+            options={
+                'verbose_name': 'Kit',
+                'verbose_name_plural': 'Kits',
+                'db_table': 'kit',
+            },
+        ),
+        migrations.CreateModel(
+            name='ComponenteKit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=1, verbose_name='Unidades por kit')),
+                ('componente', models.ForeignKey(db_column='componente', on_delete=django.db.models.deletion.PROTECT, related_name='en_kits', to='bronz_app.catalogo', to_field='sku', verbose_name='SKU componente')),
+                ('kit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='componentes', to='bronz_app.kit')),
+            ],
+            options={
+                'verbose_name': 'Componente de Kit',
+                'verbose_name_plural': 'Componentes de Kit',
+                'db_table': 'componente_kit',
+                'unique_together': {('kit', 'componente')},
+            },
+        ),
+        migrations.RunPython(crear_kits_iniciales, migrations.RunPython.noop),
+    ]
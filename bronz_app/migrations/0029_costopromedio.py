@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+def marcar_todo_sucio(apps, schema_editor):
+    # costo_promedio se calcula y VentasConsulta se re-costea en la próxima regeneración completa
+    RangoSucio = apps.get_model('bronz_app', 'RangoSucio')
+    RangoSucio.objects.create(tabla_origen='Costo promedio')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0028_kits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostoPromedio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=6)),
+                ('fecha', models.DateField()),
+                ('stock_previo', models.IntegerField()),
+                ('cantidad', models.IntegerField()),
+                ('costo_entradas', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('costo_promedio', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Costo Promedio',
+                'verbose_name_plural': 'Costos Promedio',
+                'db_table': 'costo_promedio',
+                'unique_together': {('sku', 'fecha')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ventasconsulta',
+            index=models.Index(fields=['codigo_producto', 'fecha'], name='ventas_consulta_sku_idx'),
+        ),
+        migrations.RunPython(marcar_todo_sucio, migrations.RunPython.noop),
+    ]
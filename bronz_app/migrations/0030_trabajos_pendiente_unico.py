@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def quitar_duplicados(apps, schema_editor):
+    # Deja el pendiente más antiguo de cada (tipo, parámetros); los repetidos harían lo mismo
+    TrabajoFondo = apps.get_model('bronz_app', 'TrabajoFondo')
+    vistos = set()
+    repetidos = []
+    for pk, tipo, parametros in (
+        TrabajoFondo.objects.filter(estado='pendiente').order_by('creado', 'pk').values_list('pk', 'tipo', 'parametros')
+    ):
+        clave = (tipo, repr(sorted((parametros or {}).items())))
+        if clave in vistos:
+            repetidos.append(pk)
+        else:
+            vistos.add(clave)
+    TrabajoFondo.objects.filter(pk__in=repetidos).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bronz_app', '0029_costopromedio'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trabajofondo',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('estado', 'pendiente')),
+                fields=('tipo', 'parametros'),
+                name='trabajos_pendiente_unico',
+            ),
+        ),
+    ]
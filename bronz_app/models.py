@@ -62,6 +62,9 @@ class AsientosContables(models.Model):
         db_table = 'asientos_contables'
         verbose_name = 'Asiento contable'
         verbose_name_plural = 'Asientos contables'
+        indexes = [
+            models.Index(fields=['fecha'], name='asientos_fecha_idx'),
+        ]
         
         
     def save(self, *args, **kwargs):
@@ -384,6 +387,10 @@ class EntradaProductos(models.Model):
         db_table = 'entrada_productos'
         verbose_name = 'Entrada de Producto'
         verbose_name_plural = 'Entradas de Productos'
+        indexes = [
+            models.Index(fields=['fecha'], name='entrada_prod_fecha_idx'),
+            models.Index(fields=['sku', 'fecha'], name='entrada_prod_sku_fecha_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         """
@@ -576,6 +583,9 @@ class OtrosGastos(models.Model):
         db_table = 'otros_gastos'
         verbose_name = 'Otro Gasto'
         verbose_name_plural = 'Otros Gastos'
+        indexes = [
+            models.Index(fields=['fecha'], name='otros_gastos_fecha_idx'),
+        ]
         
     
 
@@ -746,6 +756,9 @@ class SueldosHonorarios(models.Model):
         db_table = 'sueldos'
         verbose_name = 'Sueldo u Honorario'
         verbose_name_plural = 'Sueldos u Honorarios'
+        indexes = [
+            models.Index(fields=['fecha'], name='sueldos_fecha_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Calculo de retenciones solo si es HONORARIOS
@@ -834,6 +847,9 @@ class BalanceInicial(models.Model):
         db_table = 'balance_inicial'
         verbose_name = 'Balance Inicial'
         verbose_name_plural = 'Balance Inicial'
+        indexes = [
+            models.Index(fields=['fecha'], name='balance_ini_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.fecha} — Débito: {self.debito} / Crédito: {self.credito}"
@@ -1304,6 +1320,10 @@ class Ventas(models.Model):
         db_table = 'ventas'
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
+        indexes = [
+            models.Index(fields=['fecha'], name='ventas_fecha_idx'),
+            models.Index(fields=['sku', 'fecha'], name='ventas_sku_fecha_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         """
@@ -1510,6 +1530,10 @@ class MovimientoUnificadoCredito(models.Model):
         db_table = 'union_creditos'
         verbose_name = 'Union Credito'
         verbose_name_plural = 'Union Creditos'
+        indexes = [
+            models.Index(fields=['fecha'], name='union_cred_fecha_idx'),
+            models.Index(fields=['cta_credito', 'fecha'], name='union_cred_cta_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.fecha} — {self.tabla_origen} — {self.monto_credito}"
@@ -1530,6 +1554,10 @@ class MovimientoUnificadoDebito(models.Model):
         db_table = 'union_debitos'
         verbose_name = 'Union Debito'
         verbose_name_plural = 'Union Debitos'
+        indexes = [
+            models.Index(fields=['fecha'], name='union_deb_fecha_idx'),
+            models.Index(fields=['cta_debito', 'fecha'], name='union_deb_cta_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.fecha} — {self.tabla_origen} — {self.monto_debito}"
@@ -1564,12 +1592,18 @@ class VentasConsulta(models.Model):
 
     class Meta:
         db_table = "ventas_consulta"
+        indexes = [
+            models.Index(fields=['fecha'], name='ventas_consulta_fecha_idx'),
+            models.Index(fields=['codigo_producto', 'fecha'], name='ventas_consulta_sku_idx'),
+        ]
 
 # ——————————————————————————————————————————————————————————————
 # 10) Modelo: SUMA CREDITOS
 # ——————————————————————————————————————————————————————————————
 
 class ResumenCredito(models.Model):
+    anio = models.IntegerField()                  # año fiscal
+    mes = models.PositiveSmallIntegerField()      # período 1..12
     cuenta_credito = models.IntegerField()
     total_credito = models.DecimalField(max_digits=14, decimal_places=2)
 
@@ -1577,15 +1611,18 @@ class ResumenCredito(models.Model):
         db_table = 'suma_creditos'
         verbose_name = 'Suma Crédito'
         verbose_name_plural = 'Suma Créditos'
+        unique_together = ('anio', 'mes', 'cuenta_credito')
 
     def __str__(self):
-        return f"Crédito — {self.cuenta_credito}: {self.total_credito}"
+        return f"Crédito {self.anio}-{self.mes:02d} — {self.cuenta_credito}: {self.total_credito}"
 
 # ——————————————————————————————————————————————————————————————
 # 10) Modelo: SUMA DEBITOS
 # ——————————————————————————————————————————————————————————————
 
 class ResumenDebito(models.Model):
+    anio = models.IntegerField()                  # año fiscal
+    mes = models.PositiveSmallIntegerField()      # período 1..12
     cuenta_debito = models.IntegerField()
     total_debito = models.DecimalField(max_digits=14, decimal_places=2)
 
@@ -1593,11 +1630,125 @@ class ResumenDebito(models.Model):
         db_table = 'suma_debitos'
         verbose_name = 'Suma Débito'
         verbose_name_plural = 'Suma Débitos'
+        unique_together = ('anio', 'mes', 'cuenta_debito')
 
     def __str__(self):
-        return f"Débito — {self.cuenta_debito}: {self.total_debito}"
+        return f"Débito {self.anio}-{self.mes:02d} — {self.cuenta_debito}: {self.total_debito}"
+
+
+# ——————————————————————————————————————————————————————————————
+# 10) Modelo: SALDO DIARIO ACUMULADO (índice de sumas prefijas)
+# ——————————————————————————————————————————————————————————————
+
+class SaldoDiario(models.Model):
+    """
+    Débitos y créditos de una cuenta en un día con movimientos, y sus sumas
+    acumuladas desde el 1 de enero del mismo año. El balance a una fecha de
+    corte es la última fila de cada cuenta con fecha <= corte.
+    """
+    cuenta        = models.IntegerField()
+    fecha         = models.DateField()
+    debito_dia    = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credito_dia   = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    debito_acum   = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    credito_acum  = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'saldo_diario'
+        verbose_name = 'Saldo Diario'
+        verbose_name_plural = 'Saldos Diarios'
+        unique_together = ('cuenta', 'fecha')
+        indexes = [
+            models.Index(fields=['fecha'], name='saldo_diario_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cuenta} {self.fecha}: D {self.debito_acum} / C {self.credito_acum}"
+
+
+# ——————————————————————————————————————————————————————————————
+# 10) Modelo: CUBO CUENTA × MES (base de los reportes)
+# ——————————————————————————————————————————————————————————————
+
+class CuboCuentaMes(models.Model):
+    """
+    Débitos, créditos y número de movimientos de una cuenta en un mes, desde
+    union_debitos / union_creditos. Se recalcula solo en los meses tocados
+    por escrituras; los reportes lo leen con bronz_app.cubo en vez del libro.
+    """
+    anio       = models.IntegerField()
+    mes        = models.PositiveSmallIntegerField()
+    cuenta     = models.IntegerField()
+    debito     = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    credito    = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    n_debitos  = models.PositiveIntegerField(default=0)
+    n_creditos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'cubo_cuenta_mes'
+        verbose_name = 'Cubo Cuenta-Mes'
+        verbose_name_plural = 'Cubo Cuenta-Mes'
+        unique_together = ('anio', 'mes', 'cuenta')
+        indexes = [
+            models.Index(fields=['cuenta', 'anio', 'mes'], name='cubo_cuenta_mes_cta_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cuenta} {self.anio}-{self.mes:02d}: D {self.debito} / C {self.credito}"
+
+
+# ——————————————————————————————————————————————————————————————
+# 10) Modelo: PLAN DE CUENTAS JERÁRQUICO Y TOTALES POR NIVEL
+# ——————————————————————————————————————————————————————————————
+
+class CuentaPlan(models.Model):
+    """
+    Nodo del plan de cuentas derivado del código: clase (1 dígito), grupo (3),
+    subgrupo (5) y cuenta (7). P. ej. 1010101 → 1 → 101 → 10101 → 1010101.
+    """
+    NIVELES = [
+        (1, 'Clase'),
+        (2, 'Grupo'),
+        (3, 'Subgrupo'),
+        (4, 'Cuenta'),
+    ]
+    prefijo = models.CharField(max_length=7, unique=True)
+    nivel   = models.PositiveSmallIntegerField(choices=NIVELES)
+    nombre  = models.CharField(max_length=200, blank=True, default='')
+    padre   = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='hijos')
+
+    class Meta:
+        db_table = 'plan_cuentas'
+        verbose_name = 'Cuenta del Plan'
+        verbose_name_plural = 'Plan de Cuentas'
+        ordering = ['prefijo']
+
+    def __str__(self):
+        return f"{self.prefijo} {self.nombre}"
+
+
+class RollupCuentaMes(models.Model):
+    """Débitos, créditos y movimientos de un nodo del plan (y todo lo que cuelga de él) en un mes."""
+    nodo          = models.ForeignKey(CuentaPlan, on_delete=models.CASCADE, related_name='rollups')
+    anio          = models.IntegerField()
+    mes           = models.PositiveSmallIntegerField()
+    debito        = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    credito       = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    n_movimientos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'rollup_cuenta_mes'
+        verbose_name = 'Total por Nivel y Mes'
+        verbose_name_plural = 'Totales por Nivel y Mes'
+        unique_together = ('nodo', 'anio', 'mes')
+        indexes = [
+            models.Index(fields=['anio', 'mes'], name='rollup_cuenta_mes_mes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nodo.prefijo} {self.anio}-{self.mes:02d}: D {self.debito} / C {self.credito}"
+
 
-    
 # ——————————————————————————————————————————————————————————————
 # 10) Modelo: TABLAS PARA INVENTARIO
 # ——————————————————————————————————————————————————————————————
@@ -1660,6 +1811,139 @@ class InvEPVP(models.Model):
         managed = False
         db_table = 'invEP_VP'
 
+# ——————————————————————————————————————————————————————————————
+# 10) Modelo: LIBRO DE MOVIMIENTOS DE STOCK y STOCK POR UBICACIÓN
+# ——————————————————————————————————————————————————————————————
+
+class MovimientoStock(models.Model):
+    """
+    Libro de stock: cantidad con signo de un SKU en una ubicación, por fila de
+    una tabla fuente (inventario inicial, entradas, envíos, ventas, ajustes).
+    Solo se agregan filas: un cambio o un borrado en la fuente agrega la fila
+    que compensa (ver bronz_app.libro_stock).
+    """
+    OFICINA = 'oficina'
+    BODEGA  = 'bodega'
+    AJUSTE  = 'ajuste'     # Ajustes de inventario: sin ubicación, solo cuentan en el total
+    UBICACIONES = [
+        (OFICINA, 'Oficina'),
+        (BODEGA, 'Bodega'),
+        (AJUSTE, 'Ajustes'),
+    ]
+
+    fecha        = models.DateField()
+    sku          = models.CharField(max_length=6)
+    ubicacion    = models.CharField(max_length=10, choices=UBICACIONES)
+    cantidad     = models.IntegerField()
+    tabla_origen = models.CharField(max_length=50)
+    id_origen    = models.IntegerField()
+    creado       = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'movimiento_stock'
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        indexes = [
+            models.Index(fields=['sku', 'ubicacion', 'fecha'], name='movimiento_stock_sku_idx'),
+            models.Index(fields=['tabla_origen', 'id_origen'], name='movimiento_stock_origen_idx'),
+            models.Index(fields=['fecha'], name='movimiento_stock_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.sku} {self.ubicacion}: {self.cantidad:+d} ({self.tabla_origen} #{self.id_origen})"
+
+
+class StockUbicacion(models.Model):
+    """Stock actual de un SKU en una ubicación: suma de sus filas en movimiento_stock."""
+    sku       = models.CharField(max_length=6)
+    ubicacion = models.CharField(max_length=10, choices=MovimientoStock.UBICACIONES)
+    cantidad  = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'stock_ubicacion'
+        verbose_name = 'Stock por Ubicación'
+        verbose_name_plural = 'Stock por Ubicación'
+        unique_together = ('sku', 'ubicacion')
+
+    def __str__(self):
+        return f"{self.sku} {self.ubicacion}: {self.cantidad}"
+
+
+class CostoPromedio(models.Model):
+    """
+    Costo promedio ponderado móvil de un SKU vigente desde `fecha`: una fila por
+    día con entradas de productos. Antes de la primera fila rige
+    Catalogo.costo_promedio_neto (costo de apertura). Ver bronz_app.costo_promedio.
+    """
+    sku            = models.CharField(max_length=6)
+    fecha          = models.DateField()
+    stock_previo   = models.IntegerField()     # existencias al cierre del día anterior (libro de stock)
+    cantidad       = models.IntegerField()     # unidades ingresadas en el día
+    costo_entradas = models.DecimalField(max_digits=16, decimal_places=2)   # costo neto de esas unidades
+    costo_promedio = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'costo_promedio'
+        verbose_name = 'Costo Promedio'
+        verbose_name_plural = 'Costos Promedio'
+        # También es el índice de la búsqueda "último costo con fecha <= venta"
+        unique_together = ('sku', 'fecha')
+
+    def __str__(self):
+        return f"{self.sku} desde {self.fecha}: {self.costo_promedio}"
+
+
+# ——————————————————————————————————————————————————————————————
+# 11) Modelo: KITS / PACKS (LISTA DE MATERIALES)
+# ——————————————————————————————————————————————————————————————
+
+class Kit(models.Model):
+    """
+    SKU que se vende como pack: cada venta consume sus componentes
+    (ComponenteKit). Ver bronz_app.kits.
+    """
+    sku = models.OneToOneField(
+        Catalogo,
+        to_field='sku',
+        on_delete=models.PROTECT,
+        db_column='sku',
+        related_name='kit',
+        verbose_name='SKU del kit',
+    )
+    # False: el pack no tiene stock propio; sus ventas solo descuentan los componentes
+    descuenta_stock_propio = models.BooleanField(default=False, verbose_name='Descuenta stock propio')
+
+    class Meta:
+        db_table = 'kit'
+        verbose_name = 'Kit'
+        verbose_name_plural = 'Kits'
+
+    def __str__(self):
+        return self.sku_id
+
+
+class ComponenteKit(models.Model):
+    kit = models.ForeignKey(Kit, on_delete=models.CASCADE, related_name='componentes')
+    componente = models.ForeignKey(
+        Catalogo,
+        to_field='sku',
+        on_delete=models.PROTECT,
+        db_column='componente',
+        related_name='en_kits',
+        verbose_name='SKU componente',
+    )
+    cantidad = models.PositiveIntegerField(default=1, verbose_name='Unidades por kit')
+
+    class Meta:
+        db_table = 'componente_kit'
+        verbose_name = 'Componente de Kit'
+        verbose_name_plural = 'Componentes de Kit'
+        unique_together = ('kit', 'componente')
+
+    def __str__(self):
+        return f"{self.kit_id} → {self.componente_id} x{self.cantidad}"
+
+
 class inventarioactualproxy(Catalogo):
     class Meta:
         proxy = True
@@ -1895,3 +2179,186 @@ class ShopifyOrder(models.Model):
     def __str__(self):
         return f"{self.order_name} - {self.customer_name} - ${self.total}"
 
+
+
+# ——————————————————————————————————————————————————————————————
+# Modelo: RANGOS SUCIOS (fechas pendientes de regenerar en el libro unificado)
+# ——————————————————————————————————————————————————————————————
+
+class RangoSucio(models.Model):
+    """
+    Rango de fechas tocado por una escritura en una tabla fuente
+    (Ventas, OtrosGastos, Sueldos, Asientos, Entradas, Balance Inicial, Catálogo).
+    Un rango con fechas nulas significa "regenerar todo".
+    """
+    fecha_desde  = models.DateField(null=True, blank=True)
+    fecha_hasta  = models.DateField(null=True, blank=True)
+    tabla_origen = models.CharField(max_length=50)
+    creado       = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'rangos_sucios'
+        verbose_name = 'Rango Sucio'
+        verbose_name_plural = 'Rangos Sucios'
+        ordering = ['fecha_desde']
+
+    def __str__(self):
+        desde = self.fecha_desde or '…'
+        hasta = self.fecha_hasta or '…'
+        return f"{self.tabla_origen}: {desde} → {hasta}"
+
+
+# ——————————————————————————————————————————————————————————————
+# Modelo: VERSIÓN DEL LIBRO y SNAPSHOT DE REPORTES
+# ——————————————————————————————————————————————————————————————
+
+class VersionLibro(models.Model):
+    """
+    Contador global: sube cada vez que se regeneran las tablas derivadas
+    (VentasConsulta, uniones, resúmenes). Fila única pk=1.
+    """
+    version     = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'version_libro'
+        verbose_name = 'Versión Libro'
+        verbose_name_plural = 'Versión Libro'
+
+    def __str__(self):
+        return f"v{self.version} ({self.actualizado:%Y-%m-%d %H:%M})"
+
+
+class SnapshotLibro(models.Model):
+    """
+    Totales por cuenta y matriz A/P/Pe/G ya calculados para (año panel, versión).
+    Las vistas de reportes leen de aquí mientras la versión no cambie.
+    """
+    panel_year = models.IntegerField()
+    version    = models.PositiveBigIntegerField()
+    debitos    = models.JSONField(default=dict)   # {"cuenta": total}
+    creditos   = models.JSONField(default=dict)
+    matriz     = models.JSONField(default=dict)   # {"A:1010100": saldo, ...}
+    calculado  = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'snapshot_libro'
+        unique_together = ('panel_year', 'version')
+        verbose_name = 'Snapshot Libro'
+        verbose_name_plural = 'Snapshots Libro'
+
+    def __str__(self):
+        return f"{self.panel_year} v{self.version} ({self.calculado:%Y-%m-%d %H:%M})"
+
+    def debitos_dict(self):
+        return {int(k): float(v) for k, v in self.debitos.items()}
+
+    def creditos_dict(self):
+        return {int(k): float(v) for k, v in self.creditos.items()}
+
+
+class SnapshotIndicadores(models.Model):
+    """
+    Indicadores financieros por mes y del año ya calculados para (año panel, versión).
+    Mismo criterio que SnapshotLibro: se recalculan solo cuando sube la versión.
+    """
+    panel_year = models.IntegerField()
+    version    = models.PositiveBigIntegerField()
+    datos      = models.JSONField(default=dict)   # {"periodos": [...], "indicadores": [...]}
+    calculado  = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'snapshot_indicadores'
+        unique_together = ('panel_year', 'version')
+        verbose_name = 'Snapshot Indicadores'
+        verbose_name_plural = 'Snapshots Indicadores'
+
+    def __str__(self):
+        return f"{self.panel_year} v{self.version} ({self.calculado:%Y-%m-%d %H:%M})"
+
+
+# ——————————————————————————————————————————————————————————————
+# Modelo: MÉTRICAS DEL COORDINADOR DE REGENERACIÓN
+# ——————————————————————————————————————————————————————————————
+
+class MetricaRegeneracion(models.Model):
+    """
+    Contadores del coordinador (bronz_app.coordinador_regeneracion). Fila única pk=1.
+    - ejecutadas: pasadas que regeneraron al menos un rango.
+    - coalescidas: llamadas que esperaron a otra regeneración en curso y reutilizaron su resultado.
+    - sin_cambios: llamadas que tomaron el candado pero ya no había nada pendiente.
+    """
+    ejecutadas          = models.PositiveBigIntegerField(default=0)
+    coalescidas         = models.PositiveBigIntegerField(default=0)
+    sin_cambios         = models.PositiveBigIntegerField(default=0)
+    espera_total_ms     = models.PositiveBigIntegerField(default=0)
+    ultima_duracion_ms  = models.PositiveIntegerField(default=0)
+    ultimas_etapas      = models.JSONField(default=dict, blank=True)   # tiempos por etapa de la última pasada
+    actualizado         = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'metrica_regeneracion'
+        verbose_name = 'Métrica Regeneración'
+        verbose_name_plural = 'Métricas Regeneración'
+
+    def __str__(self):
+        return f"{self.ejecutadas} ejecutadas / {self.coalescidas} coalescidas"
+
+
+# ——————————————————————————————————————————————————————————————
+# Modelo: TRABAJOS EN SEGUNDO PLANO (cola en la base de datos)
+# ——————————————————————————————————————————————————————————————
+
+class TrabajoFondo(models.Model):
+    """
+    Trabajo pesado (regeneraciones) encolado desde una vista o el admin.
+    Lo ejecuta el comando `trabajos_worker` o el pool de hilos (ver bronz_app.trabajos).
+    """
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    TERMINADO = 'terminado'
+    ERROR = 'error'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (TERMINADO, 'Terminado'),
+        (ERROR, 'Error'),
+    ]
+
+    tipo        = models.CharField(max_length=50)
+    parametros  = models.JSONField(default=dict, blank=True)
+    estado      = models.CharField(max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+    progreso    = models.PositiveSmallIntegerField(default=0)      # 0..100
+    mensaje     = models.TextField(blank=True, default='')
+    usuario     = models.ForeignKey(
+        'auth.User', null=True, blank=True, on_delete=models.SET_NULL, related_name='trabajos_fondo'
+    )
+    worker      = models.CharField(max_length=100, blank=True, default='')
+    visto       = models.BooleanField(default=False)              # aviso en home ya cerrado
+    creado      = models.DateTimeField(auto_now_add=True)
+    iniciado    = models.DateTimeField(null=True, blank=True)
+    terminado   = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trabajos_fondo'
+        verbose_name = 'Trabajo en segundo plano'
+        verbose_name_plural = 'Trabajos en segundo plano'
+        ordering = ['-creado']
+        indexes = [
+            models.Index(fields=['estado', 'creado'], name='trabajos_estado_creado_idx'),
+        ]
+        constraints = [
+            # Un solo trabajo pendiente por (tipo, parámetros): encolar() reutiliza el existente
+            models.UniqueConstraint(
+                fields=['tipo', 'parametros'],
+                condition=models.Q(estado='pendiente'),
+                name='trabajos_pendiente_unico',
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo} ({self.get_estado_display()})"
+
+    @property
+    def finalizado(self):
+        return self.estado in (self.TERMINADO, self.ERROR)
@@ -0,0 +1,294 @@
+import numpy as np
+from datetime import date
+
+from django.db import connections
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+
+from bronz_app.cod_cuentas_balance import balance_rows
+from bronz_app.cubo import cubo, es_meses_completos, filtro_meses
+from bronz_app.models import (
+    MovimientoUnificadoCredito,
+    MovimientoUnificadoDebito,
+    SaldoDiario,
+)
+
+# Rangos de códigos: balance (activo / pasivo) y resultado (pérdidas / ganancias)
+RANGO_BALANCE = (1010100, 2040000)
+RANGO_RESULTADO = (3010100, 3030300)
+
+COLUMNAS = (
+    'debito', 'credito', 'saldo_deudor', 'saldo_acreedor',
+    'activo', 'pasivo', 'perdidas', 'ganancias',
+)
+
+_DEBITO, _CREDITO = 0, 1
+
+# Plan de cuentas del balance como vectores (en el orden de balance_rows)
+CODIGOS = np.array([fila['codigo'] for fila in balance_rows], dtype=np.int64)
+NOMBRES = [fila['nombre'] for fila in balance_rows]
+_ORDEN = np.argsort(CODIGOS, kind='stable')
+_CODIGOS_ORDENADOS = CODIGOS[_ORDEN]
+_ES_BALANCE = (CODIGOS >= RANGO_BALANCE[0]) & (CODIGOS <= RANGO_BALANCE[1])
+_ES_RESULTADO = (CODIGOS >= RANGO_RESULTADO[0]) & (CODIGOS <= RANGO_RESULTADO[1])
+
+# Claves que puede tener matriz_dict()
+CLAVES_MATRIZ = frozenset(
+    [f'{p}:{c}' for c in CODIGOS[_ES_BALANCE] for p in ('A', 'P')]
+    + [f'{p}:{c}' for c in CODIGOS[_ES_RESULTADO] for p in ('Pe', 'G')]
+)
+
+
+def intdot(val):
+    """Formatea números para mostrar miles con punto."""
+    try:
+        val_float = float(val)
+        val_int = int(round(val_float))
+        return f"{val_int:,}".replace(",", ".")
+    except Exception:
+        return ""
+
+
+# ——————————————————————————————————————————————————————————————
+# VECTORES DÉBITO / CRÉDITO (UNA CONSULTA)
+# ——————————————————————————————————————————————————————————————
+
+def _por_cuenta(qs, cuenta, monto, lado):
+    return (
+        qs.values_list(cuenta)
+        .annotate(lado=Value(lado, output_field=IntegerField()), total=Sum(monto))
+        .order_by()
+    )
+
+
+def consulta_resumenes(anio=None, hasta_mes=None):
+    """(cuenta, lado, total) desde el cubo cuenta × mes (anio=None: todos los años)."""
+    qs = cubo(anio=anio, hasta_mes=hasta_mes)
+    return _por_cuenta(qs, 'cuenta', 'debito', _DEBITO).union(
+        _por_cuenta(qs, 'cuenta', 'credito', _CREDITO),
+        all=True,
+    )
+
+
+def consulta_rango(desde, hasta):
+    rango = {'fecha__gte': desde, 'fecha__lte': hasta}
+    return _por_cuenta(
+        MovimientoUnificadoDebito.objects.filter(**rango), 'cta_debito', 'monto_debito', _DEBITO,
+    ).union(
+        _por_cuenta(MovimientoUnificadoCredito.objects.filter(**rango), 'cta_credito', 'monto_credito', _CREDITO),
+        all=True,
+    )
+
+
+def consulta_periodos(periodos, cuentas=None):
+    """
+    Una sola pasada para varios períodos [(desde, hasta), ...]: por cuenta,
+    una suma condicional por período (ambas fechas incluidas). Si todos los
+    períodos son meses completos se lee el cubo cuenta × mes; si no, las uniones.
+    Columnas: cuenta, lado, periodo_0 … periodo_n. `cuentas` limita las cuentas leídas.
+    """
+    desde = min(d for d, _ in periodos)
+    hasta = max(h for _, h in periodos)
+
+    if all(es_meses_completos(inicio, fin) for inicio, fin in periodos):
+        qs = cubo(desde=desde, hasta=hasta, cuentas=cuentas)
+
+        def del_cubo(monto, lado):
+            sumas = {
+                f'periodo_{i}': Sum(monto, filter=filtro_meses(inicio, fin))
+                for i, (inicio, fin) in enumerate(periodos)
+            }
+            return (
+                qs.values_list('cuenta')
+                .annotate(lado=Value(lado, output_field=IntegerField()), **sumas)
+                .order_by()
+            )
+
+        return del_cubo('debito', _DEBITO).union(del_cubo('credito', _CREDITO), all=True)
+
+    def por_cuenta(modelo, cuenta, monto, lado):
+        sumas = {
+            f'periodo_{i}': Sum(monto, filter=Q(fecha__gte=inicio, fecha__lte=fin))
+            for i, (inicio, fin) in enumerate(periodos)
+        }
+        qs = modelo.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        if cuentas is not None:
+            qs = qs.filter(**{f'{cuenta}__in': list(cuentas)})
+        return (
+            qs.values_list(cuenta)
+            .annotate(lado=Value(lado, output_field=IntegerField()), **sumas)
+            .order_by()
+        )
+
+    return por_cuenta(MovimientoUnificadoDebito, 'cta_debito', 'monto_debito', _DEBITO).union(
+        por_cuenta(MovimientoUnificadoCredito, 'cta_credito', 'monto_credito', _CREDITO),
+        all=True,
+    )
+
+
+def consulta_cortes(cortes):
+    """consulta_periodos con un período por corte: del 1 de enero de su año al corte."""
+    return consulta_periodos([(date(corte.year, 1, 1), corte) for corte in cortes])
+
+
+def consulta_al_corte(fecha_corte):
+    """
+    Acumulados del 1 de enero a fecha_corte desde saldo_diario: la última fila
+    de cada cuenta en el año (DISTINCT ON en PostgreSQL, subconsulta en otros).
+    """
+    en_anio = SaldoDiario.objects.filter(fecha__gte=date(fecha_corte.year, 1, 1), fecha__lte=fecha_corte)
+    if connections[en_anio.db].vendor == 'postgresql':
+        ultimas = en_anio.order_by('cuenta', '-fecha').distinct('cuenta')
+    else:
+        ultima = en_anio.filter(cuenta=OuterRef('cuenta')).order_by('-fecha').values('fecha')[:1]
+        ultimas = en_anio.filter(fecha=Subquery(ultima))
+    return ultimas.values_list('cuenta', 'debito_acum', 'credito_acum')
+
+
+def _vectores(filas):
+    """
+    (cuenta, lado, total) → vectores débito y crédito alineados con CODIGOS.
+    Las cuentas que no están en balance_rows se ignoran, igual que en el reporte.
+    """
+    vectores = np.zeros((2, len(CODIGOS)), dtype=np.float64)
+    filas = [(cuenta, lado, total) for cuenta, lado, total in filas if cuenta is not None]
+    if not filas:
+        return vectores
+    cuentas = np.fromiter((int(f[0]) for f in filas), dtype=np.int64, count=len(filas))
+    lados = np.fromiter((f[1] for f in filas), dtype=np.int64, count=len(filas))
+    totales = np.fromiter((float(f[2] or 0) for f in filas), dtype=np.float64, count=len(filas))
+
+    posicion = np.searchsorted(_CODIGOS_ORDENADOS, cuentas)
+    posicion = np.minimum(posicion, len(CODIGOS) - 1)
+    existe = _CODIGOS_ORDENADOS[posicion] == cuentas
+    np.add.at(vectores, (lados[existe], _ORDEN[posicion[existe]]), totales[existe])
+    return vectores
+
+
+# ——————————————————————————————————————————————————————————————
+# MOTOR
+# ——————————————————————————————————————————————————————————————
+
+class Balance:
+    """
+    Balance de 8 columnas sobre balance_rows, calculado con operaciones de
+    arreglos. Se arma una vez por request y de él salen la matriz para el
+    template, el dict A/P/Pe/G de los resúmenes y la exportación a Excel.
+    """
+
+    def __init__(self, debito, credito):
+        self.debito = np.asarray(debito, dtype=np.float64)
+        self.credito = np.asarray(credito, dtype=np.float64)
+
+        clasificada = _ES_BALANCE | _ES_RESULTADO
+        diferencia = self.debito - self.credito
+        self.saldo_deudor = np.where(clasificada, np.maximum(diferencia, 0.0), 0.0)
+        self.saldo_acreedor = np.where(clasificada, np.maximum(-diferencia, 0.0), 0.0)
+        self.activo = np.where(_ES_BALANCE, self.saldo_deudor, 0.0)
+        self.pasivo = np.where(_ES_BALANCE, self.saldo_acreedor, 0.0)
+        self.perdidas = np.where(_ES_RESULTADO, self.saldo_deudor, 0.0)
+        self.ganancias = np.where(_ES_RESULTADO, self.saldo_acreedor, 0.0)
+        self.saldo = diferencia
+
+    @classmethod
+    def desde_totales(cls, debitos_dict, creditos_dict):
+        """Desde dicts {cuenta: total} (p.ej. los guardados en el snapshot)."""
+        filas = [(c, _DEBITO, t) for c, t in debitos_dict.items()]
+        filas += [(c, _CREDITO, t) for c, t in creditos_dict.items()]
+        return cls(*_vectores(filas))
+
+    def columna(self, nombre):
+        return getattr(self, nombre)
+
+    # — Salidas —
+
+    def debitos_dict(self):
+        return {int(c): float(v) for c, v in zip(CODIGOS, self.debito) if v}
+
+    def creditos_dict(self):
+        return {int(c): float(v) for c, v in zip(CODIGOS, self.credito) if v}
+
+    def matriz_dict(self):
+        """{'A:cod': saldo, 'P:cod': saldo, 'Pe:cod': saldo, 'G:cod': saldo} para los resúmenes."""
+        matriz = {}
+        for i in np.flatnonzero(_ES_BALANCE | _ES_RESULTADO):
+            codigo = int(CODIGOS[i])
+            if _ES_BALANCE[i]:
+                matriz[f'A:{codigo}'] = float(self.activo[i])
+                matriz[f'P:{codigo}'] = float(self.pasivo[i])
+            else:
+                matriz[f'Pe:{codigo}'] = float(self.perdidas[i])
+                matriz[f'G:{codigo}'] = float(self.ganancias[i])
+        return matriz
+
+    def filas(self, formato=intdot):
+        """Matriz fila a fila (codigo, nombre y las 8 columnas) con `formato` aplicado."""
+        columnas = [self.columna(c).tolist() for c in COLUMNAS]
+        return [
+            {'codigo': int(codigo), 'nombre': nombre, **{c: formato(v[i]) for c, v in zip(COLUMNAS, columnas)}}
+            for i, (codigo, nombre) in enumerate(zip(CODIGOS, NOMBRES))
+        ]
+
+    def totales(self):
+        return {c: float(self.columna(c).sum()) for c in COLUMNAS}
+
+    def utilidad(self):
+        """Fila Utilidad (pérdida) del Ejercicio: cuadra activo/pasivo y pérdidas/ganancias."""
+        t = self.totales()
+        return {
+            'activo': max(0.0, t['pasivo'] - t['activo']),
+            'pasivo': max(0.0, t['activo'] - t['pasivo']),
+            'perdidas': max(0.0, t['ganancias'] - t['perdidas']),
+            'ganancias': max(0.0, t['perdidas'] - t['ganancias']),
+        }
+
+    def contexto_template(self):
+        """Variables que usa bronz_app/balance.html (montos ya formateados)."""
+        totales = self.totales()
+        utilidad = self.utilidad()
+        sumas = {c: totales[c] + utilidad.get(c, 0.0) for c in COLUMNAS}
+        return {
+            'matriz_balance': self.filas(),
+            'totales': {c: intdot(v) for c, v in totales.items()},
+            'utilidad': {c: intdot(utilidad[c]) if c in utilidad else '' for c in COLUMNAS},
+            'sumas_totales': {c: intdot(v) for c, v in sumas.items()},
+            'utilidad_pasivo_rojo': totales['activo'] < totales['pasivo'],
+            'utilidad_perdidas_rojo': totales['perdidas'] > totales['ganancias'],
+        }
+
+    def dataframe(self):
+        """Matriz para exportar: montos enteros redondeados."""
+        import pandas as pd
+
+        datos = {'codigo': CODIGOS, 'nombre': NOMBRES}
+        datos.update({c: np.rint(self.columna(c)).astype(np.int64) for c in COLUMNAS})
+        return pd.DataFrame(datos)
+
+
+def balance_resumenes(anio=None, hasta_mes=None):
+    """Balance desde el cubo cuenta × mes: anio=None suma todos los años."""
+    return Balance(*_vectores(consulta_resumenes(anio, hasta_mes)))
+
+
+def balance_al_corte(fecha_corte):
+    """Balance del 1 de enero a fecha_corte (incluida) desde el índice saldo_diario."""
+    filas = []
+    for cuenta, debito, credito in consulta_al_corte(fecha_corte):
+        filas += [(cuenta, _DEBITO, debito), (cuenta, _CREDITO, credito)]
+    return Balance(*_vectores(filas))
+
+
+def balance_rango(desde, hasta):
+    """Balance desde union_debitos / union_creditos para un rango de fechas (incluido)."""
+    return Balance(*_vectores(consulta_rango(desde, hasta)))
+
+
+def balances_comparativos(cortes):
+    """Un Balance por fecha de corte (en el orden recibido), todos de la misma consulta."""
+    cortes = list(cortes)
+    if not cortes:
+        return []
+    filas = list(consulta_cortes(cortes))
+    return [
+        Balance(*_vectores([(cuenta, lado, totales[i]) for cuenta, lado, *totales in filas]))
+        for i in range(len(cortes))
+    ]
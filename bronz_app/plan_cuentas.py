@@ -0,0 +1,178 @@
+# bronz_app/plan_cuentas.py
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from bronz_app.cod_cuentas_balance import balance_rows
+from bronz_app.models import CuboCuentaMes, CuentaPlan, RollupCuentaMes
+from bronz_app.utils import _q_periodos, incrementar_version_libro, limites_de_mes
+
+# Largo del prefijo de cada nivel: clase, grupo, subgrupo, cuenta
+LARGOS = (1, 3, 5, 7)
+
+CLASES = {
+    '1': 'Activos',
+    '2': 'Pasivos y Patrimonio',
+    '3': 'Resultados',
+}
+
+GRUPOS = {
+    '101': 'Activo Circulante',
+    '102': 'Activo Fijo',
+    '103': 'Otros Activos',
+    '104': 'Cuentas de Orden de Activos',
+    '201': 'Pasivo Circulante',
+    '202': 'Pasivo de Largo Plazo',
+    '203': 'Patrimonio',
+    '204': 'Cuentas de Orden de Pasivos',
+    '301': 'Resultado Operacional',
+    '302': 'Resultado No Operacional',
+    '303': 'Impuestos y Ajustes',
+}
+
+# Subgrupos sin cuenta madre (…00) en balance_rows
+SUBGRUPOS = {
+    '30101': 'Ingresos de Explotación',
+}
+
+
+def prefijos(codigo):
+    """
+    Prefijos de una cuenta desde la clase: 1010101 → ['1', '101', '10101', '1010101'].
+    Un código que no tiene 7 dígitos no entra en la jerarquía ([]).
+    """
+    texto = str(codigo)
+    if len(texto) != LARGOS[-1] or not texto.isdigit():
+        return []
+    return [texto[:largo] for largo in LARGOS]
+
+
+def _nombres():
+    """Nombre de cada prefijo: clases y grupos fijos; subgrupos por su cuenta XXXXX00."""
+    nombres = dict(CLASES)
+    nombres.update(GRUPOS)
+    nombres.update(SUBGRUPOS)
+    for fila in balance_rows:
+        codigo = str(fila['codigo'])
+        nombres[codigo] = fila['nombre']
+        # El subgrupo toma el nombre de su cuenta madre (…00) o, si no hay, de la primera
+        if codigo[:5] not in SUBGRUPOS and (codigo.endswith('00') or codigo[:5] not in nombres):
+            nombres[codigo[:5]] = fila['nombre']
+    return nombres
+
+
+# ——————————————————————————————————————————————————————————————
+# PLAN DE CUENTAS
+# ——————————————————————————————————————————————————————————————
+
+def sincronizar_plan_cuentas(cuentas=()):
+    """
+    Crea los nodos que faltan para balance_rows y para `cuentas` (p. ej. las
+    que aparecen en el cubo sin estar en la lista). Devuelve {prefijo: id}.
+    """
+    ids = dict(CuentaPlan.objects.values_list('prefijo', 'id'))
+    pendientes = {
+        prefijo
+        for codigo in [fila['codigo'] for fila in balance_rows] + list(cuentas)
+        for prefijo in prefijos(codigo)
+        if prefijo not in ids
+    }
+    if not pendientes:
+        return ids
+
+    nombres = _nombres()
+    # Por nivel, para que el padre exista antes que sus hijos
+    for nivel, largo in enumerate(LARGOS, start=1):
+        nuevos = [
+            CuentaPlan(
+                prefijo=prefijo,
+                nivel=nivel,
+                nombre=nombres.get(prefijo, ''),
+                padre_id=ids.get(prefijo[:LARGOS[nivel - 2]]) if nivel > 1 else None,
+            )
+            for prefijo in sorted(p for p in pendientes if len(p) == largo)
+        ]
+        CuentaPlan.objects.bulk_create(nuevos)
+        ids.update(CuentaPlan.objects.filter(prefijo__in=[n.prefijo for n in nuevos]).values_list('prefijo', 'id'))
+    return ids
+
+
+# ——————————————————————————————————————————————————————————————
+# TOTALES POR NIVEL (ROLLUPS)
+# ——————————————————————————————————————————————————————————————
+
+def regenerar_rollups_cuenta_mes(start_date=None, end_date=None):
+    """
+    Recalcula rollup_cuenta_mes desde el cubo cuenta × mes: cada fila del cubo
+    suma en su cuenta, subgrupo, grupo y clase. Con rango solo se reemplazan
+    los meses que lo tocan; sin rango, todo. Devuelve las filas escritas.
+    """
+    if start_date and end_date:
+        start_date, end_date = limites_de_mes(start_date, end_date)
+        periodos = _q_periodos(start_date, end_date)
+    else:
+        periodos = Q()
+
+    filas = list(
+        CuboCuentaMes.objects.filter(periodos)
+        .values_list('anio', 'mes', 'cuenta', 'debito', 'credito')
+        .annotate(movimientos=F('n_debitos') + F('n_creditos'))
+    )
+    totales = defaultdict(lambda: [0, 0, 0])
+    for anio, mes, cuenta, debito, credito, movimientos in filas:
+        for prefijo in prefijos(cuenta):
+            total = totales[(prefijo, anio, mes)]
+            total[0] += debito
+            total[1] += credito
+            total[2] += movimientos
+
+    with transaction.atomic():
+        ids = sincronizar_plan_cuentas({cuenta for _, _, cuenta, _, _, _ in filas})
+        RollupCuentaMes.objects.filter(periodos).delete()
+        RollupCuentaMes.objects.bulk_create([
+            RollupCuentaMes(
+                nodo_id=ids[prefijo], anio=anio, mes=mes,
+                debito=debito, credito=credito, n_movimientos=movimientos,
+            )
+            for (prefijo, anio, mes), (debito, credito, movimientos) in totales.items()
+        ], batch_size=2000)
+        incrementar_version_libro()
+    return len(totales)
+
+
+# ——————————————————————————————————————————————————————————————
+# LECTURA: SUBTOTALES Y NAVEGACIÓN
+# ——————————————————————————————————————————————————————————————
+
+def _con_totales(filtro, anio=None, hasta_mes=None):
+    """
+    Totales de los nodos que cumplen `filtro` (sobre nodo__…) en una sola
+    lectura de rollup_cuenta_mes. Los nodos sin movimientos no aparecen.
+    """
+    qs = RollupCuentaMes.objects.filter(filtro)
+    if anio is not None:
+        qs = qs.filter(anio=anio)
+        if hasta_mes is not None:
+            qs = qs.filter(mes__lte=hasta_mes)
+    filas = (
+        qs.values(prefijo=F('nodo__prefijo'), nivel=F('nodo__nivel'), nombre=F('nodo__nombre'))
+        .annotate(debito=Sum('debito'), credito=Sum('credito'), n_movimientos=Sum('n_movimientos'))
+        .order_by('prefijo')
+    )
+    return [{**fila, 'saldo': fila['debito'] - fila['credito']} for fila in filas]
+
+
+def subtotales(niveles=(1, 2, 3), anio=None, hasta_mes=None):
+    """
+    Subtotales de los niveles pedidos (clase, grupo, subgrupo) para un año
+    (hasta_mes incluido) o todos: [{'prefijo', 'nivel', 'nombre', 'debito', 'credito', 'saldo', …}].
+    """
+    return _con_totales(Q(nodo__nivel__in=niveles), anio, hasta_mes)
+
+
+def hijos(prefijo=None, anio=None, hasta_mes=None):
+    """Hijos directos de un nodo (o las clases si prefijo es None) con sus totales."""
+    filtro = Q(nodo__padre__isnull=True) if prefijo is None else Q(nodo__padre__prefijo=prefijo)
+    return _con_totales(filtro, anio, hasta_mes)
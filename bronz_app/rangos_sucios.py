@@ -0,0 +1,195 @@
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from bronz_app.models import (
+    AsientosContables,
+    BalanceInicial,
+    Catalogo,
+    EntradaProductos,
+    OtrosGastos,
+    RangoSucio,
+    SueldosHonorarios,
+    Ventas,
+)
+
+# Tablas fuente que alimentan VentasConsulta, union_debitos y union_creditos.
+MODELOS_FUENTE = (
+    Ventas,
+    OtrosGastos,
+    SueldosHonorarios,
+    AsientosContables,
+    EntradaProductos,
+    BalanceInicial,
+)
+
+# Cada escritura encola la regeneración en segundo plano (los reportes no regeneran al leer)
+REGENERAR_EN_FONDO = getattr(settings, 'BRONZ_REGENERAR_EN_FONDO', True)
+
+_local = threading.local()
+
+# (orden, función) que vacían al cerrar el lote lo que otros módulos difirieron
+_al_cerrar_lote = []
+
+
+# ——————————————————————————————————————————————————————————————
+# REGISTRO DE RANGOS
+# ——————————————————————————————————————————————————————————————
+
+def _a_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return None
+
+
+def marcar_rango_sucio(fecha_desde, fecha_hasta, tabla_origen):
+    """
+    Registra que las fechas [fecha_desde, fecha_hasta] de tabla_origen cambiaron.
+    Dentro de agrupar_rangos_sucios() solo se acumula en memoria.
+    """
+    fecha_desde = _a_fecha(fecha_desde)
+    fecha_hasta = _a_fecha(fecha_hasta) or fecha_desde
+    fecha_desde = fecha_desde or fecha_hasta
+    if fecha_desde is None:
+        return
+
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is not None:
+        previo = buffer.get(tabla_origen)
+        if previo:
+            fecha_desde = min(fecha_desde, previo[0])
+            fecha_hasta = max(fecha_hasta, previo[1])
+        buffer[tabla_origen] = (fecha_desde, fecha_hasta)
+        return
+
+    RangoSucio.objects.create(
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        tabla_origen=tabla_origen,
+    )
+    _encolar_regeneracion()
+
+
+def _encolar_regeneracion():
+    """
+    Al confirmar la transacción, encola la regeneración. encolar() no duplica un
+    trabajo pendiente: muchas escrituras seguidas quedan en una sola pasada.
+    """
+    if not REGENERAR_EN_FONDO:
+        return
+    from bronz_app.trabajos import encolar
+    transaction.on_commit(lambda: encolar('regenerar_pendientes'))
+
+
+def marcar_fechas_sucias(fechas, tabla_origen):
+    """Marca el rango mínimo que cubre todas las fechas (útil tras un bulk_create)."""
+    fechas = [f for f in (_a_fecha(v) for v in fechas) if f is not None]
+    if fechas:
+        marcar_rango_sucio(min(fechas), max(fechas), tabla_origen)
+
+
+def marcar_todo_sucio(tabla_origen):
+    """Fuerza una regeneración completa en la próxima pasada."""
+    RangoSucio.objects.create(tabla_origen=tabla_origen)
+    _encolar_regeneracion()
+
+
+def en_lote():
+    """True dentro de agrupar_rangos_sucios(): el trabajo por fila se difiere al cierre del bloque."""
+    return getattr(_local, 'buffer', None) is not None
+
+
+def al_cerrar_lote(funcion, orden):
+    """
+    Registra `funcion` para ejecutarse al salir de agrupar_rangos_sucios(), antes
+    de escribir las marcas y por `orden` creciente (el libro de stock antes que el
+    costo promedio, que lee el libro). Registrarla dos veces no la duplica.
+    """
+    if all(f is not funcion for _, f in _al_cerrar_lote):
+        _al_cerrar_lote.append((orden, funcion))
+        _al_cerrar_lote.sort(key=lambda par: par[0])
+    return funcion
+
+
+@contextmanager
+def agrupar_rangos_sucios():
+    """
+    Agrupa el trabajo que dispara cada save()/delete() de un bloque (p. ej. un
+    import o una acción del admin): las marcas de rango sucio, el libro de stock,
+    el costo promedio y los cierres de tiendas se acumulan en memoria y se
+    procesan una vez al salir, en lugar de una vez por fila.
+    """
+    if en_lote():
+        yield
+        return
+
+    _local.buffer = {}
+    try:
+        yield
+    finally:
+        # Con el buffer aún activo: lo que estas funciones marquen también se agrupa.
+        # Si una falla, las demás igual vacían lo suyo; el primer error se relanza al final.
+        error = None
+        for _, funcion in _al_cerrar_lote:
+            try:
+                funcion()
+            except Exception as e:
+                error = error or e
+        pendientes, _local.buffer = _local.buffer, None
+        for tabla_origen, (desde, hasta) in pendientes.items():
+            marcar_rango_sucio(desde, hasta, tabla_origen)
+        if error is not None:
+            raise error
+
+
+# ——————————————————————————————————————————————————————————————
+# SEÑALES
+# ——————————————————————————————————————————————————————————————
+
+def _nombre_tabla(sender):
+    return sender._meta.db_table
+
+
+def _antes_de_guardar(sender, instance, raw=False, **kwargs):
+    # Si se cambia la fecha de un registro existente, la fecha antigua también queda sucia.
+    if raw or instance.pk is None:
+        return
+    fecha_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list('fecha', flat=True).first()
+    )
+    if fecha_anterior and fecha_anterior != _a_fecha(instance.fecha):
+        marcar_rango_sucio(fecha_anterior, fecha_anterior, _nombre_tabla(sender))
+
+
+def _despues_de_guardar(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    marcar_rango_sucio(instance.fecha, instance.fecha, _nombre_tabla(sender))
+
+
+def _despues_de_borrar(sender, instance, **kwargs):
+    marcar_rango_sucio(instance.fecha, instance.fecha, _nombre_tabla(sender))
+
+
+def _catalogo_guardado(sender, instance, raw=False, **kwargs):
+    # VentasConsulta copia costo_promedio_neto: todas las ventas del SKU quedan sucias.
+    if raw:
+        return
+    rango = Ventas.objects.filter(sku=instance).aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+    marcar_rango_sucio(rango['desde'], rango['hasta'], _nombre_tabla(sender))
+
+
+def conectar_senales():
+    for modelo in MODELOS_FUENTE:
+        uid = f'rangos_sucios_{modelo.__name__}'
+        pre_save.connect(_antes_de_guardar, sender=modelo, dispatch_uid=f'{uid}_pre')
+        post_save.connect(_despues_de_guardar, sender=modelo, dispatch_uid=f'{uid}_post')
+        post_delete.connect(_despues_de_borrar, sender=modelo, dispatch_uid=f'{uid}_del')
+    post_save.connect(_catalogo_guardado, sender=Catalogo, dispatch_uid='rangos_sucios_Catalogo')
@@ -16,8 +16,14 @@ def main():
             queries = {
                 'union_debitos': "SELECT fecha, cta_debito, monto_debito FROM union_debitos;",
                 'union_creditos': "SELECT fecha, cta_credito, monto_credito FROM union_creditos;",
-                'suma_debitos': "SELECT cuenta_debito, total_debito FROM suma_debitos;",
-                'suma_creditos': "SELECT cuenta_credito, total_credito FROM suma_creditos;"
+                'suma_debitos': (
+                    "SELECT cuenta_debito, SUM(total_debito) AS total_debito "
+                    "FROM suma_debitos GROUP BY cuenta_debito ORDER BY cuenta_debito;"
+                ),
+                'suma_creditos': (
+                    "SELECT cuenta_credito, SUM(total_credito) AS total_credito "
+                    "FROM suma_creditos GROUP BY cuenta_credito ORDER BY cuenta_credito;"
+                )
             }
 
             df_debitos = pd.read_sql_query(queries['union_debitos'], conn)
@@ -15,6 +15,7 @@ def main():
     django.setup()
 
     from bronz_app.models import AjusteInventario, Catalogo
+    from bronz_app.libro_stock import sincronizar_libro_stock
 
     archivo_excel = r"C:\Users\tcort\OneDrive\BRONZ\Django\Otros\Ajuste inventario.xlsx"
     try:
@@ -75,6 +76,9 @@ def main():
 
     if objetos:
         AjusteInventario.objects.bulk_create(objetos)
+        # bulk_create no dispara señales: el libro de stock se pone al día en el rango importado
+        fechas = [o.fecha for o in objetos]
+        sincronizar_libro_stock(min(fechas), max(fechas), modelos=[AjusteInventario])
         msg = f"{len(objetos)} registros importados en AjusteInventario."
         if skus_no_encontrados:
             msg += f" {len(skus_no_encontrados)} filas omitidas por SKU no encontrado: "
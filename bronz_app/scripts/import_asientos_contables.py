@@ -12,6 +12,7 @@ def main():
     django.setup()
 
     from bronz_app.models import AsientosContables
+    from bronz_app.rangos_sucios import marcar_fechas_sucias
 
     archivo_excel = r"C:\Users\Thomas\OneDrive\BRONZ\Django-Bronz\Otros\Asientos contables.xlsx"
 
@@ -58,6 +59,7 @@ def main():
     msg = ""
     if objetos:
         AsientosContables.objects.bulk_create(objetos)
+        marcar_fechas_sucias((o.fecha for o in objetos), AsientosContables._meta.db_table)
         msg = f"✅ {len(objetos)} registros importados exitosamente en AsientosContables."
     else:
         msg = "No hay registros válidos para importar."
@@ -11,6 +11,7 @@ def main():
     django.setup()
 
     from bronz_app.models import BalanceInicial
+    from bronz_app.rangos_sucios import marcar_fechas_sucias
 
     archivo_excel = r"C:\Users\Thomas\OneDrive\BRONZ\Django-Bronz\Otros\Cuentas ajuste inicial.xlsx"
     mensajes = []
@@ -64,6 +65,7 @@ def main():
     # — Bulk create y mensajes
     if objetos:
         BalanceInicial.objects.bulk_create(objetos)
+        marcar_fechas_sucias((o.fecha for o in objetos), BalanceInicial._meta.db_table)
         mensajes.append(f"✅ {len(objetos)} registros importados en BalanceInicial.")
     else:
         mensajes.append("No hay registros válidos para importar.")
@@ -17,6 +17,7 @@ def main():
 
     # 4) Importar el modelo destino
     from bronz_app.models import Catalogo
+    from bronz_app.kits import asegurar_kits_iniciales
 
     # 5) Leer el Excel
     archivo_excel = r"C:\Users\tcort\OneDrive\BRONZ\Django\Otros\Catalogo de productos.xlsx"
@@ -78,7 +79,12 @@ def main():
     # 9) Insertar en bloque SOLO nuevos
     if objetos:
         Catalogo.objects.bulk_create(objetos)
-        return f"{len(objetos)} nuevos SKUs importados en Catálogo."
+        # bulk_create no dispara señales: los packs conocidos reciben su lista de materiales aquí
+        kits = asegurar_kits_iniciales([o.sku for o in objetos])
+        mensaje = f"{len(objetos)} nuevos SKUs importados en Catálogo."
+        if kits:
+            mensaje += f" Kits creados: {', '.join(kits)}."
+        return mensaje
     else:
         return "No hay nuevos sku importados."
 
@@ -13,6 +13,9 @@ def main():
     django.setup()
 
     from bronz_app.models import EntradaProductos
+    from bronz_app.libro_stock import sincronizar_libro_stock
+    from bronz_app.rangos_sucios import marcar_fechas_sucias
+    from consult_app.cierres_stock import invalidar_cierres
     catalog_model = django.apps.apps.get_model('bronz_app', 'Catalogo')
 
     # Leer archivo Excel
@@ -111,6 +114,11 @@ def main():
     # Insertar con bulk_create y preparar mensaje para Django
     if objetos:
         EntradaProductos.objects.bulk_create(objetos)
+        fechas = [o.fecha for o in objetos]
+        marcar_fechas_sucias(fechas, EntradaProductos._meta.db_table)
+        # bulk_create no dispara señales: libro de stock y costo promedio del rango importado
+        sincronizar_libro_stock(min(fechas), max(fechas), modelos=[EntradaProductos])
+        invalidar_cierres(min(fechas), max(fechas))
         mensajes.append(f"✅ {len(objetos)} registros importados exitosamente en 'EntradaProductos'.")
     else:
         mensajes.append("⚠️ No se importó ningún registro válido en EntradaProductos.")
@@ -14,6 +14,7 @@ def main():
 
     # --- Importar modelos ---
     from bronz_app.models import Envios
+    from bronz_app.libro_stock import sincronizar_libro_stock
     catalog_model = django.apps.apps.get_model('bronz_app', 'Catalogo')
 
     # --- Leer Excel y preparar DataFrame ---
@@ -65,6 +66,9 @@ def main():
     # Guardar en la base de datos
     if envios_objs:
         Envios.objects.bulk_create(envios_objs)
+        # bulk_create no dispara señales: el libro de stock se pone al día en el rango importado
+        fechas = [e.fecha for e in envios_objs]
+        sincronizar_libro_stock(min(fechas), max(fechas), modelos=[Envios])
         msg = f"✅ {len(envios_objs)} registros importados exitosamente en 'envios'."
     else:
         msg = "No hay registros válidos para importar."
@@ -7,6 +7,7 @@ def main():
     from django.db import transaction
     from bronz_app.models import Catalogo
     from consult_app.models import EnviosATiendas, BodegaTienda
+    from consult_app.cierres_stock import invalidar_cierres
 
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     sys.path.append(BASE_DIR)
@@ -93,6 +94,9 @@ def main():
     if objetos:
         with transaction.atomic():
             EnviosATiendas.objects.bulk_create(objetos, batch_size=1000)
+            # bulk_create no dispara señales: los cierres de stock de los meses importados quedan obsoletos
+            fechas = [o.fecha for o in objetos]
+            invalidar_cierres(min(fechas), max(fechas))
         msg = f"✅ {len(objetos)} registros importados exitosamente en EnviosATiendas."
     else:
         msg = "No hay registros válidos para importar."
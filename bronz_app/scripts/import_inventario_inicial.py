@@ -15,6 +15,7 @@ def main():
 
     # 3) Importar el modelo
     from bronz_app.models import InventarioInicial
+    from bronz_app.libro_stock import sincronizar_libro_stock
 
     # 4) Leer el Excel
     archivo_excel = r"C:\Users\tcort\OneDrive\BRONZ\Django\Otros\Inventario inicial Total.xlsx"
@@ -52,6 +53,8 @@ def main():
     # 6) Guardar todo de una vez con bulk_create
     if objetos:
         InventarioInicial.objects.bulk_create(objetos)
+        # bulk_create no dispara señales: el inventario inicial (sin fecha) se sincroniza completo
+        sincronizar_libro_stock(modelos=[InventarioInicial])
         mensajes.append(f"✅ {len(objetos)} registros importados en InventarioInicial.")
     else:
         mensajes.append("⚠️ No se importó ningún registro válido en InventarioInicial.")
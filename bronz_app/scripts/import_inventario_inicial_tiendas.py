@@ -9,6 +9,7 @@ from django.utils import timezone
 from openpyxl import load_workbook
 
 from bronz_app.models import Catalogo
+from consult_app.cierres_stock import invalidar_cierres
 from consult_app.models import BodegaTienda, InventarioInicialTiendas
 
 
@@ -128,6 +129,8 @@ def run_import(
                 [BodegaTienda(nombre=t) for t in faltantes],
                 ignore_conflicts=True
             )
+            # Tiendas nuevas cambian la clasificación de ventas por nombre: sin señales en bulk_create
+            invalidar_cierres()
             tienda_qs = BodegaTienda.objects.filter(nombre__in=tiendas).only("nombre", "id")
             tienda_cache = {t.nombre: t for t in tienda_qs}
 
@@ -16,6 +16,7 @@ def main():
 
     # 3) Importar modelo
     from bronz_app.models import OtrosGastos
+    from bronz_app.rangos_sucios import marcar_fechas_sucias
 
     # 4) Leer Excel
     archivo_excel = r"C:\Users\Thomas\OneDrive\BRONZ\Django-Bronz\Otros\Otros gastos.xlsx"
@@ -96,6 +97,7 @@ def main():
     mensajes = []
     if objetos:
         OtrosGastos.objects.bulk_create(objetos)
+        marcar_fechas_sucias((o.fecha for o in objetos), OtrosGastos._meta.db_table)
         mensajes.append(f"✅ {len(objetos)} registros importados en OtrosGastos.")
     else:
         mensajes.append("⚠️ No hay registros válidos para insertar en OtrosGastos.")
@@ -15,6 +15,7 @@ def main():
 
     # 3) Importar el modelo destino
     from bronz_app.models import SueldosHonorarios
+    from bronz_app.rangos_sucios import marcar_fechas_sucias
 
     # 4) Leer el Excel
     archivo_excel = r"C:\Users\Thomas\OneDrive\BRONZ\Django-Bronz\Otros\Sueldos y honorarios.xlsx"
@@ -74,6 +75,7 @@ def main():
     mensajes = []
     if objetos:
         SueldosHonorarios.objects.bulk_create(objetos)
+        marcar_fechas_sucias((o.fecha for o in objetos), SueldosHonorarios._meta.db_table)
         mensajes.append(f"✅ {len(objetos)} registros importados en SueldosHonorarios.")
     else:
         mensajes.append("⚠️ No hay registros válidos para importar.")
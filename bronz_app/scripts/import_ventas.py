@@ -43,6 +43,9 @@ def main():
 
     # 5. Importar modelos
     from bronz_app.models import Ventas, Catalogo
+    from bronz_app.libro_stock import sincronizar_libro_stock
+    from bronz_app.rangos_sucios import marcar_fechas_sucias
+    from consult_app.cierres_stock import invalidar_cierres
 
     # 6. Limitar columnas hasta "Débito Plataforma"
     limite_columna = "Débito Plataforma"
@@ -91,11 +94,14 @@ def main():
     # 8. Crear registros
     ventas_creadas = []
     errores = []
+    catalogo = Catalogo.objects.in_bulk(field_name='sku')
 
     for idx, row in df.iterrows():
         try:
             sku_code = str(row.get('sku')).strip()
-            sku_obj = Catalogo.objects.get(sku=sku_code)
+            sku_obj = catalogo.get(sku_code)
+            if sku_obj is None:
+                raise Catalogo.DoesNotExist
 
             venta = Ventas(
                 fecha=pd.to_datetime(row.get('fecha')).date(),
@@ -130,7 +136,6 @@ def main():
                 cuenta_debito_plataformas=safe_int(row.get('cuenta_debito_plataformas'), 3010212),
                 cuenta_credito_plataformas=safe_int(row.get('cuenta_credito_plataformas'), 1010100)
             )
-            venta.save()
             ventas_creadas.append(venta)
 
         except Catalogo.DoesNotExist:
@@ -138,6 +143,15 @@ def main():
         except Exception as e:
             errores.append(f"Fila {idx+2}: {e}")
 
+    # bulk_create no dispara señales: una marca de rango sucio, una sincronización
+    # del libro de stock (con el costo promedio) y una invalidación de cierres
+    if ventas_creadas:
+        Ventas.objects.bulk_create(ventas_creadas, batch_size=2000)
+        fechas = [v.fecha for v in ventas_creadas]
+        marcar_fechas_sucias(fechas, Ventas._meta.db_table)
+        sincronizar_libro_stock(min(fechas), max(fechas), modelos=[Ventas])
+        invalidar_cierres(min(fechas), max(fechas))
+
     # 9. Reporte final
     msg = f"✅ Se importaron {len(ventas_creadas)} registros a 'ventas'."
     if errores:
@@ -0,0 +1,70 @@
+from django.db import transaction
+
+from bronz_app.models import RangoSucio, SnapshotLibro
+from bronz_app.coordinador_regeneracion import regenerar_coordinado
+from bronz_app.motor_balance import Balance, balance_resumenes
+from bronz_app.utils import version_libro
+
+
+# ——————————————————————————————————————————————————————————————
+# SNAPSHOT POR (AÑO PANEL, VERSIÓN)
+# ——————————————————————————————————————————————————————————————
+
+def construir_snapshot(panel_year, version):
+    balance = balance_resumenes(panel_year)
+
+    with transaction.atomic():
+        snapshot, _ = SnapshotLibro.objects.update_or_create(
+            panel_year=panel_year,
+            version=version,
+            defaults={
+                'debitos': {str(k): v for k, v in balance.debitos_dict().items()},
+                'creditos': {str(k): v for k, v in balance.creditos_dict().items()},
+                'matriz': balance.matriz_dict(),
+            },
+        )
+        # Las versiones anteriores del mismo año ya no se leen
+        SnapshotLibro.objects.filter(panel_year=panel_year, version__lt=version).delete()
+    return snapshot
+
+
+def obtener_snapshot(panel_year, refrescar=False):
+    """
+    Devuelve el último snapshot del año sin recalcular: las escrituras encolan
+    la regeneración en segundo plano (rangos_sucios), que rehace los snapshots
+    al terminar. snapshot.desactualizado indica que hay escrituras aún no
+    reflejadas (en ese caso se asegura el trabajo en la cola). Solo con
+    refrescar=True se regenera y recalcula aquí mismo.
+    """
+    if refrescar:
+        regenerar_coordinado()
+        snapshot = construir_snapshot(panel_year, version_libro())
+        snapshot.desactualizado = False
+        return snapshot
+
+    version = version_libro()
+    snapshot = SnapshotLibro.objects.filter(panel_year=panel_year).order_by('-version').first()
+    if snapshot is None:
+        # Primera consulta del año: se calcula con las tablas tal como están
+        snapshot = construir_snapshot(panel_year, version)
+    snapshot.desactualizado = snapshot.version != version or RangoSucio.objects.exists()
+    if snapshot.desactualizado:
+        from bronz_app.trabajos import encolar
+        encolar('regenerar_pendientes')
+    return snapshot
+
+
+def actualizar_snapshots():
+    """Rehace, con la versión actual, los snapshots de los años ya consultados. Devuelve esos años."""
+    version = version_libro()
+    anios = sorted(set(
+        SnapshotLibro.objects.filter(version__lt=version).values_list('panel_year', flat=True)
+    ))
+    for panel_year in anios:
+        construir_snapshot(panel_year, version)
+    return anios
+
+
+def balance_de_snapshot(snapshot):
+    """Balance de 8 columnas desde los totales guardados (sin volver a consultar)."""
+    return Balance.desde_totales(snapshot.debitos_dict(), snapshot.creditos_dict())
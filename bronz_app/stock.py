@@ -0,0 +1,105 @@
+# bronz_app/stock.py
+
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from bronz_app.models import (
+    AjusteInventario,
+    Catalogo,
+    EntradaProductos,
+    Envios,
+    InventarioInicial,
+    MovimientoStock,
+    StockUbicacion,
+    Ventas,
+)
+from bronz_app.kits import consumo_en_kits
+
+# Columnas calculadas de stock_por_sku, en el orden de la tabla
+# (enviado / vendido: Catalogo ya tiene las relaciones inversas envios y ventas)
+COLUMNAS_STOCK = (
+    'inicial', 'bodega', 'ingresos', 'enviado', 'vendido', 'ajustes',
+    'en_oficina', 'en_bodega', 'ajuste_ventas', 'total',
+)
+
+
+# ——————————————————————————————————————————————————————————————
+# STOCK POR SKU EN UNA SOLA SENTENCIA
+# ——————————————————————————————————————————————————————————————
+
+def _suma_por_sku(modelo, campo, sku):
+    """Subconsulta SUM(campo) de `modelo` para el SKU `sku` (OuterRef o literal); 0 si no hay filas."""
+    return Coalesce(
+        Subquery(
+            modelo.objects.filter(sku=sku)
+            .values('sku')
+            .annotate(total=Sum(campo))
+            .values('total')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def _en_stock(*ubicaciones):
+    """Stock actual del SKU en las ubicaciones dadas, leído de stock_ubicacion (libro de stock)."""
+    return Coalesce(
+        Subquery(
+            StockUbicacion.objects.filter(sku=OuterRef('sku'), ubicacion__in=ubicaciones)
+            .values('sku')
+            .annotate(total=Sum('cantidad'))
+            .values('total')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def anotar_stock(qs):
+    """
+    Anota un QuerySet de Catalogo (o de un proxy) con los movimientos y el stock
+    de cada SKU (COLUMNAS_STOCK), todo en una sentencia con subconsultas por
+    tabla fuente. Ordenar, paginar y totalizar se hace en la base de datos.
+
+    en_oficina, en_bodega y total se leen de stock_ubicacion, que mantiene
+    bronz_app.libro_stock con la misma lógica:
+      en_oficina = inicial + ingresos - enviado
+      en_bodega  = bodega + enviado - ajuste_ventas
+      total      = en_oficina + en_bodega - ajustes
+    """
+    return (
+        qs.annotate(
+            inicial=_suma_por_sku(InventarioInicial, 'stock', OuterRef('sku')),
+            bodega=_suma_por_sku(InventarioInicial, 'bodega', OuterRef('sku')),
+            ingresos=_suma_por_sku(EntradaProductos, 'cantidad_ingresada', OuterRef('sku')),
+            enviado=_suma_por_sku(Envios, 'cantidad', OuterRef('sku')),
+            vendido=_suma_por_sku(Ventas, 'cantidad', OuterRef('sku')),
+            ajustes=_suma_por_sku(AjusteInventario, 'cantidad', OuterRef('sku')),
+        )
+        .annotate(
+            # Ventas propias (salvo kits sin stock propio) + consumo por ventas de kits (lista de materiales)
+            ajuste_ventas=Case(
+                When(kit__descuenta_stock_propio=False, then=Value(0)),
+                default='vendido',
+                output_field=IntegerField(),
+            ) + consumo_en_kits(OuterRef('sku')),
+            en_oficina=_en_stock(MovimientoStock.OFICINA),
+            en_bodega=_en_stock(MovimientoStock.BODEGA),
+            total=_en_stock(MovimientoStock.OFICINA, MovimientoStock.BODEGA, MovimientoStock.AJUSTE),
+        )
+    )
+
+
+def stock_por_sku(q=''):
+    """Todo el Catálogo (o lo que calza con la búsqueda `q`) anotado con anotar_stock."""
+    qs = Catalogo.objects.all()
+    if q:
+        qs = qs.filter(Q(sku__icontains=q) | Q(categoria__icontains=q) | Q(producto__icontains=q))
+    return anotar_stock(qs)
+
+
+def totales_stock(qs):
+    """Totales de COLUMNAS_STOCK sobre un QuerySet de stock_por_sku (una consulta)."""
+    # Alias distintos de las anotaciones: con el mismo nombre Django arma mal la subconsulta
+    totales = qs.order_by().aggregate(**{f'suma_{columna}': Sum(columna) for columna in COLUMNAS_STOCK})
+    return {columna: totales[f'suma_{columna}'] or 0 for columna in COLUMNAS_STOCK}
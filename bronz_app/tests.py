@@ -1,3 +1,300 @@
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.db.models import Sum
 from django.test import TestCase
 
-# Create your tests here.
+from bronz_app.costo_promedio import recalcular_costos
+from bronz_app.indicadores import calcular_indicadores, obtener_indicadores
+from bronz_app.libro_stock import sincronizar_libro_stock
+from bronz_app.models import (
+    AsientosContables,
+    BalanceInicial,
+    Catalogo,
+    ComponenteKit,
+    CostoPromedio,
+    CuboCuentaMes,
+    EntradaProductos,
+    InventarioInicial,
+    Kit,
+    MovimientoStock,
+    MovimientoUnificadoCredito,
+    MovimientoUnificadoDebito,
+    OtrosGastos,
+    RangoSucio,
+    ResumenCredito,
+    ResumenDebito,
+    ResumenMensual,
+    StockUbicacion,
+    Ventas,
+    VentasConsulta,
+)
+from bronz_app.rangos_sucios import agrupar_rangos_sucios, marcar_todo_sucio
+from bronz_app.utils import regenerar_rangos_sucios
+
+# Tablas derivadas que la regeneración incremental debe dejar igual que una completa
+DERIVADAS = (
+    VentasConsulta,
+    MovimientoUnificadoDebito,
+    MovimientoUnificadoCredito,
+    ResumenDebito,
+    ResumenCredito,
+    CuboCuentaMes,
+    ResumenMensual,
+)
+
+
+def _contenido(modelo):
+    """Multiconjunto de las filas sin id ni marcas de tiempo (la regeneración los cambia)."""
+    campos = [
+        f.attname for f in modelo._meta.concrete_fields
+        if not f.primary_key and not getattr(f, 'auto_now', False) and not getattr(f, 'auto_now_add', False)
+    ]
+    return Counter(modelo.objects.values_list(*campos))
+
+
+def _producto(sku, costo='100'):
+    return Catalogo.objects.create(
+        sku=sku, fecha_ingreso=date(2024, 1, 1), categoria='Aros', producto=f'Producto {sku}',
+        numero_lote='1', costo_promedio_neto=Decimal(costo),
+    )
+
+
+def _entrada(fecha, producto, cantidad, costo_unitario):
+    # Sin factura: costo_neto = cantidad × costo_con_iva
+    return EntradaProductos.objects.create(
+        fecha=fecha, sku=producto, cantidad_ingresada=cantidad,
+        costo_con_iva=Decimal(costo_unitario), documento_anticipo='Otro',
+    )
+
+
+def _venta(fecha, producto, cantidad):
+    return Ventas.objects.create(
+        fecha=fecha, sku=producto, cantidad=cantidad, valor_unitario_venta=1190, comprador='nan',
+    )
+
+
+class DatosContables(TestCase):
+    """Catálogo, entradas, ventas, asientos y gastos repartidos en el primer semestre de 2024."""
+
+    def setUp(self):
+        self.aro, self.collar, self.pulsera = (_producto(s) for s in ('BB0101', 'BB0102', 'BB0103'))
+        InventarioInicial.objects.create(sku='BB0101', stock=5, bodega=3)
+        for mes in range(1, 7):
+            _entrada(date(2024, mes, 3), self.aro, 10, 119 * mes)
+            _entrada(date(2024, mes, 5), self.collar, 4, 238)
+            _venta(date(2024, mes, 10), self.aro, 3)
+            _venta(date(2024, mes, 12), self.collar, 2)
+            _venta(date(2024, mes, 20), self.pulsera, 1)
+            AsientosContables.objects.create(
+                fecha=date(2024, mes, 15), monto=Decimal(1000 * mes),
+                cuenta_debito='1010100', cuenta_credito='3010300', comentario=f'Asiento {mes}',
+            )
+        OtrosGastos.objects.create(
+            fecha=date(2024, 4, 6), otros_gastos='Otros', total=119, iva=19, monto_neto=100,
+            cuenta_debito='3010300', debito=100, cuenta_credito='1010100', credito=100,
+            cuenta_debito_eerr='2010500', debito_eerr=100,
+        )
+
+    def modificar(self):
+        """Edición, borrado, movimiento retroactivo e inserción retroactiva."""
+        asiento = AsientosContables.objects.get(fecha=date(2024, 3, 15))
+        asiento.monto = Decimal('4321.50')
+        asiento.save()
+
+        venta = Ventas.objects.get(fecha=date(2024, 5, 10))
+        venta.fecha = date(2024, 1, 25)
+        venta.save()
+
+        EntradaProductos.objects.get(fecha=date(2024, 2, 5)).delete()
+        _entrada(date(2024, 1, 2), self.collar, 6, 357)
+        OtrosGastos.objects.create(
+            fecha=date(2024, 2, 14), otros_gastos='Otros', total=238, iva=38, monto_neto=200,
+            cuenta_debito='3010300', debito=200, cuenta_credito='1010100', credito=200,
+            cuenta_debito_eerr='2010500', debito_eerr=200,
+        )
+
+        self.pulsera.costo_promedio_neto = Decimal('250')
+        self.pulsera.save()
+
+
+# ——————————————————————————————————————————————————————————————
+# RANGOS SUCIOS: INCREMENTAL == COMPLETO
+# ——————————————————————————————————————————————————————————————
+
+class RegeneracionIncrementalTests(DatosContables):
+
+    def test_rangos_sucios_igual_a_regeneracion_completa(self):
+        regenerar_rangos_sucios()
+        self.modificar()
+
+        rangos = list(RangoSucio.objects.values_list('fecha_desde', 'fecha_hasta'))
+        self.assertTrue(rangos)
+        self.assertNotIn((None, None), rangos)  # el camino incremental, no una regeneración completa
+        regenerar_rangos_sucios()
+        incremental = {modelo.__name__: _contenido(modelo) for modelo in DERIVADAS}
+
+        marcar_todo_sucio('tests')
+        regenerar_rangos_sucios()
+        for modelo in DERIVADAS:
+            with self.subTest(tabla=modelo.__name__):
+                self.assertEqual(incremental[modelo.__name__], _contenido(modelo))
+        self.assertTrue(incremental['MovimientoUnificadoDebito'])
+
+
+# ——————————————————————————————————————————————————————————————
+# LIBRO DE STOCK: INCREMENTAL == SINCRONIZACIÓN DESDE CERO
+# ——————————————————————————————————————————————————————————————
+
+class LibroStockTests(DatosContables):
+
+    def setUp(self):
+        super().setUp()
+        self.pack = _producto('BB0104')
+        kit = Kit.objects.create(sku=self.pack, descuenta_stock_propio=False)
+        ComponenteKit.objects.create(kit=kit, componente=self.aro, cantidad=2)
+        _venta(date(2024, 3, 8), self.pack, 1)
+
+    def assertLibroIgualASincronizacionCompleta(self):
+        stock = _contenido(StockUbicacion)
+        neto = self.neto_por_dia()
+        MovimientoStock.objects.all().delete()
+        StockUbicacion.objects.all().delete()
+        sincronizar_libro_stock()
+        self.assertEqual(stock, _contenido(StockUbicacion))
+        self.assertEqual(neto, self.neto_por_dia())
+
+    @staticmethod
+    def neto_por_dia():
+        # El libro solo agrega filas: se compara el neto por (sku, ubicación, fecha)
+        filas = MovimientoStock.objects.values_list('sku', 'ubicacion', 'fecha').annotate(total=Sum('cantidad'))
+        return {tuple(clave): total for *clave, total in filas.order_by() if total}
+
+    def test_senales_igual_a_sincronizacion_completa(self):
+        self.modificar()
+        componente = ComponenteKit.objects.get(kit__sku=self.pack)
+        componente.cantidad = 3
+        componente.save()
+        self.assertLibroIgualASincronizacionCompleta()
+
+    def test_lote_igual_a_sincronizacion_completa(self):
+        with agrupar_rangos_sucios():
+            self.modificar()
+            for venta in Ventas.objects.filter(sku=self.collar):
+                venta.cantidad += 1
+                venta.save()
+            ComponenteKit.objects.create(kit=self.pack.kit, componente=self.collar, cantidad=1)
+        self.assertLibroIgualASincronizacionCompleta()
+
+
+# ——————————————————————————————————————————————————————————————
+# COSTO PROMEDIO PONDERADO MÓVIL
+# ——————————————————————————————————————————————————————————————
+
+class CostoPromedioTests(TestCase):
+    """
+    promedio = (stock_previo × promedio + costo_entradas) / (stock_previo + cantidad),
+    con stock_previo al cierre del día anterior. Los valores esperados están
+    calculados a mano para cada paso.
+    """
+
+    def setUp(self):
+        self.aro = _producto('BB0001', costo='90')
+        _entrada(date(2024, 1, 10), self.aro, 10, 100)    # 0 previo → 1000 / 10 = 100
+        self.venta_enero = _venta(date(2024, 1, 20), self.aro, 4)
+        _entrada(date(2024, 2, 10), self.aro, 4, 300)     # (6 × 100 + 1200) / 10 = 180
+        self.venta_febrero = _venta(date(2024, 2, 15), self.aro, 1)
+        regenerar_rangos_sucios()
+
+    def costos(self):
+        return list(CostoPromedio.objects.filter(sku='BB0001').order_by('fecha').values_list('fecha', 'costo_promedio'))
+
+    def assertCostoVenta(self, venta, costo_unitario):
+        regenerar_rangos_sucios()
+        fila = VentasConsulta.objects.get(codigo_producto='BB0001', fecha=venta.fecha)
+        self.assertEqual(fila.costo_promedio_neto, Decimal(costo_unitario))
+        self.assertEqual(fila.costo_venta, Decimal(costo_unitario) * venta.cantidad)
+
+    def test_historia_inicial(self):
+        self.assertEqual(self.costos(), [(date(2024, 1, 10), Decimal('100')), (date(2024, 2, 10), Decimal('180'))])
+        self.assertCostoVenta(self.venta_enero, '100')
+        self.assertCostoVenta(self.venta_febrero, '180')
+
+    def test_entrada_retroactiva_y_cambios(self):
+        # 0 previo → 3000 / 10 = 300; luego (10 × 300 + 1000) / 20 = 200; (16 × 200 + 1200) / 20 = 220
+        _entrada(date(2024, 1, 5), self.aro, 10, 300)
+        self.assertEqual(self.costos(), [
+            (date(2024, 1, 5), Decimal('300')), (date(2024, 1, 10), Decimal('200')), (date(2024, 2, 10), Decimal('220')),
+        ])
+        self.assertCostoVenta(self.venta_febrero, '220')
+
+        # La venta de enero pasa antes de la segunda entrada: (6 × 300 + 1000) / 16 = 175; (16 × 175 + 1200) / 20 = 200
+        self.venta_enero.fecha = date(2024, 1, 7)
+        self.venta_enero.save()
+        self.assertEqual(self.costos(), [
+            (date(2024, 1, 5), Decimal('300')), (date(2024, 1, 10), Decimal('175')), (date(2024, 2, 10), Decimal('200')),
+        ])
+        self.assertCostoVenta(self.venta_enero, '300')
+        self.assertCostoVenta(self.venta_febrero, '200')
+
+        # Sin la entrada de febrero rige el costo del 10 de enero
+        EntradaProductos.objects.get(fecha=date(2024, 2, 10)).delete()
+        self.assertEqual(self.costos(), [(date(2024, 1, 5), Decimal('300')), (date(2024, 1, 10), Decimal('175'))])
+        self.assertCostoVenta(self.venta_febrero, '175')
+
+        # El recálculo completo llega a lo mismo que las señales
+        incremental = _contenido(CostoPromedio)
+        CostoPromedio.objects.all().delete()
+        recalcular_costos()
+        self.assertEqual(incremental, _contenido(CostoPromedio))
+
+    def test_venta_antes_de_la_primera_entrada_usa_costo_del_catalogo(self):
+        venta = _venta(date(2024, 1, 2), self.aro, 2)
+        self.assertCostoVenta(venta, '90')
+
+
+# ——————————————————————————————————————————————————————————————
+# INDICADORES FINANCIEROS
+# ——————————————————————————————————————————————————————————————
+
+class IndicadoresTests(TestCase):
+
+    def setUp(self):
+        BalanceInicial.objects.create(
+            fecha=date(2024, 1, 1), cuenta_debito=1010900, debito=Decimal('1000'),
+            cuenta_credito=2030100, credito=Decimal('1000'), comentario='Balance inicial',
+        )
+        AsientosContables.objects.create(
+            fecha=date(2024, 1, 15), monto=Decimal('500'),
+            cuenta_debito='1010900', cuenta_credito='1010100', comentario='Compra',
+        )
+        _venta(date(2024, 1, 20), _producto('BB0201'), 2)  # costo de ventas 200, sale de existencias
+        regenerar_rangos_sucios()
+
+    def valores(self, anio, clave):
+        datos = calcular_indicadores(anio, hasta_mes=1)
+        return next(i['valores'] for i in datos['indicadores'] if i['clave'] == clave)
+
+    def test_enero_promedia_con_el_saldo_inicial(self):
+        # Existencias: apertura 1000, cierre de enero 1000 + 500 - 200 = 1300 → promedio 1150
+        self.assertEqual(self.valores(2024, 'dias_inventario')[0], 1150 * 31 / 200)
+
+    def test_cada_anio_abre_con_su_balance_inicial(self):
+        # 2025: apertura 1300, venta de 100 en enero → cierre 1200, promedio 1250
+        BalanceInicial.objects.create(
+            fecha=date(2025, 1, 1), cuenta_debito=1010900, debito=Decimal('1300'),
+            cuenta_credito=2030100, credito=Decimal('1300'), comentario='Balance inicial',
+        )
+        _venta(date(2025, 1, 10), Catalogo.objects.get(sku='BB0201'), 1)
+        regenerar_rangos_sucios()
+        self.assertEqual(self.valores(2025, 'dias_inventario')[0], 1250 * 31 / 100)
+
+    def test_snapshot_del_anio_en_curso_se_rehace_al_cambiar_el_mes(self):
+        with mock.patch('bronz_app.indicadores._hasta_mes', return_value=1):
+            self.assertEqual(obtener_indicadores(2024)['periodos'], ['2024-01', '2024'])
+        with mock.patch('bronz_app.indicadores._hasta_mes', return_value=2):
+            datos = obtener_indicadores(2024)
+        self.assertEqual(datos['periodos'], ['2024-01', '2024-02', '2024'])
+        self.assertFalse(datos['desactualizado'])
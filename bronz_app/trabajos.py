@@ -0,0 +1,263 @@
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from bronz_app.coordinador_regeneracion import candado_regeneracion, regenerar_coordinado
+from bronz_app.libro_stock import sincronizar_libro_stock
+from bronz_app.models import RangoSucio, TrabajoFondo
+from bronz_app.plan_cuentas import regenerar_rollups_cuenta_mes
+from bronz_app.utils import (
+    poblar_movimientos_unificados_credito,
+    poblar_movimientos_unificados_debito,
+    regenerar_cubo_cuenta_mes,
+    regenerar_resumenes_credito_debito,
+    regenerar_saldos_diarios,
+    regenerar_ventas_consulta,
+)
+
+logger = logging.getLogger(__name__)
+
+MODO = getattr(settings, 'BRONZ_TRABAJOS_MODO', 'hilo')
+HILOS = getattr(settings, 'BRONZ_TRABAJOS_HILOS', 1)
+
+# tipo → (descripción, función(trabajo, **parametros) → mensaje final)
+REGISTRO = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def registrar_trabajo(tipo, descripcion):
+    def decorador(funcion):
+        REGISTRO[tipo] = (descripcion, funcion)
+        return funcion
+    return decorador
+
+
+def descripcion_trabajo(tipo):
+    return REGISTRO.get(tipo, (tipo, None))[0]
+
+
+def avanzar(trabajo, progreso, mensaje=''):
+    """Publica el avance (0..100) para los endpoints de estado."""
+    TrabajoFondo.objects.filter(pk=trabajo.pk).update(progreso=progreso, mensaje=mensaje)
+
+
+# ——————————————————————————————————————————————————————————————
+# TRABAJOS DISPONIBLES
+# ——————————————————————————————————————————————————————————————
+
+@registrar_trabajo('procesar_todo', 'Procesar todo (libro de stock, costo promedio, VentasConsulta, uniones, resúmenes, cubo y saldos diarios)')
+def _procesar_todo(trabajo):
+    inicio = timezone.now()
+    with candado_regeneracion():
+        # El libro de stock (y con él el costo promedio) antes que VentasConsulta,
+        # que lee el costo vigente a cada venta; las uniones leen costo_venta desde ella.
+        avanzar(trabajo, 5, 'Sincronizando libro de stock y costo promedio…')
+        sincronizar_libro_stock()
+        avanzar(trabajo, 15, 'Regenerando VentasConsulta…')
+        regenerar_ventas_consulta()
+        avanzar(trabajo, 30, 'Procesando unión de créditos…')
+        poblar_movimientos_unificados_credito()
+        avanzar(trabajo, 55, 'Procesando unión de débitos…')
+        poblar_movimientos_unificados_debito()
+        avanzar(trabajo, 75, 'Regenerando resúmenes…')
+        regenerar_resumenes_credito_debito()
+        avanzar(trabajo, 85, 'Regenerando cubo cuenta × mes…')
+        regenerar_cubo_cuenta_mes()
+        regenerar_rollups_cuenta_mes()
+        avanzar(trabajo, 90, 'Regenerando saldos diarios…')
+        regenerar_saldos_diarios()
+        # La regeneración completa cubre los rangos marcados antes de empezar
+        RangoSucio.objects.filter(creado__lte=inicio).delete()
+    return 'Todos los procesos ejecutados: Libro de stock, Costo promedio, VentasConsulta, Unión Créditos, Unión Débitos, Resúmenes y Cubo.'
+
+
+@registrar_trabajo('ventas_consulta', 'Regenerar VentasConsulta')
+def _ventas_consulta(trabajo):
+    with candado_regeneracion():
+        total = regenerar_ventas_consulta()
+    return f'VentasConsulta regenerada: {total} registros.'
+
+
+@registrar_trabajo('union_credito', 'Procesar unión de créditos')
+def _union_credito(trabajo):
+    with candado_regeneracion():
+        total = poblar_movimientos_unificados_credito()
+    return f'Unión de créditos procesada: {total} movimientos.'
+
+
+@registrar_trabajo('union_debito', 'Procesar unión de débitos')
+def _union_debito(trabajo):
+    with candado_regeneracion():
+        total = poblar_movimientos_unificados_debito()
+    return f'Unión de débitos procesada: {total} movimientos.'
+
+
+@registrar_trabajo('resumenes', 'Regenerar resúmenes crédito/débito')
+def _resumenes(trabajo):
+    with candado_regeneracion():
+        total_creditos, total_debitos = regenerar_resumenes_credito_debito()
+        regenerar_cubo_cuenta_mes()
+        regenerar_rollups_cuenta_mes()
+    return f'Resúmenes regenerados: {total_creditos} créditos y {total_debitos} débitos.'
+
+
+@registrar_trabajo('regenerar_pendientes', 'Regenerar lo modificado (rangos sucios) y los snapshots de reportes')
+def _regenerar_pendientes(trabajo):
+    # Lo encola cada escritura (rangos_sucios) y cada reporte que sirve un snapshot atrasado
+    from bronz_app.indicadores import actualizar_indicadores
+    from bronz_app.snapshot_libro import actualizar_snapshots
+
+    avanzar(trabajo, 10, 'Regenerando rangos modificados…')
+    rangos = regenerar_coordinado()
+    avanzar(trabajo, 70, 'Actualizando snapshots de reportes…')
+    anios = sorted(set(actualizar_snapshots()) | set(actualizar_indicadores()))
+    return f'{len(rangos)} rango(s) regenerado(s); snapshots actualizados: {anios or "ninguno"}.'
+
+
+@registrar_trabajo('resultados_mensuales', 'Recalcular resultados mensuales detallados')
+def _resultados_mensuales(trabajo, año=None):
+    from bronz_app.utils_balance import calcular_resultados_mensuales
+
+    avanzar(trabajo, 10, 'Regenerando tablas derivadas…')
+    regenerar_coordinado()
+    avanzar(trabajo, 50, f'Calculando resultados {año}…')
+    calcular_resultados_mensuales(año=año)
+    return f'Resultados detallados recalculados para {año}.'
+
+
+# ——————————————————————————————————————————————————————————————
+# COLA
+# ——————————————————————————————————————————————————————————————
+
+def encolar(tipo, usuario=None, **parametros):
+    """
+    Encola un trabajo y vuelve de inmediato. Si ya hay uno pendiente del mismo
+    tipo y con los mismos parámetros, devuelve ese en lugar de duplicarlo; la
+    restricción trabajos_pendiente_unico lo garantiza también entre peticiones
+    simultáneas.
+    """
+    if tipo not in REGISTRO:
+        raise ValueError(f'Tipo de trabajo desconocido: {tipo}')
+    if usuario is not None and not usuario.is_authenticated:
+        usuario = None
+
+    pendientes = TrabajoFondo.objects.filter(tipo=tipo, estado=TrabajoFondo.PENDIENTE, parametros=parametros)
+    pendiente = pendientes.first()
+    if pendiente is not None:
+        return pendiente
+    try:
+        with transaction.atomic():
+            trabajo = TrabajoFondo.objects.create(tipo=tipo, parametros=parametros, usuario=usuario)
+    except IntegrityError:
+        # Otra petición lo encoló entre la consulta y el INSERT (restricción trabajos_pendiente_unico)
+        pendiente = pendientes.first()
+        if pendiente is None:
+            raise
+        return pendiente
+    if MODO == 'hilo':
+        transaction.on_commit(lambda: _pool_hilos().submit(_ejecutar_en_hilo, trabajo.pk, nombre_worker('hilo')))
+    return trabajo
+
+
+def ejecutar_trabajo(trabajo_id, worker=''):
+    """
+    Reclama el trabajo (solo si sigue pendiente) y lo ejecuta.
+    Devuelve False si otro worker ya lo había tomado.
+    """
+    reclamado = TrabajoFondo.objects.filter(pk=trabajo_id, estado=TrabajoFondo.PENDIENTE).update(
+        estado=TrabajoFondo.EN_CURSO, iniciado=timezone.now(), worker=worker, progreso=0,
+    )
+    if not reclamado:
+        return False
+
+    trabajo = TrabajoFondo.objects.get(pk=trabajo_id)
+    _, funcion = REGISTRO.get(trabajo.tipo, (None, None))
+    try:
+        if funcion is None:
+            raise ValueError(f'Tipo de trabajo desconocido: {trabajo.tipo}')
+        mensaje = funcion(trabajo, **trabajo.parametros) or 'Listo.'
+        TrabajoFondo.objects.filter(pk=trabajo_id).update(
+            estado=TrabajoFondo.TERMINADO, progreso=100, mensaje=mensaje, terminado=timezone.now(),
+        )
+    except Exception as e:
+        logger.exception('Error en trabajo #%s (%s)', trabajo_id, trabajo.tipo)
+        TrabajoFondo.objects.filter(pk=trabajo_id).update(
+            estado=TrabajoFondo.ERROR, mensaje=str(e), terminado=timezone.now(),
+        )
+    return True
+
+
+def procesar_pendientes(hilos=1, worker='', limite=None):
+    """Ejecuta los trabajos pendientes (más antiguos primero). Devuelve cuántos tomó."""
+    ids = TrabajoFondo.objects.filter(estado=TrabajoFondo.PENDIENTE).order_by('creado').values_list('id', flat=True)
+    ids = list(ids[:limite] if limite else ids)
+    if hilos <= 1:
+        return sum(1 for pk in ids if ejecutar_trabajo(pk, worker))
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='bronz-trabajo') as pool:
+        return sum(pool.map(lambda pk: _ejecutar_en_hilo(pk, worker), ids))
+
+
+def recuperar_colgados(minutos):
+    """Marca como error los trabajos 'en curso' más viejos que `minutos` (worker caído)."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TrabajoFondo.objects.filter(estado=TrabajoFondo.EN_CURSO, iniciado__lt=limite).update(
+        estado=TrabajoFondo.ERROR, mensaje='Interrumpido: el worker dejó de responder.', terminado=timezone.now(),
+    )
+
+
+def _ejecutar_en_hilo(trabajo_id, worker):
+    try:
+        return ejecutar_trabajo(trabajo_id, worker)
+    finally:
+        # Cada hilo abre sus propias conexiones: cerrarlas al terminar
+        connections.close_all()
+
+
+def _pool_hilos():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix='bronz-trabajo')
+        return _pool
+
+
+def nombre_worker(prefijo):
+    return f'{prefijo}:{socket.gethostname()}:{os.getpid()}'
+
+
+# ——————————————————————————————————————————————————————————————
+# LECTURA PARA VISTAS
+# ——————————————————————————————————————————————————————————————
+
+def trabajo_a_dict(trabajo):
+    return {
+        'id': trabajo.pk,
+        'tipo': trabajo.tipo,
+        'descripcion': descripcion_trabajo(trabajo.tipo),
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'finalizado': trabajo.finalizado,
+        'creado': trabajo.creado.isoformat() if trabajo.creado else None,
+        'iniciado': trabajo.iniciado.isoformat() if trabajo.iniciado else None,
+        'terminado': trabajo.terminado.isoformat() if trabajo.terminado else None,
+    }
+
+
+def trabajos_para_aviso(usuario, limite=5):
+    """Trabajos del usuario cuyo aviso en home sigue abierto (en curso o sin cerrar)."""
+    if usuario is None or not usuario.is_authenticated:
+        return []
+    trabajos = list(TrabajoFondo.objects.filter(usuario=usuario, visto=False).order_by('-creado')[:limite])
+    for trabajo in trabajos:
+        trabajo.descripcion = descripcion_trabajo(trabajo.tipo)
+    return trabajos
@@ -27,18 +27,27 @@ urlpatterns = [
     path('procesar-resumenes/', views.procesar_resumenes, name='procesar_resumenes'),
     path('procesar-ventas-consulta/', views.procesar_ventas_consulta, name='procesar_ventas_consulta'),
     path('procesar-todo/', views.procesar_todo, name='procesar_todo'),
+    path('regeneracion/metricas/', views.metricas_regeneracion_view, name='metricas_regeneracion'),
+    path('trabajos/', views.trabajos_recientes, name='trabajos_recientes'),
+    path('trabajos/<int:pk>/', views.estado_trabajo, name='estado_trabajo'),
+    path('trabajos/<int:pk>/cerrar/', views.cerrar_aviso_trabajo, name='cerrar_aviso_trabajo'),
 
     # Procesar Inventario y Exportar datos
     path('exportar-a-excel/', views.exportar_resumen_excel, name='export_a_excel'),
     path('procesar-inventario/', views.procesar_inventario, name='procesar_inventario'),
     path('exportar-inventario/', views.exportar_inventario_actual, name='exportar_inventario_actual'),
     path('inventario/', views.inventario_actual, name='inventario_actual'),
+    path('stock/', views.stock_json_view, name='stock_json'),
 
     # Balance
     path('balance/', views.balance_view, name='balance'),
     path('resumen_balance/', resumen_balance_view, name='resumen_balance'),
     path('balance-segun-fecha/', views.balance_segun_fecha_view, name='balance_segun_fecha'),
+    path('balance-comparativo/', views.balance_comparativo_view, name='balance_comparativo'),
+    path('plan-cuentas/hijos/', views.plan_cuentas_hijos_view, name='plan_cuentas_hijos'),
     path('resumen_balance_segun_fecha/', views.resumen_balance_segun_fecha_view, name='resumen_balance_segun_fecha'),
+    path('indicadores/', views.indicadores_view, name='indicadores'),
+    path('indicadores/json/', views.indicadores_json_view, name='indicadores_json'),
 
     #Resumen Financiero
     path('resumenfinanciero/', views.resumen_financiero, name='resumen_financiero'),
@@ -1,77 +1,131 @@
-from django.db import transaction
-from django.db.models import F, Value, TextField, DecimalField, Sum
-from django.db.models.functions import Cast, Coalesce
-from datetime import date
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q, Value, TextField, DecimalField, IntegerField, Count, Max, Min, OuterRef, Subquery, Sum, ExpressionWrapper
+from django.db.models.functions import Cast, Coalesce, ExtractMonth, ExtractYear, TruncMonth
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
 from bronz_app.models import (
     OtrosGastos,
     SueldosHonorarios,
     AsientosContables,
     EntradaProductos,
     BalanceInicial,
+    CuboCuentaMes,
     Ventas,
     VentasConsulta,
     MovimientoUnificadoCredito,
     MovimientoUnificadoDebito,
     ResumenCredito,
     ResumenDebito,
+    RangoSucio,
+    ResumenMensual,
+    SaldoDiario,
+    VersionLibro,
 )
+from bronz_app.costo_promedio import costo_vigente
+from bronz_app.vistas_materializadas import es_vista_materializada, refrescar_vista_materializada
+
+# ——————————————————————————————————————————————————————————————
+#   VERSIÓN DEL LIBRO
+# ——————————————————————————————————————————————————————————————
+
+def version_libro():
+    """Versión actual de las tablas derivadas (0 si nunca se regeneraron)."""
+    return VersionLibro.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def incrementar_version_libro():
+    """Marca que las tablas derivadas cambiaron: invalida los snapshots de reportes."""
+    if not VersionLibro.objects.filter(pk=1).update(version=F('version') + 1):
+        VersionLibro.objects.get_or_create(pk=1, defaults={'version': 1})
 
 # ——————————————————————————————————————————————————————————————
 #   VENTAS CONSULTA
 # ————————————————————————————————————————————————————————
 
-def regenerar_ventas_consulta(start_date=None, end_date=None):
+# Columnas de VentasConsulta → alias en el SELECT sobre ventas ⋈ catalogo.
+# Los alias "vc_*" evitan choques con campos homónimos de Ventas (p. ej. costo_venta).
+COLUMNAS_VENTAS_CONSULTA = {
+    'fecha': 'fecha',
+    'codigo_producto': 'vc_codigo_producto',
+    'comprador': 'comprador',
+    'cantidad': 'cantidad',
+    'total_venta': 'total_venta',
+    'cuenta_debito': 'cuenta_debito',
+    'debito': 'debito',
+    'cuenta_credito': 'cuenta_credito',
+    'cuenta_debito_eerr': 'cuenta_debito_eerr',
+    'debito_eerr': 'debito_eerr',
+    'cuenta_credito_eerr': 'cuenta_credito_eerr',
+    'credito_eerr': 'credito_eerr',
+    'costo_promedio_neto': 'vc_costo_promedio_neto',
+    'comentario': 'vc_comentario',
+    'costo_venta': 'vc_costo_venta',
+    'categoria': 'vc_categoria',
+    'producto': 'vc_producto',
+    'cuenta_debito_envio': 'cuenta_debito_envio',
+    'credito_iva': 'credito_iva',
+    'venta_neta_iva': 'vc_venta_neta_iva',
+    'credito_envio': 'credito_envio',
+    'debito_envio': 'debito_envio',
+}
+
+# 'sql'    → un solo INSERT … SELECT sobre ventas ⋈ catalogo
+# 'python' → iterador por lotes + bulk_create (para motores sin INSERT … SELECT)
+VENTAS_CONSULTA_MODO = getattr(settings, 'BRONZ_VENTAS_CONSULTA_MODO', 'sql')
+VENTAS_CONSULTA_LOTE = 2000
+
+
+def ventas_consulta_qs(start_date=None, end_date=None):
     """
-    Regenera la tabla VentasConsulta.
-    Si se proporcionan fechas, solo borra y regenera ventas dentro del rango.
+    SELECT de Ventas unido a Catálogo con las columnas de VentasConsulta
+    (costo_venta = costo_promedio_neto * cantidad calculado en la base). El
+    costo es el promedio ponderado vigente a la fecha de la venta (costo_promedio,
+    por el índice (sku, fecha)); antes de la primera entrada, el del Catálogo.
     """
-    if start_date and end_date:
-        VentasConsulta.objects.filter(
-            fecha__gte=start_date,
-            fecha__lte=end_date
-        ).delete()
-    else:
-        VentasConsulta.objects.all().delete()
-
-    ventas = Ventas.objects.select_related('sku').all()
-    
+    ventas = Ventas.objects.all()
     if start_date:
         ventas = ventas.filter(fecha__gte=start_date)
     if end_date:
         ventas = ventas.filter(fecha__lte=end_date)
 
-    consultas = []
-    for venta in ventas:
-        sku_data = venta.sku
-        costo_venta = sku_data.costo_promedio_neto * venta.cantidad
-
-        consultas.append(VentasConsulta(
-            fecha=venta.fecha,
-            codigo_producto=sku_data.sku,
-            comprador=venta.comprador,
-            cantidad=venta.cantidad,
-            total_venta=venta.total_venta,
-            cuenta_debito=venta.cuenta_debito,
-            debito=venta.debito,
-            cuenta_credito=venta.cuenta_credito,
-            cuenta_debito_eerr=venta.cuenta_debito_eerr,
-            debito_eerr=venta.debito_eerr,
-            cuenta_credito_eerr=venta.cuenta_credito_eerr,
-            credito_eerr=venta.credito_eerr,
-            costo_promedio_neto=sku_data.costo_promedio_neto,
-            comentario=venta.comentario,
-            costo_venta=costo_venta,
-            categoria=sku_data.categoria,
-            producto=sku_data.producto,
-            cuenta_debito_envio=venta.cuenta_debito_envio,
-            credito_iva=venta.credito_iva,
-            venta_neta_iva=venta.venta_neta_de_iva,
-            credito_envio=venta.credito_envio,
-            debito_envio=venta.debito_envio
-        ))
+    decimal = DecimalField(max_digits=15, decimal_places=2)
+    costo = Coalesce(costo_vigente(OuterRef('sku_id'), OuterRef('fecha')), F('sku__costo_promedio_neto'))
+    return ventas.annotate(
+        vc_codigo_producto=F('sku__sku'),
+        vc_costo_promedio_neto=costo,
+        vc_costo_venta=ExpressionWrapper(costo * F('cantidad'), output_field=decimal),
+        vc_categoria=F('sku__categoria'),
+        vc_producto=F('sku__producto'),
+        vc_comentario=Coalesce(F('comentario'), Value(''), output_field=TextField()),
+        vc_venta_neta_iva=Cast(F('venta_neta_de_iva'), output_field=decimal),
+    ).values(*COLUMNAS_VENTAS_CONSULTA.values())
 
-    VentasConsulta.objects.bulk_create(consultas)
-    return len(consultas)
+
+def regenerar_ventas_consulta(start_date=None, end_date=None, modo=None, lote=VENTAS_CONSULTA_LOTE):
+    """
+    Regenera la tabla VentasConsulta.
+    Si se proporcionan fechas, solo borra y regenera ventas dentro del rango.
+    """
+    modo = modo or VENTAS_CONSULTA_MODO
+    qs = ventas_consulta_qs(start_date, end_date)
+
+    with transaction.atomic():
+        if start_date and end_date:
+            VentasConsulta.objects.filter(
+                fecha__gte=start_date,
+                fecha__lte=end_date
+            ).delete()
+        else:
+            VentasConsulta.objects.all().delete()
+
+        if modo == 'python':
+            total = insertar_select_por_lotes(VentasConsulta, qs, COLUMNAS_VENTAS_CONSULTA, lote)
+        else:
+            total = insertar_select_sql(VentasConsulta, qs, COLUMNAS_VENTAS_CONSULTA)
+        incrementar_version_libro()
+    return total
 
 
 # ——————————————————————————————————————————————————————————————
@@ -81,6 +135,7 @@ def regenerar_ventas_consulta(start_date=None, end_date=None):
 def make_query(modelo, cta_field, monto_field, coment_field, tabla_origen, start_date=None, end_date=None):
     """
     Genera un queryset anotado para débitos con filtros de fecha opcionales.
+    La cuenta se mantiene entera (union_debitos.cta_debito es IntegerField).
     """
     qs = modelo.objects.all()
     
@@ -90,7 +145,7 @@ def make_query(modelo, cta_field, monto_field, coment_field, tabla_origen, start
         qs = qs.filter(fecha__lte=end_date)
     
     anotaciones = {
-        'cta_debito': Cast(F(cta_field), output_field=TextField()),
+        'cta_debito': Cast(F(cta_field), output_field=IntegerField()),
         'monto_debito': Cast(F(monto_field), output_field=DecimalField(max_digits=15, decimal_places=2)),
         'tabla_origen': Value(tabla_origen, output_field=TextField()),
     }
@@ -111,6 +166,7 @@ def make_query(modelo, cta_field, monto_field, coment_field, tabla_origen, start
 def make_query_credito(queryset, cta_field, monto_field, coment_field, tabla_origen, usar_cast=False, start_date=None, end_date=None):
     """
     Genera un queryset anotado para créditos con filtros de fecha opcionales.
+    La cuenta se mantiene entera (union_creditos.cta_credito es IntegerField).
     """
     if hasattr(queryset, 'all'):
         qs = queryset.all()
@@ -123,7 +179,7 @@ def make_query_credito(queryset, cta_field, monto_field, coment_field, tabla_ori
         qs = qs.filter(fecha__lte=end_date)
     
     anotaciones = {
-        'cta_credito': Cast(F(cta_field), output_field=TextField()),
+        'cta_credito': Cast(F(cta_field), output_field=IntegerField()),
         'monto_credito': Cast(F(monto_field), output_field=DecimalField(max_digits=15, decimal_places=2)),
         'tabla_origen': Value(tabla_origen, output_field=TextField()),
     }
@@ -141,11 +197,105 @@ def make_query_credito(queryset, cta_field, monto_field, coment_field, tabla_ori
     )
 
 
+# ——————————————————————————————————————————————————————————————
+# ESCRITURA DE LAS UNIONES (INSERT … SELECT o bulk_create)
+# ——————————————————————————————————————————————————————————————
+
+# 'sql'    → INSERT INTO … SELECT … UNION ALL … en la base (ninguna fila pasa por Python)
+# 'python' → se leen las filas por lotes y se hace bulk_create
+UNION_MODO = getattr(settings, 'BRONZ_UNION_MODO', 'sql')
+
+
+def _mapa_columnas(columnas):
+    """Acepta una lista de nombres o un dict {columna destino: alias en el SELECT}."""
+    return columnas if isinstance(columnas, dict) else {c: c for c in columnas}
+
+
+def insertar_select_sql(modelo, qs, columnas):
+    """
+    Escribe el resultado de `qs` (un .values()) en la tabla de `modelo` con un
+    único INSERT … SELECT. Devuelve el número de filas insertadas.
+    """
+    mapa = _mapa_columnas(columnas)
+    connection = connections[qs.db]
+    qn = connection.ops.quote_name
+    select_sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+    destino = ', '.join(qn(c) for c in mapa)
+    origen = ', '.join(qn(a) for a in mapa.values())
+    sql = (
+        f"INSERT INTO {qn(modelo._meta.db_table)} ({destino}) "
+        f"SELECT {origen} FROM ({select_sql}) AS u"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def insertar_select_por_lotes(modelo, qs, columnas, lote=2000):
+    """
+    Camino Python con memoria acotada: recorre `qs` con un iterador y hace
+    bulk_create cada `lote` filas. Devuelve el número de filas insertadas.
+    """
+    mapa = _mapa_columnas(columnas)
+    total = 0
+    objetos = []
+    for row in qs.iterator(chunk_size=lote):
+        datos = {c: row[a] for c, a in mapa.items()}
+        if 'texto_coment' in datos:
+            datos['texto_coment'] = datos['texto_coment'] or ''
+        objetos.append(modelo(**datos))
+        if len(objetos) >= lote:
+            modelo.objects.bulk_create(objetos)
+            total += len(objetos)
+            objetos = []
+    if objetos:
+        modelo.objects.bulk_create(objetos)
+        total += len(objetos)
+    return total
+
+
+def _reemplazar_union(modelo, union_qs, columnas, start_date=None, end_date=None, modo=None):
+    if es_vista_materializada(modelo):
+        # Backend PostgreSQL opcional: la unión es una vista materializada y
+        # se refresca completa sin bloquear lecturas (el rango no aplica).
+        total = refrescar_vista_materializada(modelo)
+        incrementar_version_libro()
+        return total
+
+    with transaction.atomic():
+        borrar_union_rango(modelo, start_date, end_date)
+        total = insertar_union(modelo, union_qs, columnas, modo)
+        incrementar_version_libro()
+        return total
+
+
+def borrar_union_rango(modelo, start_date=None, end_date=None):
+    if start_date and end_date:
+        modelo.objects.filter(
+            fecha__gte=start_date,
+            fecha__lte=end_date
+        ).delete()
+    else:
+        modelo.objects.all().delete()
+
+
+def insertar_union(modelo, qs, columnas, modo=None):
+    """Inserta `qs` (la unión completa o una sola de sus partes) según el modo."""
+    if (modo or UNION_MODO) == 'python':
+        return insertar_select_por_lotes(modelo, qs, columnas)
+    return insertar_select_sql(modelo, qs, columnas)
+
+
 # ——————————————————————————————————————————————————————————————
 # CONSULTA DEBITOS
 # ——————————————————————————————————————————————————————————————
 
-def poblar_movimientos_unificados_debito(start_date=None, end_date=None):
+COLUMNAS_DEBITO = ['fecha', 'cta_debito', 'monto_debito', 'texto_coment', 'tabla_origen']
+COLUMNAS_CREDITO = ['fecha', 'cta_credito', 'monto_credito', 'texto_coment', 'tabla_origen']
+
+
+def partes_debito(start_date=None, end_date=None):
+    """Lista de querysets (uno por origen) que forman union_debitos, en orden fijo."""
     qs_otros = make_query(OtrosGastos, 'cuenta_debito', 'debito', 'comentario', 'Otros Gastos', start_date, end_date)
     qs_otros_eerr = make_query(OtrosGastos, 'cuenta_debito_eerr', 'debito_eerr', 'comentario', 'Otros Gastos (EERR)', start_date, end_date)
     qs_sueldos = make_query(SueldosHonorarios, 'cuenta_debito', 'debito', 'comentario', 'Sueldos y Honorarios', start_date, end_date)
@@ -159,39 +309,30 @@ def poblar_movimientos_unificados_debito(start_date=None, end_date=None):
     qs_ventas_plataformas = make_query(Ventas, 'cuenta_debito_plataformas', 'debito_plataformas', 'comentario', 'Ventas (Plataformas)', start_date, end_date)
     qs_ventas_consulta = make_query(VentasConsulta, 'cuenta_debito_eerr', 'costo_venta', 'comentario', 'Ventas Consulta', start_date, end_date)
 
-    union_qs = qs_otros.union(
-        qs_otros_eerr, qs_sueldos, qs_asientos, qs_entradas_debito, qs_entradas_iva, qs_balance_inicial,
-        qs_ventas, qs_ventas_envio, qs_ventas_iva_plataformas, qs_ventas_plataformas, qs_ventas_consulta, all=True
-    )
+    return [
+        qs_otros, qs_otros_eerr, qs_sueldos, qs_asientos, qs_entradas_debito, qs_entradas_iva, qs_balance_inicial,
+        qs_ventas, qs_ventas_envio, qs_ventas_iva_plataformas, qs_ventas_plataformas, qs_ventas_consulta,
+    ]
 
-    with transaction.atomic():
-        if start_date and end_date:
-            MovimientoUnificadoDebito.objects.filter(
-                fecha__gte=start_date,
-                fecha__lte=end_date
-            ).delete()
-        else:
-            MovimientoUnificadoDebito.objects.all().delete()
-            
-        objetos = [
-            MovimientoUnificadoDebito(
-                fecha=row['fecha'],
-                cta_debito=row['cta_debito'],
-                monto_debito=row['monto_debito'],
-                texto_coment=row['texto_coment'] or '',
-                tabla_origen=row['tabla_origen']
-            )
-            for row in union_qs
-        ]
-        MovimientoUnificadoDebito.objects.bulk_create(objetos)
-        return len(objetos)
+
+def union_debitos_qs(start_date=None, end_date=None):
+    primera, *resto = partes_debito(start_date, end_date)
+    return primera.union(*resto, all=True)
+
+
+def poblar_movimientos_unificados_debito(start_date=None, end_date=None, modo=None):
+    return _reemplazar_union(
+        MovimientoUnificadoDebito, union_debitos_qs(start_date, end_date), COLUMNAS_DEBITO,
+        start_date, end_date, modo
+    )
 
 
 # ——————————————————————————————————————————————————————————————
 # CONSULTA CREDITOS
 # ——————————————————————————————————————————————————————————————
 
-def poblar_movimientos_unificados_credito(start_date=None, end_date=None):
+def partes_credito(start_date=None, end_date=None):
+    """Lista de querysets (uno por origen) que forman union_creditos, en orden fijo."""
     qs_otros = make_query_credito(OtrosGastos.objects, 'cuenta_credito', 'credito', 'comentario', 'Otros Gastos', start_date=start_date, end_date=end_date)
     qs_sueldos = make_query_credito(SueldosHonorarios.objects, 'cuenta_credito', 'credito', 'comentario', 'Sueldos y Honorarios', start_date=start_date, end_date=end_date)
     qs_sueldos_2 = make_query_credito(SueldosHonorarios.objects, 'cuenta_credito2', 'credito2', 'comentario', 'Sueldos y Honorarios (2)', start_date=start_date, end_date=end_date)
@@ -204,63 +345,357 @@ def poblar_movimientos_unificados_credito(start_date=None, end_date=None):
     qs_ventas_envio = make_query_credito(Ventas.objects, 'cuenta_credito_envio', 'credito_envio', 'comentario', 'Ventas (ENVIO)', start_date=start_date, end_date=end_date)
     qs_ventas_plataformas = make_query_credito(Ventas.objects, 'cuenta_credito_plataformas', 'credito_plataformas', 'comentario', 'Ventas (Plataformas)', start_date=start_date, end_date=end_date)
 
-    union_qs = qs_otros.union(qs_sueldos, qs_asientos, qs_entradas, qs_sueldos_2, qs_balance_inicial,
-               qs_ventas_consulta, qs_ventas_eerr, qs_ventas_iva, qs_ventas_envio, qs_ventas_plataformas, all=True)
+    return [
+        qs_otros, qs_sueldos, qs_asientos, qs_entradas, qs_sueldos_2, qs_balance_inicial,
+        qs_ventas_consulta, qs_ventas_eerr, qs_ventas_iva, qs_ventas_envio, qs_ventas_plataformas,
+    ]
 
-    with transaction.atomic():
-        if start_date and end_date:
-            MovimientoUnificadoCredito.objects.filter(
-                fecha__gte=start_date,
-                fecha__lte=end_date
-            ).delete()
-        else:
-            MovimientoUnificadoCredito.objects.all().delete()
-            
-        objetos = [
-            MovimientoUnificadoCredito(
-                fecha=row['fecha'],
-                cta_credito=row['cta_credito'],
-                monto_credito=row['monto_credito'],
-                texto_coment=row['texto_coment'],
-                tabla_origen=row['tabla_origen']
-            )
-            for row in union_qs
-        ]
-        MovimientoUnificadoCredito.objects.bulk_create(objetos)
-        return len(objetos)
+
+def union_creditos_qs(start_date=None, end_date=None):
+    primera, *resto = partes_credito(start_date, end_date)
+    return primera.union(*resto, all=True)
+
+
+def poblar_movimientos_unificados_credito(start_date=None, end_date=None, modo=None):
+    return _reemplazar_union(
+        MovimientoUnificadoCredito, union_creditos_qs(start_date, end_date), COLUMNAS_CREDITO,
+        start_date, end_date, modo
+    )
 
 
 # ——————————————————————————————————————————————————————————————
 # SUMA CREDITOS y DEBITOS
 # ——————————————————————————————————————————————————————————————
 
-def regenerar_resumenes_credito_debito():
-    ResumenCredito.objects.all().delete()
-    ResumenDebito.objects.all().delete()
+def limites_de_mes(start_date, end_date):
+    """Amplía [start_date, end_date] a meses completos."""
+    desde = start_date.replace(day=1)
+    siguiente = (end_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return desde, siguiente - timedelta(days=1)
+
+
+def _q_periodos(desde, hasta):
+    """Filtro (anio, mes) para los meses entre desde y hasta, ambos incluidos."""
+    if desde.year == hasta.year:
+        return Q(anio=desde.year, mes__gte=desde.month, mes__lte=hasta.month)
+    return (
+        Q(anio=desde.year, mes__gte=desde.month)
+        | Q(anio__gt=desde.year, anio__lt=hasta.year)
+        | Q(anio=hasta.year, mes__lte=hasta.month)
+    )
+
 
-    creditos_agrupados = (
-        MovimientoUnificadoCredito.objects
-        .values('cta_credito')
-        .annotate(total_credito=Sum('monto_credito'))
+def resumen_qs(modelo_union, cuenta, monto, start_date=None, end_date=None):
+    """Totales de la unión agrupados por (año, mes, cuenta)."""
+    qs = modelo_union.objects.all()
+    if start_date and end_date:
+        qs = qs.filter(fecha__gte=start_date, fecha__lte=end_date)
+    return (
+        qs.annotate(r_anio=ExtractYear('fecha'), r_mes=ExtractMonth('fecha'))
+        .values('r_anio', 'r_mes', cuenta)
+        .annotate(r_total=Sum(monto))
     )
 
-    debitos_agrupados = (
-        MovimientoUnificadoDebito.objects
-        .values('cta_debito')
-        .annotate(total_debito=Sum('monto_debito'))
+
+def regenerar_resumenes_credito_debito(start_date=None, end_date=None):
+    """
+    Recalcula suma_creditos / suma_debitos por (año, mes, cuenta).
+    Con rango solo se reemplazan los meses que lo tocan; sin rango, todo.
+    Devuelve (filas crédito, filas débito).
+    """
+    if start_date and end_date:
+        start_date, end_date = limites_de_mes(start_date, end_date)
+        periodos = _q_periodos(start_date, end_date)
+    else:
+        start_date = end_date = None
+        periodos = Q()
+
+    with transaction.atomic():
+        ResumenCredito.objects.filter(periodos).delete()
+        ResumenDebito.objects.filter(periodos).delete()
+
+        n_credito = insertar_select_sql(
+            ResumenCredito,
+            resumen_qs(MovimientoUnificadoCredito, 'cta_credito', 'monto_credito', start_date, end_date),
+            {'anio': 'r_anio', 'mes': 'r_mes', 'cuenta_credito': 'cta_credito', 'total_credito': 'r_total'},
+        )
+        n_debito = insertar_select_sql(
+            ResumenDebito,
+            resumen_qs(MovimientoUnificadoDebito, 'cta_debito', 'monto_debito', start_date, end_date),
+            {'anio': 'r_anio', 'mes': 'r_mes', 'cuenta_debito': 'cta_debito', 'total_debito': 'r_total'},
+        )
+        incrementar_version_libro()
+
+    return n_credito, n_debito
+
+
+def totales_por_cuenta(anio=None, hasta_mes=None):
+    """
+    Lectura del cubo cuenta × mes: ({cuenta: débito}, {cuenta: crédito}) en float.
+    anio=None suma todos los años; hasta_mes corta el año en ese mes (incluido).
+    """
+    from bronz_app.cubo import cubo, por_cuenta
+
+    debitos, creditos = {}, {}
+    for cuenta, debito, credito, _, _ in por_cuenta(cubo(anio=anio, hasta_mes=hasta_mes)):
+        if debito:
+            debitos[cuenta] = float(debito)
+        if credito:
+            creditos[cuenta] = float(credito)
+    return debitos, creditos
+
+
+# ——————————————————————————————————————————————————————————————
+# CUBO CUENTA × MES (débito, crédito y movimientos por cuenta y mes)
+# ——————————————————————————————————————————————————————————————
+
+def _cubo_qs(modelo_union, cuenta, monto, lado, start_date=None, end_date=None):
+    """Una unión agrupada por (año, mes, cuenta) con las columnas de ambos lados."""
+    qs = modelo_union.objects.filter(**{f'{cuenta}__isnull': False})
+    if start_date and end_date:
+        qs = qs.filter(fecha__gte=start_date, fecha__lte=end_date)
+    cero = Value(0, output_field=DecimalField(max_digits=16, decimal_places=2))
+    total = Sum(monto)
+    movimientos = Count('id')
+    return (
+        qs.annotate(r_anio=ExtractYear('fecha'), r_mes=ExtractMonth('fecha'), r_cuenta=F(cuenta))
+        .values('r_anio', 'r_mes', 'r_cuenta')
+        .annotate(
+            r_debito=total if lado == 'debito' else cero,
+            r_credito=cero if lado == 'debito' else total,
+            r_n_debitos=movimientos if lado == 'debito' else Value(0),
+            r_n_creditos=Value(0) if lado == 'debito' else movimientos,
+        )
+        .order_by()
     )
 
-    resumen_credito_objs = [
-        ResumenCredito(cuenta_credito=c['cta_credito'], total_credito=c['total_credito'])
-        for c in creditos_agrupados
-    ]
 
-    resumen_debito_objs = [
-        ResumenDebito(cuenta_debito=d['cta_debito'], total_debito=d['total_debito'])
-        for d in debitos_agrupados
-    ]
+def regenerar_cubo_cuenta_mes(start_date=None, end_date=None):
+    """
+    Recalcula cubo_cuenta_mes desde union_debitos / union_creditos con un solo
+    INSERT … SELECT. Con rango solo se reemplazan los meses que lo tocan; sin
+    rango, todo. Devuelve las filas escritas.
+    """
+    if start_date and end_date:
+        start_date, end_date = limites_de_mes(start_date, end_date)
+        periodos = _q_periodos(start_date, end_date)
+    else:
+        start_date = end_date = None
+        periodos = Q()
+
+    union = _cubo_qs(MovimientoUnificadoDebito, 'cta_debito', 'monto_debito', 'debito', start_date, end_date).union(
+        _cubo_qs(MovimientoUnificadoCredito, 'cta_credito', 'monto_credito', 'credito', start_date, end_date),
+        all=True,
+    )
+    connection = connections[union.db]
+    qn = connection.ops.quote_name
+    select_sql, params = union.query.get_compiler(using=union.db).as_sql()
+    sql = (
+        f"INSERT INTO {qn(CuboCuentaMes._meta.db_table)} "
+        "(anio, mes, cuenta, debito, credito, n_debitos, n_creditos) "
+        "SELECT r_anio, r_mes, r_cuenta, SUM(r_debito), SUM(r_credito), SUM(r_n_debitos), SUM(r_n_creditos) "
+        f"FROM ({select_sql}) AS u GROUP BY r_anio, r_mes, r_cuenta"
+    )
+    with transaction.atomic(using=union.db):
+        CuboCuentaMes.objects.filter(periodos).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            total = cursor.rowcount
+        incrementar_version_libro()
+    return total
 
-    ResumenCredito.objects.bulk_create(resumen_credito_objs)
-    ResumenDebito.objects.bulk_create(resumen_debito_objs)
 
-    return len(resumen_credito_objs), len(resumen_debito_objs)
+# ——————————————————————————————————————————————————————————————
+# SALDO DIARIO ACUMULADO (sumas prefijas por cuenta y día)
+# ——————————————————————————————————————————————————————————————
+
+def tramos_saldo_diario(rangos):
+    """
+    Tramos a recalcular en saldo_diario por los rangos regenerados: el
+    acumulado se reinicia cada 1 de enero, así que un cambio afecta desde su
+    fecha hasta el 31 de diciembre de ese año. Un tramo por año, desde la
+    fecha más temprana tocada.
+    """
+    desde_por_anio = {}
+    for desde, hasta in rangos:
+        for anio in range(desde.year, hasta.year + 1):
+            inicio = desde if anio == desde.year else date(anio, 1, 1)
+            desde_por_anio[anio] = min(inicio, desde_por_anio.get(anio, inicio))
+    return [(desde, date(anio, 12, 31)) for anio, desde in sorted(desde_por_anio.items())]
+
+
+def _acumulados_previos(fecha):
+    """{cuenta: (débito, crédito)} acumulados del año hasta el día anterior a `fecha`."""
+    if fecha.month == 1 and fecha.day == 1:
+        return {}
+    previo = fecha - timedelta(days=1)
+    en_anio = SaldoDiario.objects.filter(fecha__gte=date(previo.year, 1, 1), fecha__lte=previo)
+    ultima = en_anio.filter(cuenta=OuterRef('cuenta')).order_by('-fecha').values('fecha')[:1]
+    return {
+        cuenta: (debito, credito)
+        for cuenta, debito, credito in en_anio.filter(fecha=Subquery(ultima))
+        .values_list('cuenta', 'debito_acum', 'credito_acum')
+    }
+
+
+def _recalcular_tramo_saldo_diario(desde, hasta):
+    SaldoDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+
+    por_dia = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    rango = {'fecha__gte': desde, 'fecha__lte': hasta}
+    for lado, modelo, cuenta, monto in (
+        (0, MovimientoUnificadoDebito, 'cta_debito', 'monto_debito'),
+        (1, MovimientoUnificadoCredito, 'cta_credito', 'monto_credito'),
+    ):
+        filas = modelo.objects.filter(**rango).values_list(cuenta, 'fecha').annotate(total=Sum(monto)).order_by()
+        for cta, fecha, total in filas:
+            if cta is not None:
+                por_dia[(cta, fecha)][lado] += total or 0
+
+    previos = _acumulados_previos(desde)
+    nuevos, cuenta_actual = [], None
+    for (cta, fecha), (debito, credito) in sorted(por_dia.items()):
+        if cta != cuenta_actual:
+            cuenta_actual = cta
+            debito_acum, credito_acum = previos.get(cta, (Decimal('0'), Decimal('0')))
+        debito_acum += debito
+        credito_acum += credito
+        nuevos.append(SaldoDiario(
+            cuenta=cta, fecha=fecha,
+            debito_dia=debito, credito_dia=credito,
+            debito_acum=debito_acum, credito_acum=credito_acum,
+        ))
+    SaldoDiario.objects.bulk_create(nuevos, batch_size=2000)
+    return len(nuevos)
+
+
+def regenerar_saldos_diarios(rangos=None):
+    """
+    Mantiene saldo_diario desde union_debitos / union_creditos. Con rangos
+    [(desde, hasta)] solo recalcula de la fecha más temprana de cada año al
+    31 de diciembre; sin rangos (o con (None, None)) lo reconstruye entero.
+    Devuelve las filas escritas.
+    """
+    with transaction.atomic():
+        if not rangos or (None, None) in rangos:
+            SaldoDiario.objects.all().delete()
+            extremos = [
+                modelo.objects.aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+                for modelo in (MovimientoUnificadoDebito, MovimientoUnificadoCredito)
+            ]
+            fechas = [e[k] for e in extremos for k in ('desde', 'hasta') if e[k]]
+            rangos = [(min(fechas), max(fechas))] if fechas else []
+        return sum(_recalcular_tramo_saldo_diario(desde, hasta) for desde, hasta in tramos_saldo_diario(rangos))
+
+
+# ——————————————————————————————————————————————————————————————
+# RESUMEN MENSUAL (ventas, costos y utilidad por mes)
+# ——————————————————————————————————————————————————————————————
+
+CUENTAS_VENTAS = [3010101, 3010111]
+CUENTA_COSTO = [3010200, 3010201, 3010202, 3010203,3010205,3010211,3010212,3010213,3010214,3010215,3010216, 3020200,3010300,3010400,3020500,3020600,3020700,3020800,3020900,3030100]
+
+
+def regenerar_resumen_mensual():
+    """
+    Recalcula ResumenMensual desde el cubo cuenta × mes: una consulta calcula
+    ventas (créditos - débitos de CUENTAS_VENTAS), costos (débitos - créditos
+    de CUENTA_COSTO) y la utilidad acumulada con SUM() OVER (ORDER BY anio, mes),
+    y un solo upsert escribe todos los meses. Devuelve el número de meses.
+    """
+    por_mes = (
+        CuboCuentaMes.objects.values('anio', 'mes')
+        .annotate(
+            r_ventas=Sum(F('credito') - F('debito'), filter=Q(cuenta__in=CUENTAS_VENTAS), default=0),
+            r_costos=Sum(F('debito') - F('credito'), filter=Q(cuenta__in=CUENTA_COSTO), default=0),
+        )
+        .order_by()
+    )
+    connection = connections[por_mes.db]
+    select_sql, params = por_mes.query.get_compiler(using=por_mes.db).as_sql()
+    sql = (
+        "SELECT anio, mes, r_ventas, r_costos, "
+        "SUM(r_ventas - r_costos) OVER (ORDER BY anio, mes) "
+        f"FROM ({select_sql}) AS u ORDER BY anio, mes"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    centavos = Decimal('0.01')
+    a_decimal = lambda v: Decimal(str(v or 0)).quantize(centavos)
+    meses = []
+    for anio, mes, ventas, costos, acumulada in filas:
+        ventas, costos = a_decimal(ventas), a_decimal(costos)
+        meses.append(ResumenMensual(
+            mes=date(anio, mes, 1),
+            ventas=ventas,
+            costos=costos,
+            utilidad=ventas - costos,
+            margen_bruto=ventas - costos,
+            utilidad_acumulada=a_decimal(acumulada),
+        ))
+    ResumenMensual.objects.bulk_create(
+        meses,
+        update_conflicts=True,
+        unique_fields=['mes'],
+        update_fields=['ventas', 'costos', 'utilidad', 'margen_bruto', 'utilidad_acumulada'],
+    )
+    return len(meses)
+
+
+# ——————————————————————————————————————————————————————————————
+# REGENERACIÓN INCREMENTAL POR RANGOS SUCIOS
+# ——————————————————————————————————————————————————————————————
+
+def fusionar_rangos(rangos):
+    """
+    Une rangos (desde, hasta) que se solapan o son contiguos.
+    Si alguno es (None, None) devuelve [(None, None)]: regeneración completa.
+    """
+    if any(desde is None or hasta is None for desde, hasta in rangos):
+        return [(None, None)]
+
+    fusionados = []
+    for desde, hasta in sorted(rangos):
+        if fusionados and desde <= fusionados[-1][1] + timedelta(days=1):
+            fusionados[-1] = (fusionados[-1][0], max(fusionados[-1][1], hasta))
+        else:
+            fusionados.append((desde, hasta))
+    return fusionados
+
+
+def regenerar_rangos_sucios(hilos=None):
+    """
+    Regenera VentasConsulta y las uniones de débitos/créditos solo en los días
+    marcados en RangoSucio, los resúmenes de los meses afectados y ResumenMensual.
+    Sin rangos pendientes no hace nada. Devuelve la lista de rangos regenerados.
+
+    Las etapas se declaran como DAG (bronz_app.etapas). En PostgreSQL con
+    hilos > 1 las independientes corren en paralelo, cada una en su conexión;
+    en otro caso corren en orden dentro de una sola transacción.
+    """
+    from bronz_app.etapas import ejecutar_etapas, etapas_regeneracion, guardar_tiempos_etapas, puede_paralelizar
+
+    paralelo = puede_paralelizar(hilos)
+    with transaction.atomic():
+        pendientes = list(
+            RangoSucio.objects.select_for_update()
+            .values_list('id', 'fecha_desde', 'fecha_hasta')
+        )
+        if not pendientes:
+            return []
+        rangos = fusionar_rangos([(desde, hasta) for _, desde, hasta in pendientes])
+
+        if not paralelo:
+            resultado = ejecutar_etapas(etapas_regeneracion(rangos), hilos=1)
+            RangoSucio.objects.filter(id__in=[pk for pk, _, _ in pendientes]).delete()
+
+    if paralelo:
+        # Fuera de la transacción: cada hilo escribe y confirma en su propia conexión.
+        # Si una etapa falla, los rangos quedan pendientes para la próxima pasada.
+        resultado = ejecutar_etapas(etapas_regeneracion(rangos), hilos=hilos)
+        RangoSucio.objects.filter(id__in=[pk for pk, _, _ in pendientes]).delete()
+
+    guardar_tiempos_etapas(resultado)
+    return rangos
@@ -1,54 +1,10 @@
 # bronz_app/utils_balance.py
 
 from datetime import date
-from .models import ResumenDebito, ResumenCredito
-from .cod_cuentas_balance import balance_rows
-
-def intdot(val):
-    try:
-        val_float = float(val)
-        val_int = int(round(val_float))
-        return f"{val_int:,}".replace(",", ".")
-    except Exception:
-        return ""
-
-def obtener_matriz_balance():
-    debitos_dict = {d.cuenta_debito: float(d.total_debito) for d in ResumenDebito.objects.all()}
-    creditos_dict = {c.cuenta_credito: float(c.total_credito) for c in ResumenCredito.objects.all()}
-    matriz_balance = []
-
-    for fila in balance_rows:
-        codigo = fila['codigo']
-        nombre = fila['nombre']
-        debito = debitos_dict.get(codigo, 0)
-        credito = creditos_dict.get(codigo, 0)
-        saldo_deudor = saldo_acreedor = activo = pasivo = perdidas = ganancias = 0
-
-        if 1010100 <= codigo <= 2040000:
-            saldo_deudor = debito - credito if debito > credito else 0
-            saldo_acreedor = credito - debito if credito > debito else 0
-            activo = saldo_deudor
-            pasivo = saldo_acreedor
-        elif 3010100 <= codigo <= 3030300:
-            saldo_deudor = debito - credito if debito > credito else 0
-            saldo_acreedor = credito - debito if credito > debito else 0
-            perdidas = saldo_deudor
-            ganancias = saldo_acreedor
-
-        matriz_balance.append({
-            'codigo': codigo,
-            'nombre': nombre,
-            'debito': intdot(debito),
-            'credito': intdot(credito),
-            'saldo_deudor': intdot(saldo_deudor),
-            'saldo_acreedor': intdot(saldo_acreedor),
-            'activo': intdot(activo),
-            'pasivo': intdot(pasivo),
-            'perdidas': intdot(perdidas),
-            'ganancias': intdot(ganancias)
-        })
-
-    return matriz_balance
+from .motor_balance import balance_resumenes, intdot
+
+def obtener_matriz_balance(anio=None):
+    return balance_resumenes(anio).filas()
 #____________________________________
     # RESUMEN DETALLADO
 #____________________________________
@@ -58,6 +14,7 @@ from bronz_app.models import (
     MovimientoUnificadoCredito,
     MovimientoUnificadoDebito
 )
+from bronz_app.cubo import cubo
 # Importa tus funciones utilitarias de procesamiento aquí
 from .utils import (
     regenerar_ventas_consulta,
@@ -67,6 +24,14 @@ from .utils import (
 )
 from datetime import date
 from collections import defaultdict
+from contextlib import contextmanager
+import logging
+import time
+
+import numpy as np
+from django.db import connection
+
+logger = logging.getLogger(__name__)
 
 # Mapping con naturaleza
 CONCEPTOS_CUENTAS = {
@@ -129,48 +94,70 @@ CONCEPTOS_CUENTAS = {
     # Agrega otros conceptos según necesites
 }
 
+# Matrices concepto × cuenta: los conceptos de naturaleza crédito suman solo
+# créditos; los de naturaleza débito, débitos menos créditos
+CONCEPTOS = list(CONCEPTOS_CUENTAS)
+CUENTAS_CONCEPTOS = sorted({c for config in CONCEPTOS_CUENTAS.values() for c in config["codigos"]})
+_COLUMNA_CUENTA = {cuenta: j for j, cuenta in enumerate(CUENTAS_CONCEPTOS)}
+_PESO_DEBITO = np.zeros((len(CONCEPTOS), len(CUENTAS_CONCEPTOS)))
+_PESO_CREDITO = np.zeros((len(CONCEPTOS), len(CUENTAS_CONCEPTOS)))
+for _i, _config in enumerate(CONCEPTOS_CUENTAS.values()):
+    for _codigo in _config["codigos"]:
+        if _config["naturaleza"] == "credito":
+            _PESO_CREDITO[_i, _COLUMNA_CUENTA[_codigo]] += 1.0
+        else:
+            _PESO_DEBITO[_i, _COLUMNA_CUENTA[_codigo]] += 1.0
+            _PESO_CREDITO[_i, _COLUMNA_CUENTA[_codigo]] -= 1.0
+
+
+@contextmanager
+def contar_consultas():
+    """Cuenta las consultas SQL ejecutadas dentro del bloque: with contar_consultas() as n: … n[0]"""
+    contador = [0]
+
+    def contar(execute, sql, params, many, context):
+        contador[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(contar):
+        yield contador
+
+
 def calcular_resultados_mensuales(año=None):
+    """
+    Recalcula ResultadoMensualDetalle del año: una lectura del cubo cuenta × mes,
+    el paso a conceptos con matrices y un solo upsert masivo.
+    """
     if not año:
         año = date.today().year
 
-    from collections import defaultdict
-    resumen = defaultdict(lambda: defaultdict(float))
-
-    for concepto, config in CONCEPTOS_CUENTAS.items():
-        codigos = config["codigos"]
-        naturaleza = config["naturaleza"]
-
-        for codigo in codigos:
-            # SUMA DÉBITOS
-            debitos = MovimientoUnificadoDebito.objects.filter(
-                cta_debito=codigo, fecha__year=año
-            )
-            total_debito_mes = defaultdict(float)
-            for mov in debitos:
-                total_debito_mes[mov.fecha.month] += float(mov.monto_debito)
-
-            # SUMA CRÉDITOS
-            creditos = MovimientoUnificadoCredito.objects.filter(
-                cta_credito=codigo, fecha__year=año
-            )
-            total_credito_mes = defaultdict(float)
-            for mov in creditos:
-                total_credito_mes[mov.fecha.month] += float(mov.monto_credito)
-
-            for mes in range(1, 13):
-                if naturaleza == "credito":
-                    resumen[mes][concepto] += total_credito_mes[mes]
-                else:  # "debito" (gastos/costos)
-                    resumen[mes][concepto] += total_debito_mes[mes] - total_credito_mes[mes]
-
-    # Guarda los resultados en la base
-    for mes in range(1, 13):
-        mes_date = date(año, mes, 1)
-        for concepto in CONCEPTOS_CUENTAS.keys():
-            valor = int(round(resumen[mes][concepto]))
-            ResultadoMensualDetalle.objects.update_or_create(
-                mes=mes_date,
-                concepto=concepto,
-                defaults={"valor": valor}
-            )
-
+    inicio = time.monotonic()
+    with contar_consultas() as consultas:
+        # totales[lado, cuenta, mes - 1]
+        totales = np.zeros((2, len(CUENTAS_CONCEPTOS), 12))
+        for cuenta, mes, debito, credito in (
+            cubo(anio=año, cuentas=CUENTAS_CONCEPTOS).values_list('cuenta', 'mes', 'debito', 'credito')
+        ):
+            totales[:, _COLUMNA_CUENTA[cuenta], mes - 1] += (float(debito), float(credito))
+
+        # resumen[concepto, mes - 1]
+        resumen = _PESO_DEBITO @ totales[0] + _PESO_CREDITO @ totales[1]
+
+        # Guarda los resultados en la base
+        filas = [
+            ResultadoMensualDetalle(mes=date(año, mes, 1), concepto=concepto, valor=int(round(resumen[i, mes - 1])))
+            for mes in range(1, 13)
+            for i, concepto in enumerate(CONCEPTOS)
+        ]
+        ResultadoMensualDetalle.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=['mes', 'concepto'],
+            update_fields=['valor'],
+        )
+
+    logger.info(
+        "Resultados mensuales %s: %d filas, %d consultas, %.2fs",
+        año, len(filas), consultas[0], time.monotonic() - inicio,
+    )
+    return len(filas)
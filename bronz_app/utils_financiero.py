@@ -1,47 +1,260 @@
 import re
 
-def eval_formula(formula, matriz, linea_lookup=None, resultado_lookup=None, activo_lookup=None):
-    if not formula or not formula.strip():
-        return 0
-
-    if linea_lookup is None:
-        linea_lookup = {}
-    if resultado_lookup is None:
-        resultado_lookup = {}
-    if activo_lookup is None:
-        activo_lookup = {}
-
-    # Si la fórmula es solo un número (línea), busca primero en resultado_lookup, luego en activo_lookup, luego en linea_lookup
-    if re.fullmatch(r"\d+", formula.strip()):
-        num = formula.strip()
-        for lookup in (resultado_lookup, activo_lookup, linea_lookup):
-            if num in lookup:
-                return lookup[num]
-        return 0
-
-    expr = formula
-
-    # Reemplaza A:xxxxxx, P:xxxxxx, Pe:xxxxxx, G:xxxxxx por sus valores en matriz
-    def reemplazar_codigo(match):
-        key = match.group(0)
-        return str(matriz.get(key, 0))
-    expr = re.sub(r'(A:\d{5,7}|P:\d{5,7}|Pe:\d{5,7}|G:\d{5,7})', reemplazar_codigo, expr)
-
-    # Reemplaza referencias a líneas numéricas por sus valores en los lookups
-    def reemplazar_linea(match):
-        num = match.group(0)
-        for lookup in (resultado_lookup, activo_lookup, linea_lookup):
-            if num in lookup:
-                return str(lookup[num])
-        return num  # deja el número si no encuentra
-
-    expr = re.sub(r'\b\d{2,4}\b', reemplazar_linea, expr)
-
-    # Por seguridad, solo permitir números, (), +, -, *, /
-    if re.search(r"[^0-9\+\-\*\/\(\)\.\s]", expr):
-        return 0
-
-    try:
-        return eval(expr, {"__builtins__": {}})
-    except Exception:
-        return 0
+import numpy as np
+from django.core.checks import Warning, register
+
+from bronz_app.motor_balance import CLAVES_MATRIZ
+from bronz_app.resumen_financiero import RESUMEN_ACTIVO, RESUMEN_PASIVO, RESUMEN_RESULTADO
+
+# Referencias a la matriz (A:xxxxxx, P:xxxxxx, Pe:xxxxxx, G:xxxxxx), números y operadores
+_TOKEN = re.compile(r'\s*(?:(?P<clave>(?:Pe|A|P|G):\d{5,7})|(?P<numero>\d+(?:\.\d+)?)|(?P<op>[-+*/()]))')
+
+_CONSTANTE = None
+
+
+# ——————————————————————————————————————————————————————————————
+# COMPILACIÓN DE FÓRMULAS
+# Cada fórmula se compila a una combinación lineal:
+#   {('clave', 'A:1010100'): 1.0, ('linea', '16'): -1.0, None: constante}
+# ——————————————————————————————————————————————————————————————
+
+def _tokenizar(formula):
+    tokens, pos, fin = [], 0, len(formula.rstrip())
+    while pos < fin:
+        match = _TOKEN.match(formula, pos)
+        if not match:
+            raise ValueError(f"Símbolo inválido en la fórmula {formula!r} (posición {pos})")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+    return tokens
+
+
+def _combinar(a, b, factor=1.0):
+    resultado = dict(a)
+    for clave, coef in b.items():
+        resultado[clave] = resultado.get(clave, 0.0) + factor * coef
+    return resultado
+
+
+def _escalar(a, factor):
+    return {clave: coef * factor for clave, coef in a.items()}
+
+
+def _constante(a):
+    """Valor de una forma sin referencias, o None si depende de la matriz o de líneas."""
+    if any(clave is not _CONSTANTE for clave in a):
+        return None
+    return a.get(_CONSTANTE, 0.0)
+
+
+class _Parser:
+    """Descenso recursivo: expr := term (+|- term)* ; term := factor (*|/ factor)*"""
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = _tokenizar(formula)
+        self.i = 0
+
+    def _error(self, mensaje):
+        return ValueError(f"{mensaje} en la fórmula {self.formula!r}")
+
+    def _ver(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None)
+
+    def _tomar(self):
+        token = self._ver()
+        self.i += 1
+        return token
+
+    def compilar(self):
+        if not self.tokens:
+            return {}
+        forma = self._expr()
+        if self.i != len(self.tokens):
+            raise self._error(f"Sobra {self._ver()[1]!r}")
+        return forma
+
+    def _expr(self):
+        forma = self._termino()
+        while self._ver() in (('op', '+'), ('op', '-')):
+            _, op = self._tomar()
+            forma = _combinar(forma, self._termino(), 1.0 if op == '+' else -1.0)
+        return forma
+
+    def _termino(self):
+        forma = self._factor()
+        while self._ver() in (('op', '*'), ('op', '/')):
+            _, op = self._tomar()
+            otra = self._factor()
+            k_izq, k_der = _constante(forma), _constante(otra)
+            if op == '*' and k_izq is not None:
+                forma = _escalar(otra, k_izq)
+            elif k_der is not None and (op == '*' or k_der != 0):
+                forma = _escalar(forma, k_der if op == '*' else 1.0 / k_der)
+            else:
+                raise self._error("Solo se admiten productos y divisiones por constantes")
+        return forma
+
+    def _factor(self):
+        tipo, valor = self._tomar()
+        if (tipo, valor) == ('op', '-'):
+            return _escalar(self._factor(), -1.0)
+        if (tipo, valor) == ('op', '+'):
+            return self._factor()
+        if (tipo, valor) == ('op', '('):
+            forma = self._expr()
+            if self._tomar() != ('op', ')'):
+                raise self._error("Falta ')'")
+            return forma
+        if tipo == 'clave':
+            return {('clave', valor): 1.0}
+        if tipo == 'numero':
+            # Un entero es una referencia a otra línea; con decimales, una constante
+            return {_CONSTANTE: float(valor)} if '.' in valor else {('linea', valor): 1.0}
+        raise self._error(f"Se esperaba un valor y vino {valor!r}")
+
+
+def compilar_formula(formula):
+    """Fórmula de texto → combinación lineal de claves de la matriz y de líneas."""
+    return _Parser(formula or '').compilar()
+
+
+# ——————————————————————————————————————————————————————————————
+# PLAN (DAG DE LÍNEAS)
+# ——————————————————————————————————————————————————————————————
+
+class PlanFormulas:
+    """
+    Líneas de varias hojas compiladas una sola vez a una matriz de coeficientes
+    sobre las claves de la matriz (más una columna constante). Al compilar se
+    resuelven las referencias entre líneas en orden de dependencias y se
+    detectan ciclos y líneas inexistentes; evaluar es un producto matricial,
+    para un período o para varios a la vez.
+
+    hojas: [(nombre, [(linea, forma), ...], busca_en)], donde busca_en son las
+    hojas (en orden) donde se resuelve una referencia a línea. Si una hoja
+    repite un número de línea, la referencia apunta a la última.
+    """
+
+    def __init__(self, hojas):
+        self.hojas = [nombre for nombre, _, _ in hojas]
+        self.filas = {nombre: len(lineas) for nombre, lineas, _ in hojas}
+
+        ultimas = {nombre: {str(linea): i for i, (linea, _) in enumerate(lineas)} for nombre, lineas, _ in hojas}
+        nodos, dependencias = {}, {}
+        for nombre, lineas, busca_en in hojas:
+            for i, (linea, forma) in enumerate(lineas):
+                resuelta, deps = {}, set()
+                for clave, coef in forma.items():
+                    if clave is _CONSTANTE or clave[0] == 'clave':
+                        resuelta[clave] = resuelta.get(clave, 0.0) + coef
+                        continue
+                    destino = next(((h, ultimas[h][clave[1]]) for h in busca_en if clave[1] in ultimas[h]), None)
+                    if destino is None:
+                        raise ValueError(f"{nombre}, línea {linea}: referencia a la línea inexistente {clave[1]!r}")
+                    resuelta[('nodo', destino)] = resuelta.get(('nodo', destino), 0.0) + coef
+                    deps.add(destino)
+                nodos[(nombre, i)] = resuelta
+                dependencias[(nombre, i)] = deps
+
+        # Expansión en orden topológico: cada línea queda en términos de la matriz
+        expandidas = {}
+        pendientes = dict(dependencias)
+        while pendientes:
+            listos = [n for n, deps in pendientes.items() if deps <= expandidas.keys()]
+            if not listos:
+                raise ValueError(f"Ciclo entre líneas: {sorted(pendientes)}")
+            for nodo in listos:
+                forma = {}
+                for clave, coef in nodos[nodo].items():
+                    if clave is not _CONSTANTE and clave[0] == 'nodo':
+                        forma = _combinar(forma, expandidas[clave[1]], coef)
+                    else:
+                        forma = _combinar(forma, {clave: coef})
+                expandidas[nodo] = forma
+                del pendientes[nodo]
+
+        self.claves = sorted({c[1] for f in expandidas.values() for c in f if c is not _CONSTANTE})
+        posicion = {clave: j for j, clave in enumerate(self.claves)}
+        orden = [(nombre, i) for nombre in self.hojas for i in range(self.filas[nombre])]
+        self.coeficientes = np.zeros((len(orden), len(self.claves) + 1), dtype=np.float64)
+        for fila, nodo in enumerate(orden):
+            for clave, coef in expandidas[nodo].items():
+                columna = len(self.claves) if clave is _CONSTANTE else posicion[clave[1]]
+                self.coeficientes[fila, columna] = coef
+
+    def _por_hoja(self, resultados):
+        salida, inicio = {}, 0
+        for nombre in self.hojas:
+            salida[nombre] = resultados[inicio:inicio + self.filas[nombre]]
+            inicio += self.filas[nombre]
+        return salida
+
+    def vector(self, matriz):
+        """Valores de las claves del plan (0 si faltan) más el 1 de la constante."""
+        return np.array([float(matriz.get(clave, 0) or 0) for clave in self.claves] + [1.0])
+
+    def evaluar(self, matriz):
+        """{hoja: [resultado por línea]} para una matriz {'A:cod': saldo, ...}."""
+        resultados = self.coeficientes @ self.vector(matriz)
+        return {nombre: valores.tolist() for nombre, valores in self._por_hoja(resultados).items()}
+
+    def evaluar_periodos(self, matrices):
+        """{hoja: arreglo (líneas × períodos)} para varias matrices en un solo producto."""
+        valores = np.column_stack([self.vector(m) for m in matrices]) if matrices else np.zeros((len(self.claves) + 1, 0))
+        return self._por_hoja(self.coeficientes @ valores)
+
+    def evaluar_columnas(self, valores):
+        """Igual que evaluar_periodos, con los valores ya como arreglo (claves del plan × períodos)."""
+        valores = np.asarray(valores, dtype=np.float64).reshape(len(self.claves), -1)
+        constante = np.ones((1, valores.shape[1]))
+        return self._por_hoja(self.coeficientes @ np.vstack([valores, constante]))
+
+
+def compilar_hojas(hojas):
+    """[(nombre, filas con 'linea'/'formula', busca_en)] → PlanFormulas."""
+    return PlanFormulas([
+        (nombre, [(fila['linea'], compilar_formula(fila['formula'])) for fila in filas], busca_en)
+        for nombre, filas, busca_en in hojas
+    ])
+
+
+# ——————————————————————————————————————————————————————————————
+# RESUMEN FINANCIERO
+# ——————————————————————————————————————————————————————————————
+
+def _compilar_resumen_financiero():
+    return compilar_hojas([
+        ('activo', RESUMEN_ACTIVO, ('activo',)),
+        ('resultado', RESUMEN_RESULTADO, ('resultado',)),
+        # El pasivo toma la utilidad (400) del resultado y el total de activos (126)
+        ('pasivo', RESUMEN_PASIVO, ('resultado', 'activo', 'pasivo')),
+    ])
+
+
+PLAN_RESUMEN_FINANCIERO = _compilar_resumen_financiero()
+
+
+@register()
+def revisar_claves_resumen_financiero(app_configs, **kwargs):
+    """manage.py check: claves de las fórmulas que no existen en el plan de cuentas (valen 0)."""
+    desconocidas = [clave for clave in PLAN_RESUMEN_FINANCIERO.claves if clave not in CLAVES_MATRIZ]
+    if not desconocidas:
+        return []
+    return [Warning(
+        f"Fórmulas del resumen financiero con claves fuera del plan de cuentas: {', '.join(desconocidas)}",
+        hint='Revisar bronz_app/resumen_financiero.py; esas claves se evalúan como 0.',
+        id='bronz_app.W001',
+    )]
+
+
+def calcular_resumen_financiero(matriz):
+    """
+    Copias de RESUMEN_ACTIVO / RESUMEN_RESULTADO / RESUMEN_PASIVO con 'resultado'
+    calculado para la matriz: {'activo': [...], 'resultado': [...], 'pasivo': [...]}.
+    """
+    resultados = PLAN_RESUMEN_FINANCIERO.evaluar(matriz)
+    return {
+        nombre: [{**fila, 'resultado': valor} for fila, valor in zip(filas, resultados[nombre])]
+        for nombre, filas in (('activo', RESUMEN_ACTIVO), ('resultado', RESUMEN_RESULTADO), ('pasivo', RESUMEN_PASIVO))
+    }
@@ -5,7 +5,10 @@ from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.contrib import messages
 from django.http import JsonResponse
-from bronz_app.utils import regenerar_resumenes_credito_debito
+from bronz_app.utils import regenerar_resumen_mensual, regenerar_resumenes_credito_debito, totales_por_cuenta
+from bronz_app.coordinador_regeneracion import metricas_regeneracion, regenerar_coordinado
+from bronz_app.trabajos import descripcion_trabajo, encolar, trabajo_a_dict, trabajos_para_aviso
+from bronz_app.snapshot_libro import obtener_snapshot
 import pandas as pd
 import openpyxl
 
@@ -40,11 +43,14 @@ def get_panel_date_range(request):
     return year, start_date, end_date
 
 
-def regenerate_financial_tables(start_date, end_date):
-    regenerar_ventas_consulta(start_date=start_date, end_date=end_date)  # CORREGIDO
-    poblar_movimientos_unificados_debito(start_date=start_date, end_date=end_date)
-    poblar_movimientos_unificados_credito(start_date=start_date, end_date=end_date)
-    regenerar_resumenes_credito_debito()
+def regenerate_financial_tables(start_date=None, end_date=None):
+    """
+    Regenera solo los días marcados como sucios (ver bronz_app.rangos_sucios).
+    start_date/end_date se mantienen por compatibilidad: el rango real lo
+    deciden las escrituras en las tablas fuente, no la vista. Pasa por el
+    coordinador: dos vistas simultáneas no regeneran dos veces.
+    """
+    return regenerar_coordinado()
 
 
 from openpyxl.utils.dataframe import dataframe_to_rows
@@ -110,6 +116,7 @@ def home(request):
         'panel_years': PANEL_YEAR_CHOICES,
         'panel_start_date': start_date,
         'panel_end_date': end_date,
+        'trabajos_aviso': trabajos_para_aviso(request.user),
     }
     return render(request, "bronz_app/home.html", context)
 
@@ -211,8 +218,10 @@ def exportar_resumen_excel(request):
             return redirect('home')
 
         # --- Resúmenes y movimientos ---
-        df_credito = pd.DataFrame(list(ResumenCredito.objects.values("cuenta_credito", "total_credito")))
-        df_debito = pd.DataFrame(list(ResumenDebito.objects.values("cuenta_debito", "total_debito")))
+        # Los resúmenes están por (año, mes, cuenta): se exporta el total por cuenta
+        debitos_dict, creditos_dict = totales_por_cuenta()
+        df_credito = pd.DataFrame(list(creditos_dict.items()), columns=["cuenta_credito", "total_credito"])
+        df_debito = pd.DataFrame(list(debitos_dict.items()), columns=["cuenta_debito", "total_debito"])
         df_unif_credito = pd.DataFrame(list(MovimientoUnificadoCredito.objects.values("fecha", "cta_credito", "monto_credito")))
         df_unif_debito  = pd.DataFrame(list(MovimientoUnificadoDebito.objects.values("fecha", "cta_debito", "monto_debito")))
 
@@ -432,18 +441,24 @@ def shopify_dashboard(request):
         'fecha_hasta': fecha_hasta_str,
     })
 
+def _encolar_y_avisar(request, tipo, **parametros):
+    """Encola un trabajo pesado y deja un mensaje; el resultado aparece en home."""
+    trabajo = encolar(tipo, usuario=request.user, **parametros)
+    messages.info(
+        request,
+        f"⏳ Trabajo #{trabajo.pk} en cola: {descripcion_trabajo(tipo)}. "
+        f"El aviso aparecerá en Inicio cuando termine."
+    )
+    return trabajo
+
+
 @login_required
 def procesar_todo(request):
     if request.method == 'POST':
         try:
-            # Ejecutar en orden las 4 funciones utilitarias
-            poblar_movimientos_unificados_credito()
-            poblar_movimientos_unificados_debito()
-            regenerar_resumenes_credito_debito()
-            regenerar_ventas_consulta()
-            messages.success(request, "¡Todos los procesos ejecutados correctamente en orden:! (VentasConsulta, Unión Créditos, Unión Débitos y Resúmenes)")
+            _encolar_y_avisar(request, 'procesar_todo')
         except Exception as e:
-            messages.error(request, f"Error al ejecutar procesamiento total: {e}")
+            messages.error(request, f"Error al encolar procesamiento total: {e}")
     return redirect('home')
 
 
@@ -456,29 +471,25 @@ from django.contrib.auth.decorators import login_required
 @login_required
 def procesar_ventas_consulta(request):
     if request.method == 'POST':
-        regenerar_ventas_consulta()
-        messages.success(request, "¡Tabla VentasConsulta regenerada!")
+        _encolar_y_avisar(request, 'ventas_consulta')
     return redirect('home')
 
 @login_required
 def procesar_union_credito(request):
     if request.method == 'POST':
-        poblar_movimientos_unificados_credito()
-        messages.success(request, "¡Unión de Créditos procesada con éxito!")
+        _encolar_y_avisar(request, 'union_credito')
     return redirect('home')
 
 @login_required
 def procesar_union_debito(request):
     if request.method == 'POST':
-        poblar_movimientos_unificados_debito()
-        messages.success(request, "¡Unión de Débitos procesada con éxito!")
+        _encolar_y_avisar(request, 'union_debito')
     return redirect('home')
 
 @login_required
 def procesar_resumenes(request):
     if request.method == 'POST':
-        regenerar_resumenes_credito_debito()
-        messages.success(request, "¡Resúmenes de crédito y débito regenerados!")
+        _encolar_y_avisar(request, 'resumenes')
     return redirect('home')
 
 # ——————————————————————————————————————————————————————————————
@@ -508,6 +519,10 @@ def procesar_inventario(request):
 from django.http import HttpResponse
 from openpyxl import Workbook
 from .models import Catalogo, InventarioInicial, EntradaProductos, Envios, Ventas, AjusteInventario
+from .stock import COLUMNAS_STOCK, stock_por_sku, totales_stock
+from .costo_promedio import costos_al
+from .libro_stock import stock_actual, stock_al
+from django.utils.dateparse import parse_date
 from django.db import models
 from django.urls import reverse
 
@@ -516,18 +531,11 @@ def exportar_inventario_actual(request):
     ws = wb.active
     ws.title = "Inventario Actual"
     ws.append(['SKU', 'Categoría', 'Producto', 'Stock', 'Bodega', 'Ingresos', 'Envios', 'Ventas', 'Ajustes'])
-    for obj in Catalogo.objects.all():
-        ini = InventarioInicial.objects.filter(sku=obj.sku).first()
-        stock = ini.stock if ini else 0
-        bodega = ini.bodega if ini else 0
-        ingresos = EntradaProductos.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad_ingresada'))['total'] or 0
-        envios = Envios.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-        ventas = Ventas.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-        ajustes = AjusteInventario.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-
+    # Una sola consulta: los movimientos de cada SKU vienen anotados en el Catálogo
+    for obj in stock_por_sku().order_by('id'):
         ws.append([
-            obj.sku, obj.categoria, obj.producto, stock, bodega,
-            ingresos, envios, ventas, ajustes
+            obj.sku, obj.categoria, obj.producto, obj.inicial, obj.bodega,
+            obj.ingresos, obj.enviado, obj.vendido, obj.ajustes
         ])
     response = HttpResponse(
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -552,102 +560,16 @@ def inventario_actual(request):
     sort = request.GET.get('sort', 'sku')
     direction = request.GET.get('dir', 'asc')
 
-    columnas_ordenables = {
-        'sku': 'sku',
-        'categoria': 'categoria',
-        'producto': 'producto',
-        'inicial': None,
-        'bodega': None,
-        'ingresos': None,
-        'envios': None,
-        'ventas': None,
-        'ajustes': None,
-        'en_oficina': None,
-        'en_bodega': None,
-        'ajuste_ventas': None,
-        'total': None,
-    }
-
-    todos = Catalogo.objects.all()
-    if q:
-        todos = todos.filter(
-            models.Q(sku__icontains=q) |
-            models.Q(categoria__icontains=q) |
-            models.Q(producto__icontains=q)
-        )
+    columnas_ordenables = ('sku', 'categoria', 'producto') + COLUMNAS_STOCK
 
-    if columnas_ordenables.get(sort):
-        orden = columnas_ordenables[sort]
-        if direction == 'desc':
-            orden = '-' + orden
-        todos = todos.order_by(orden)
-
-        # ---- Prepara ventas por SKU para ajuste ----
-    ventas_por_sku = {}
-    for obj in todos:
-        ventas = Ventas.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-        ventas_por_sku[obj.sku] = ventas
-
-    productos = []
-    for obj in todos:
-        ini = InventarioInicial.objects.filter(sku=obj.sku).first()
-        inicial = ini.stock if ini else 0
-        bodega = ini.bodega if ini else 0
-        ingresos = EntradaProductos.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad_ingresada'))['total'] or 0
-        envios = Envios.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-        ventas = ventas_por_sku.get(obj.sku, 0)
-        ajustes = AjusteInventario.objects.filter(sku__sku=obj.sku).aggregate(total=models.Sum('cantidad'))['total'] or 0
-
-        # Lógica de ajuste de ventas
-        ajuste_ventas = ventas
-        if obj.sku == 'BB0001' or obj.sku == 'BB0002':
-            ajuste_ventas += ventas_por_sku.get('BB0003', 0) + ventas_por_sku.get('BB0012', 0)
-        elif obj.sku == 'BB0003':
-            ajuste_ventas -= ventas_por_sku.get('BB0003', 0)
-        elif obj.sku == 'BB0009' or obj.sku == 'BB0010':
-            ajuste_ventas += ventas_por_sku.get('BB0012', 0)
-        # El resto solo sus propias ventas
-
-        en_oficina = inicial + ingresos - envios
-        # NUEVA LÓGICA EN BODEGA:
-        en_bodega = bodega + envios - ajuste_ventas
-        total = en_oficina + en_bodega - ajustes
-
-        productos.append({
-            'sku': obj.sku,
-            'categoria': obj.categoria,
-            'producto': obj.producto,
-            'inicial': inicial,
-            'bodega': bodega,
-            'ingresos': ingresos,
-            'envios': envios,
-            'ventas': ventas,
-            'ajustes': ajustes,
-            'en_oficina': en_oficina,
-            'en_bodega': en_bodega,
-            'ajuste_ventas': ajuste_ventas,
-            'total': total,
-        })
+    # Stock de todos los SKUs en una sentencia; orden y paginación en la base de datos
+    todos = stock_por_sku(q)
+    orden = sort if sort in columnas_ordenables else 'sku'
+    if direction == 'desc':
+        orden = '-' + orden
+    todos = todos.order_by(orden, 'sku')
 
-
-    # Ordena si corresponde
-    if columnas_ordenables.get(sort) is None and productos and sort in productos[0]:
-        reverse_sort = (direction == 'desc')
-        productos = sorted(productos, key=lambda x: x[sort], reverse=reverse_sort)
-
-    # Totales
-    global_total_inicial = sum(p['inicial'] for p in productos)
-    global_total_bodega = sum(p['bodega'] for p in productos)
-    global_total_ingresos = sum(p['ingresos'] for p in productos)
-    global_total_envios = sum(p['envios'] for p in productos)
-    global_total_ventas = sum(p['ventas'] for p in productos)
-    global_total_ajustes = sum(p['ajustes'] for p in productos)
-    global_total_en_oficina = sum(p['en_oficina'] for p in productos)
-    global_total_en_bodega = sum(p['en_bodega'] for p in productos)
-    global_total_ajuste_ventas = sum(p['ajuste_ventas'] for p in productos)
-    global_total_total = sum(p['total'] for p in productos)
-
-    paginator = Paginator(productos, 10)
+    paginator = Paginator(todos, 10)
     page = request.GET.get('page')
     try:
         productos_page = paginator.page(page)
@@ -656,16 +578,31 @@ def inventario_actual(request):
     except EmptyPage:
         productos_page = paginator.page(paginator.num_pages)
 
-    total_inicial = sum(p['inicial'] for p in productos_page.object_list)
-    total_bodega = sum(p['bodega'] for p in productos_page.object_list)
-    total_ingresos = sum(p['ingresos'] for p in productos_page.object_list)
-    total_envios = sum(p['envios'] for p in productos_page.object_list)
-    total_ventas = sum(p['ventas'] for p in productos_page.object_list)
-    total_ajustes = sum(p['ajustes'] for p in productos_page.object_list)
-    total_en_oficina = sum(p['en_oficina'] for p in productos_page.object_list)
-    total_en_bodega = sum(p['en_bodega'] for p in productos_page.object_list)
-    total_ajuste_ventas = sum(p['ajuste_ventas'] for p in productos_page.object_list)
-    total_total = sum(p['total'] for p in productos_page.object_list)
+    # Totales de la página (ya en memoria) y de todo el filtro (un SUM en la base)
+    totales_pagina = {c: sum(getattr(p, c) for p in productos_page.object_list) for c in COLUMNAS_STOCK}
+    totales_filtro = totales_stock(todos)
+
+    total_inicial = totales_pagina['inicial']
+    total_bodega = totales_pagina['bodega']
+    total_ingresos = totales_pagina['ingresos']
+    total_envios = totales_pagina['enviado']
+    total_ventas = totales_pagina['vendido']
+    total_ajustes = totales_pagina['ajustes']
+    total_en_oficina = totales_pagina['en_oficina']
+    total_en_bodega = totales_pagina['en_bodega']
+    total_ajuste_ventas = totales_pagina['ajuste_ventas']
+    total_total = totales_pagina['total']
+
+    global_total_inicial = totales_filtro['inicial']
+    global_total_bodega = totales_filtro['bodega']
+    global_total_ingresos = totales_filtro['ingresos']
+    global_total_envios = totales_filtro['enviado']
+    global_total_ventas = totales_filtro['vendido']
+    global_total_ajustes = totales_filtro['ajustes']
+    global_total_en_oficina = totales_filtro['en_oficina']
+    global_total_en_bodega = totales_filtro['en_bodega']
+    global_total_ajuste_ventas = totales_filtro['ajuste_ventas']
+    global_total_total = totales_filtro['total']
 
     url_excel = reverse('exportar_inventario_actual')
     return render(request, 'bronz_app/inventario.html', {
@@ -698,6 +635,31 @@ def inventario_actual(request):
 
 
 
+def stock_json_view(request):
+    """
+    Stock por SKU y ubicación desde el libro de stock: el actual (stock_ubicacion)
+    o, con ?fecha=YYYY-MM-DD, el del cierre de ese día. ?sku= filtra un SKU.
+    Cada SKU lleva el costo promedio vigente a esa fecha y el valor del stock.
+    """
+    fecha = parse_date(request.GET.get('fecha', ''))
+    skus = [request.GET['sku']] if request.GET.get('sku') else None
+    saldos = stock_al(fecha, skus) if fecha else stock_actual(skus)
+
+    stock = {}
+    for (sku, ubicacion), cantidad in sorted(saldos.items()):
+        stock.setdefault(sku, {})[ubicacion] = cantidad
+    costos = costos_al(fecha or date.today(), stock)
+    filas = []
+    for sku, por_ubicacion in stock.items():
+        total = sum(por_ubicacion.values())
+        costo = costos.get(sku) or 0
+        filas.append({
+            'sku': sku, **por_ubicacion, 'total': total,
+            'costo_promedio': float(costo), 'valor': float(costo * total),
+        })
+    return JsonResponse({'fecha': fecha.isoformat() if fecha else None, 'stock': filas})
+
+
 # ——————————————————————————————————————————————————————————————
 # BALANCE
 # ——————————————————————————————————————————————————————————————
@@ -714,141 +676,56 @@ from django.shortcuts import render
 from django.http import HttpResponse
 from .models import ResumenDebito, ResumenCredito
 import pandas as pd
-from .cod_cuentas_balance import balance_rows
-
-def intdot(val):
-    """Formatea números para mostrar miles con punto."""
-    try:
-        val_float = float(val)
-        val_int = int(round(val_float))
-        return f"{val_int:,}".replace(",", ".")
-    except Exception:
-        return ""
+from .motor_balance import intdot
+from .plan_cuentas import hijos as hijos_plan_cuentas, subtotales as subtotales_plan_cuentas
+from .snapshot_libro import balance_de_snapshot
 
 def balance_view(request):
 
-    # Ejecutar siempre los procesos previos antes de mostrar el balance
+    # Totales por cuenta desde el último snapshot (las escrituras lo rehacen en segundo plano)
     year, start_date, end_date = get_panel_date_range(request)
-    regenerate_financial_tables(start_date, end_date)
+    snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
 
-    debitos_dict = {d.cuenta_debito: float(d.total_debito) for d in ResumenDebito.objects.all()}
-    creditos_dict = {c.cuenta_credito: float(c.total_credito) for c in ResumenCredito.objects.all()}
-
-    matriz_balance = []
+    balance = balance_de_snapshot(snapshot)
     fecha_corte = date.today().strftime("%Y-%m-%d")
-    total_debito = total_credito = total_saldo_deudor = total_saldo_acreedor = 0
-    total_activo = total_pasivo = total_perdidas = total_ganancias = 0
-
-    for fila in balance_rows:
-        codigo = fila['codigo']
-        nombre = fila['nombre']
-        debito = debitos_dict.get(codigo, 0)
-        credito = creditos_dict.get(codigo, 0)
-        saldo_deudor = saldo_acreedor = activo = pasivo = perdidas = ganancias = 0
-
-        if 1010100 <= codigo <= 2040000:
-            saldo_deudor = debito - credito if debito > credito else 0
-            saldo_acreedor = credito - debito if credito > debito else 0
-            activo = saldo_deudor
-            pasivo = saldo_acreedor
-        elif 3010100 <= codigo <= 3030300:
-            saldo_deudor = debito - credito if debito > credito else 0
-            saldo_acreedor = credito - debito if credito > debito else 0
-            perdidas = saldo_deudor
-            ganancias = saldo_acreedor
-
-        matriz_balance.append({
-            'codigo': codigo,
-            'nombre': nombre,
-            'debito': intdot(debito),
-            'credito': intdot(credito),
-            'saldo_deudor': intdot(saldo_deudor),
-            'saldo_acreedor': intdot(saldo_acreedor),
-            'activo': intdot(activo),
-            'pasivo': intdot(pasivo),
-            'perdidas': intdot(perdidas),
-            'ganancias': intdot(ganancias)
-        })
-
-        # Acumula totales
-        total_debito += debito
-        total_credito += credito
-        total_saldo_deudor += saldo_deudor
-        total_saldo_acreedor += saldo_acreedor
-        total_activo += activo
-        total_pasivo += pasivo
-        total_perdidas += perdidas
-        total_ganancias += ganancias
-
-    # -- Agrega fila: Utilidad (pérdida) del Ejercicio
-    def resta_positiva(a, b):
-        return max(0, a - b)
-
-    utilidad_activo = resta_positiva(total_pasivo, total_activo)
-    utilidad_pasivo = resta_positiva(total_activo, total_pasivo)
-    utilidad_perdidas = resta_positiva(total_ganancias, total_perdidas)
-    utilidad_ganancias = resta_positiva(total_perdidas, total_ganancias)
-
-    utilidad = {
-        'debito': '',
-        'credito': '',
-        'saldo_deudor': '',
-        'saldo_acreedor': '',
-        'activo': intdot(utilidad_activo),
-        'pasivo': intdot(utilidad_pasivo),
-        'perdidas': intdot(utilidad_perdidas),
-        'ganancias': intdot(utilidad_ganancias)
-    }
-
-    # Flags para pintar en rojo
-    utilidad_pasivo_rojo = total_activo < total_pasivo
-    utilidad_perdidas_rojo = total_perdidas > total_ganancias
-
-    # -- Agrega fila: SUMAS TOTALES (Totales + Utilidad)
-    sumas_totales = {
-        'debito': intdot(total_debito),
-        'credito': intdot(total_credito),
-        'saldo_deudor': intdot(total_saldo_deudor),
-        'saldo_acreedor': intdot(total_saldo_acreedor),
-        'activo': intdot(total_activo + utilidad_activo),
-        'pasivo': intdot(total_pasivo + utilidad_pasivo),
-        'perdidas': intdot(total_perdidas + utilidad_perdidas),
-        'ganancias': intdot(total_ganancias + utilidad_ganancias)
-    }
-
-    totales = {
-        'debito': intdot(total_debito),
-        'credito': intdot(total_credito),
-        'saldo_deudor': intdot(total_saldo_deudor),
-        'saldo_acreedor': intdot(total_saldo_acreedor),
-        'activo': intdot(total_activo),
-        'pasivo': intdot(total_pasivo),
-        'perdidas': intdot(total_perdidas),
-        'ganancias': intdot(total_ganancias)
-    }
 
     # Exportar a Excel si es solicitado
     if request.GET.get("export") == "excel":
-        df = pd.DataFrame([
-            {**f, **{k: v.replace('.', '') for k, v in f.items() if k not in ('codigo', 'nombre')}}
-            for f in matriz_balance
-        ])
         response = HttpResponse(content_type='application/vnd.ms-excel')
         response['Content-Disposition'] = 'attachment; filename="balance.xlsx"'
-        df.to_excel(response, index=False)
+        balance.dataframe().to_excel(response, index=False)
         return response
 
+    # Subtotales por clase / grupo / subgrupo: una lectura de rollup_cuenta_mes
+    subtotales_plan = [
+        {**fila, **{c: intdot(fila[c]) for c in ('debito', 'credito', 'saldo')}}
+        for fila in subtotales_plan_cuentas(anio=year)
+    ]
+
     return render(request, "bronz_app/balance.html", {
-        'matriz_balance': matriz_balance,
-        'totales': totales,
-        'utilidad': utilidad,
-        'sumas_totales': sumas_totales,
-        'utilidad_pasivo_rojo': utilidad_pasivo_rojo,
-        'utilidad_perdidas_rojo': utilidad_perdidas_rojo,
+        **balance.contexto_template(),
+        'subtotales_plan': subtotales_plan,
         'fecha_corte': fecha_corte,  # <--- Aquí pasas la fecha de hoy
         'panel_year': year,
         'panel_start_date': start_date,
         'panel_end_date': end_date,
+        'snapshot_calculado': snapshot.calculado,
+        'snapshot_desactualizado': snapshot.desactualizado,
+    })
+
+
+def plan_cuentas_hijos_view(request):
+    """Navegación del plan de cuentas: hijos directos de ?prefijo= (o las clases) con sus totales del año."""
+    year, start_date, end_date = get_panel_date_range(request)
+    prefijo = request.GET.get('prefijo') or None
+    filas = hijos_plan_cuentas(prefijo, anio=year)
+    return JsonResponse({
+        'prefijo': prefijo,
+        'anio': year,
+        'hijos': [
+            {**fila, **{c: float(fila[c]) for c in ('debito', 'credito', 'saldo')}}
+            for fila in filas
+        ],
     })
 
 # ——————————————————————————————————————————————————————————————
@@ -861,43 +738,19 @@ from django.shortcuts import render
 
 def resumen_balance_view(request):
 
-    # Ejecutar siempre los procesos previos antes de mostrar el balance
-    year, start_date, end_date = get_panel_date_range(request)
-    regenerate_financial_tables(start_date, end_date)
-
-    # 1. Prepara los datos "matriz_dict"
+    # 1. "matriz_dict" ya calculada en el snapshot
     # Debe ser: {'A:1010100': 123, 'P:1010100': 0, ...}
-    # Puedes obtenerlo de tu lógica existente para balance_view
-    # Aquí te doy un ejemplo muy simple:
-    matriz_dict = {}
-    # Supón que tienes lista de filas balance_rows y los valores de cada columna
-    # Puedes reutilizar tu código de balance_view:
-    from .models import ResumenDebito, ResumenCredito
-    from .cod_cuentas_balance import balance_rows
-
-    debitos_dict = {d.cuenta_debito: float(d.total_debito) for d in ResumenDebito.objects.all()}
-    creditos_dict = {c.cuenta_credito: float(c.total_credito) for c in ResumenCredito.objects.all()}
-    for fila in balance_rows:
-        codigo = str(fila['codigo'])
-        debito = debitos_dict.get(int(codigo), 0)
-        credito = creditos_dict.get(int(codigo), 0)
-        # Calcula las columnas igual que tu balance_view
-        saldo_deudor = debito - credito if debito > credito else 0
-        saldo_acreedor = credito - debito if credito > debito else 0
-        # Según rango, asigna a A, P, Pe, G
-        if 1010100 <= int(codigo) <= 2040000:
-            matriz_dict[f'A:{codigo}'] = saldo_deudor
-            matriz_dict[f'P:{codigo}'] = saldo_acreedor
-        elif 3010100 <= int(codigo) <= 3010300:
-            matriz_dict[f'Pe:{codigo}'] = saldo_deudor
-            matriz_dict[f'G:{codigo}'] = saldo_acreedor
+    year, start_date, end_date = get_panel_date_range(request)
+    snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
 
     # 2. Renderiza el template y pasa matriz_js
     return render(request, "bronz_app/resumen_balance.html", {
-        'matriz_js': json.dumps(matriz_dict),
+        'matriz_js': json.dumps(snapshot.matriz),
         'panel_year': year,
         'panel_start_date': start_date,
         'panel_end_date': end_date,
+        'snapshot_calculado': snapshot.calculado,
+        'snapshot_desactualizado': snapshot.desactualizado,
     })
 
 # ——————————————————————————————————————————————————————————————
@@ -906,8 +759,7 @@ def resumen_balance_view(request):
 
 from django.shortcuts import render
 from django.http import HttpResponse
-from .models import MovimientoUnificadoCredito, MovimientoUnificadoDebito
-from .cod_cuentas_balance import balance_rows
+from .motor_balance import balance_al_corte
 from datetime import datetime
 import pandas as pd
 
@@ -940,144 +792,151 @@ def balance_segun_fecha_view(request):
         range_start = date(effective_end.year, 1, 1)
     regenerate_financial_tables(range_start, effective_end)
 
-    debitos = MovimientoUnificadoDebito.objects.filter(fecha__gte=range_start, fecha__lte=effective_end)
-    creditos = MovimientoUnificadoCredito.objects.filter(fecha__gte=range_start, fecha__lte=effective_end)
+    balance = balance_al_corte(effective_end)
 
-    debitos_dict = {}
-    for d in debitos:
-        debitos_dict[d.cta_debito] = debitos_dict.get(d.cta_debito, 0) + float(d.monto_debito)
-    creditos_dict = {}
-    for c in creditos:
-        creditos_dict[c.cta_credito] = creditos_dict.get(c.cta_credito, 0) + float(c.monto_credito)
+    # Exportar a Excel si es solicitado
+    if request.GET.get("export") == "excel":
+        response = HttpResponse(content_type='application/vnd.ms-excel')
+        response['Content-Disposition'] = f'attachment; filename="balance_segun_fecha_{fecha_corte_str}.xlsx"'
+        balance.dataframe().to_excel(response, index=False)
+        return response
 
-    matriz_balance = []
-    total_debito = total_credito = total_saldo_deudor = total_saldo_acreedor = 0
-    total_activo = total_pasivo = total_perdidas = total_ganancias = 0
+    return render(request, "bronz_app/balance.html", {
+        **balance.contexto_template(),
+        'fecha_corte': fecha_corte_str,
+        'panel_year': year,
+        'panel_start_date': range_start,
+        'panel_end_date': effective_end,
+    })
 
-    def intdot(val):
-        try:
-            val_float = float(val)
-            val_int = int(round(val_float))
-            return f"{val_int:,}".replace(",", ".")
-        except Exception:
-            return ""
-
-    for fila in balance_rows:
-        codigo = fila['codigo']
-        nombre = fila['nombre']
-        debito = debitos_dict.get(codigo, 0)
-        credito = creditos_dict.get(codigo, 0)
-        saldo_deudor = saldo_acreedor = activo = pasivo = perdidas = ganancias = 0
-
-        if 1010100 <= codigo <= 2040000:
-            saldo_deudor = debito - credito if debito > credito else 0
-            saldo_acreedor = credito - debito if credito > debito else 0
-            activo = saldo_deudor
-            pasivo = saldo_acreedor
-        elif 3010100 <= codigo <= 3010300:
-            saldo_deudor = debito - credito if debito > credito else 0
-            saldo_acreedor = credito - debito if credito > debito else 0
-            perdidas = saldo_deudor
-            ganancias = saldo_acreedor
-
-        matriz_balance.append({
-            'codigo': codigo,
-            'nombre': nombre,
-            'debito': intdot(debito),
-            'credito': intdot(credito),
-            'saldo_deudor': intdot(saldo_deudor),
-            'saldo_acreedor': intdot(saldo_acreedor),
-            'activo': intdot(activo),
-            'pasivo': intdot(pasivo),
-            'perdidas': intdot(perdidas),
-            'ganancias': intdot(ganancias)
-        })
 
-        total_debito += debito
-        total_credito += credito
-        total_saldo_deudor += saldo_deudor
-        total_saldo_acreedor += saldo_acreedor
-        total_activo += activo
-        total_pasivo += pasivo
-        total_perdidas += perdidas
-        total_ganancias += ganancias
-
-    def resta_positiva(a, b):
-        return max(0, a - b)
-
-    utilidad_activo = resta_positiva(total_pasivo, total_activo)
-    utilidad_pasivo = resta_positiva(total_activo, total_pasivo)
-    utilidad_perdidas = resta_positiva(total_ganancias, total_perdidas)
-    utilidad_ganancias = resta_positiva(total_perdidas, total_ganancias)
-
-    utilidad = {
-        'debito': '',
-        'credito': '',
-        'saldo_deudor': '',
-        'saldo_acreedor': '',
-        'activo': intdot(utilidad_activo),
-        'pasivo': intdot(utilidad_pasivo),
-        'perdidas': intdot(utilidad_perdidas),
-        'ganancias': intdot(utilidad_ganancias)
-    }
+# ——————————————————————————————————————————————————————————————
+# BALANCE COMPARATIVO (VARIAS FECHAS DE CORTE)
+# ——————————————————————————————————————————————————————————————
 
-    utilidad_pasivo_rojo = total_activo < total_pasivo
-    utilidad_perdidas_rojo = total_perdidas > total_ganancias
-
-    sumas_totales = {
-        'debito': intdot(total_debito),
-        'credito': intdot(total_credito),
-        'saldo_deudor': intdot(total_saldo_deudor),
-        'saldo_acreedor': intdot(total_saldo_acreedor),
-        'activo': intdot(total_activo + utilidad_activo),
-        'pasivo': intdot(total_pasivo + utilidad_pasivo),
-        'perdidas': intdot(total_perdidas + utilidad_perdidas),
-        'ganancias': intdot(total_ganancias + utilidad_ganancias)
-    }
+import calendar
+from io import BytesIO
+import numpy as np
+from .motor_balance import CODIGOS as CODIGOS_BALANCE, COLUMNAS, NOMBRES as NOMBRES_BALANCE, balances_comparativos
+
+COLUMNAS_COMPARATIVO = {
+    'saldo': 'Saldo (Débito − Crédito)',
+    'debito': 'Débito',
+    'credito': 'Crédito',
+    'saldo_deudor': 'Saldo Deudor',
+    'saldo_acreedor': 'Saldo Acreedor',
+    'activo': 'Activo',
+    'pasivo': 'Pasivo',
+    'perdidas': 'Pérdidas',
+    'ganancias': 'Ganancias',
+}
+
+
+def _cortes_comparativo(request, year, default_end):
+    """Fechas de corte pedidas: fines de mes, fines de trimestre o una lista (?fecha_corte=…&fecha_corte=…)."""
+    modo = request.GET.get('modo', 'meses')
+    if modo == 'fechas':
+        cortes = set()
+        for texto in request.GET.getlist('fecha_corte'):
+            try:
+                cortes.add(min(datetime.strptime(texto, "%Y-%m-%d").date(), default_end))
+            except ValueError:
+                continue
+        return modo, sorted(cortes)
 
-    totales = {
-        'debito': intdot(total_debito),
-        'credito': intdot(total_credito),
-        'saldo_deudor': intdot(total_saldo_deudor),
-        'saldo_acreedor': intdot(total_saldo_acreedor),
-        'activo': intdot(total_activo),
-        'pasivo': intdot(total_pasivo),
-        'perdidas': intdot(total_perdidas),
-        'ganancias': intdot(total_ganancias)
+    meses = (3, 6, 9, 12) if modo == 'trimestres' else range(1, 13)
+    cortes = {
+        min(date(year, mes, calendar.monthrange(year, mes)[1]), default_end)
+        for mes in meses
+        if date(year, mes, 1) <= default_end
     }
+    return modo, sorted(cortes)
 
-    # Exportar a Excel si es solicitado
+
+def balance_comparativo_view(request):
+
+    year, start_date, default_end = get_panel_date_range(request)
+    modo, cortes = _cortes_comparativo(request, year, default_end)
+    columna = request.GET.get('columna', 'saldo')
+    if columna not in COLUMNAS_COMPARATIVO:
+        columna = 'saldo'
+
+    if cortes:
+        regenerate_financial_tables(date(cortes[0].year, 1, 1), cortes[-1])
+    # Todas las fechas salen de una sola consulta agrupada (sumas condicionales por corte)
+    balances = balances_comparativos(cortes)
+    etiquetas = [c.strftime("%Y-%m-%d") for c in cortes]
+
+    # Exportar a Excel: una hoja por columna del balance, las fechas lado a lado
     if request.GET.get("export") == "excel":
-        df = pd.DataFrame([
-            {**f, **{k: v.replace('.', '') for k, v in f.items() if k not in ('codigo', 'nombre')}}
-            for f in matriz_balance
-        ])
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = f'attachment; filename="balance_segun_fecha_{fecha_corte_str}.xlsx"'
-        df.to_excel(response, index=False)
+        salida = BytesIO()
+        with pd.ExcelWriter(salida, engine='openpyxl') as writer:
+            for nombre_columna in ('saldo',) + COLUMNAS:
+                df = balances[0].dataframe()[['codigo', 'nombre']] if balances else pd.DataFrame(columns=['codigo', 'nombre'])
+                for etiqueta, balance in zip(etiquetas, balances):
+                    df[etiqueta] = np.rint(balance.columna(nombre_columna)).astype(np.int64)
+                df.to_excel(writer, sheet_name=COLUMNAS_COMPARATIVO[nombre_columna][:31], index=False)
+        response = HttpResponse(
+            salida.getvalue(),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        response['Content-Disposition'] = f'attachment; filename="balance_comparativo_{year}.xlsx"'
         return response
 
-    return render(request, "bronz_app/balance.html", {
-        'matriz_balance': matriz_balance,
+    valores = [balance.columna(columna).tolist() for balance in balances]
+    filas = [
+        {'codigo': int(codigo), 'nombre': nombre, 'valores': [intdot(v[i]) for v in valores]}
+        for i, (codigo, nombre) in enumerate(zip(CODIGOS_BALANCE, NOMBRES_BALANCE))
+    ]
+    totales = [intdot(sum(v)) for v in valores]
+
+    return render(request, "bronz_app/balance_comparativo.html", {
+        'filas': filas,
         'totales': totales,
-        'utilidad': utilidad,
-        'sumas_totales': sumas_totales,
-        'utilidad_pasivo_rojo': utilidad_pasivo_rojo,
-        'utilidad_perdidas_rojo': utilidad_perdidas_rojo,
-        'fecha_corte': fecha_corte_str,
+        'cortes': etiquetas,
+        'modo': modo,
+        'columna': columna,
+        'columnas': COLUMNAS_COMPARATIVO.items(),
         'panel_year': year,
-        'panel_start_date': range_start,
-        'panel_end_date': effective_end,
+        'panel_start_date': start_date,
+        'panel_end_date': default_end,
     })
 
 
+# ————————————————————————————————————————————————————————
+# INDICADORES FINANCIEROS POR MES
+# ————————————————————————————————————————————————————————
+from .indicadores import obtener_indicadores
+
+def indicadores_view(request):
+
+    year, start_date, end_date = get_panel_date_range(request)
+    # Último snapshot; las escrituras lo rehacen en segundo plano (o ?refrescar=1)
+    datos = obtener_indicadores(year, refrescar=request.GET.get('refrescar') == '1')
+
+    return render(request, "bronz_app/indicadores.html", {
+        'periodos': datos['periodos'],
+        'indicadores': datos['indicadores'],
+        'version': datos['version'],
+        'desactualizado': datos['desactualizado'],
+        'panel_year': year,
+        'panel_start_date': start_date,
+        'panel_end_date': end_date,
+    })
+
+
+def indicadores_json_view(request):
+    """Los mismos indicadores que indicadores_view, en JSON."""
+    year, start_date, end_date = get_panel_date_range(request)
+    return JsonResponse(obtener_indicadores(year, refrescar=request.GET.get('refrescar') == '1'))
+
+
 # ————————————————————————————————————————————————————————
 # RESUMEN BALANCE SEGÚN FECHA
 # ————————————————————————————————————————————————————————
 from django.shortcuts import render
 import json
-from .models import MovimientoUnificadoCredito, MovimientoUnificadoDebito
-from .cod_cuentas_balance import balance_rows
+from .motor_balance import balance_al_corte
 
 def resumen_balance_segun_fecha_view(request):
 
@@ -1101,27 +960,7 @@ def resumen_balance_segun_fecha_view(request):
             if range_start > effective_end:
                 range_start = date(effective_end.year, 1, 1)
             regenerate_financial_tables(range_start, effective_end)
-            debitos = MovimientoUnificadoDebito.objects.filter(fecha__gte=range_start, fecha__lte=effective_end)
-            creditos = MovimientoUnificadoCredito.objects.filter(fecha__gte=range_start, fecha__lte=effective_end)
-
-            debitos_dict = {}
-            for d in debitos:
-                debitos_dict[d.cta_debito] = debitos_dict.get(d.cta_debito, 0) + float(d.monto_debito)
-            creditos_dict = {}
-            for c in creditos:
-                creditos_dict[c.cta_credito] = creditos_dict.get(c.cta_credito, 0) + float(c.monto_credito)
-            for fila in balance_rows:
-                codigo = str(fila['codigo'])
-                debito = debitos_dict.get(int(codigo), 0)
-                credito = creditos_dict.get(int(codigo), 0)
-                saldo_deudor = debito - credito if debito > credito else 0
-                saldo_acreedor = credito - debito if credito > debito else 0
-                if 1010100 <= int(codigo) <= 2040000:
-                    matriz_dict[f'A:{codigo}'] = saldo_deudor
-                    matriz_dict[f'P:{codigo}'] = saldo_acreedor
-                elif 3010100 <= int(codigo) <= 3010300:
-                    matriz_dict[f'Pe:{codigo}'] = saldo_deudor
-                    matriz_dict[f'G:{codigo}'] = saldo_acreedor
+            matriz_dict = balance_al_corte(effective_end).matriz_dict()
 
     return render(request, "bronz_app/resumen_balance_segun_fecha.html", {
         'matriz_js': json.dumps(matriz_dict),
@@ -1140,35 +979,17 @@ import json
 from django.shortcuts import render
 
 def resumen_financiero(request):
-    # Procesos previos (puedes incluir solo los necesarios para el financiero)
+    # Matriz desde el último snapshot (las escrituras lo rehacen en segundo plano)
     year, start_date, end_date = get_panel_date_range(request)
-    regenerate_financial_tables(start_date, end_date)
-
-    matriz_dict = {}
-    from .models import ResumenDebito, ResumenCredito
-    from .cod_cuentas_balance import balance_rows   # o tu archivo resumen_financiero_rows si tienes uno diferente
-
-    debitos_dict = {d.cuenta_debito: float(d.total_debito) for d in ResumenDebito.objects.all()}
-    creditos_dict = {c.cuenta_credito: float(c.total_credito) for c in ResumenCredito.objects.all()}
-
-    for fila in balance_rows:   # Si tienes otro set de rows para el financiero, cámbialo aquí
-        codigo = str(fila['codigo'])
-        debito = debitos_dict.get(int(codigo), 0)
-        credito = creditos_dict.get(int(codigo), 0)
-        saldo_deudor = debito - credito if debito > credito else 0
-        saldo_acreedor = credito - debito if credito > debito else 0
-        if 1010100 <= int(codigo) <= 2040000:
-            matriz_dict[f'A:{codigo}'] = saldo_deudor
-            matriz_dict[f'P:{codigo}'] = saldo_acreedor
-        elif 3010100 <= int(codigo) <= 3010300:
-            matriz_dict[f'Pe:{codigo}'] = saldo_deudor
-            matriz_dict[f'G:{codigo}'] = saldo_acreedor
+    snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
 
     return render(request, "bronz_app/resumen_financiero.html", {
-        'matriz_js': json.dumps(matriz_dict),
+        'matriz_js': json.dumps(snapshot.matriz),
         'panel_year': year,
         'panel_start_date': start_date,
         'panel_end_date': end_date,
+        'snapshot_calculado': snapshot.calculado,
+        'snapshot_desactualizado': snapshot.desactualizado,
     })
 
 
@@ -1178,8 +999,7 @@ def resumen_financiero(request):
 
 from django.shortcuts import render
 import json
-from .models import MovimientoUnificadoCredito, MovimientoUnificadoDebito
-from .cod_cuentas_balance import balance_rows
+from .motor_balance import balance_al_corte
 from datetime import datetime
 
 def resumen_financiero_segun_fecha_view(request):
@@ -1204,26 +1024,7 @@ def resumen_financiero_segun_fecha_view(request):
             if range_start > effective_end:
                 range_start = date(effective_end.year, 1, 1)
             regenerate_financial_tables(range_start, effective_end)
-            debitos = MovimientoUnificadoDebito.objects.filter(fecha__gte=range_start, fecha__lte=effective_end)
-            creditos = MovimientoUnificadoCredito.objects.filter(fecha__gte=range_start, fecha__lte=effective_end)
-            debitos_dict = {}
-            for d in debitos:
-                debitos_dict[d.cta_debito] = debitos_dict.get(d.cta_debito, 0) + float(d.monto_debito)
-            creditos_dict = {}
-            for c in creditos:
-                creditos_dict[c.cta_credito] = creditos_dict.get(c.cta_credito, 0) + float(c.monto_credito)
-            for fila in balance_rows:
-                codigo = str(fila['codigo'])
-                debito = debitos_dict.get(int(codigo), 0)
-                credito = creditos_dict.get(int(codigo), 0)
-                saldo_deudor = debito - credito if debito > credito else 0
-                saldo_acreedor = credito - debito if credito > debito else 0
-                if 1010100 <= int(codigo) <= 2040000:
-                    matriz_dict[f'A:{codigo}'] = saldo_deudor
-                    matriz_dict[f'P:{codigo}'] = saldo_acreedor
-                elif 3010100 <= int(codigo) <= 3010300:
-                    matriz_dict[f'Pe:{codigo}'] = saldo_deudor
-                    matriz_dict[f'G:{codigo}'] = saldo_acreedor
+            matriz_dict = balance_al_corte(effective_end).matriz_dict()
         except Exception:
             pass
 
@@ -1241,35 +1042,28 @@ from django.http import HttpResponse
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from bronz_app.resumen_financiero import RESUMEN_ACTIVO, RESUMEN_PASIVO, RESUMEN_RESULTADO
-from bronz_app.utils_financiero import eval_formula
+from bronz_app.utils_financiero import calcular_resumen_financiero
 
 def exportar_excel_resumen_financiero(request):
-    # Supón que ya generaste matriz_dict en tu view principal según la fecha de corte
-    matriz_dict = ...  # aquí debes obtenerla (¡esto es parte de tu lógica!)
-
-    # 1. Calcula resultados en arrays:
-    resultados_activo = {}
-    for row in RESUMEN_ACTIVO:
-        val = eval_formula(row["formula"], matriz_dict, resultados_activo)
-        resultados_activo[str(row["linea"])] = val
-        row["resultado"] = val
-
-    resultados_resultado = {}
-    for row in RESUMEN_RESULTADO:
-        val = eval_formula(row["formula"], matriz_dict, resultados_resultado)
-        resultados_resultado[str(row["linea"])] = val
-        row["resultado"] = val
-
-    resultados_pasivo = {}
-    for row in RESUMEN_PASIVO:
-        val = eval_formula(
-            row["formula"], matriz_dict, resultados_pasivo,
-            resultado_lookup=resultados_resultado,
-            activo_lookup=resultados_activo
-        )
-        resultados_pasivo[str(row["linea"])] = val
-        row["resultado"] = val
+    # Matriz del año del panel, o del 1 de enero a la fecha de corte si viene
+    year, start_date, default_end = get_panel_date_range(request)
+    fecha_corte = request.GET.get('fecha_corte')
+    fecha_corte_dt = None
+    if fecha_corte:
+        try:
+            fecha_corte_dt = datetime.strptime(fecha_corte, "%Y-%m-%d").date()
+        except ValueError:
+            fecha_corte_dt = None
+    if fecha_corte_dt:
+        effective_end = min(fecha_corte_dt, default_end)
+        regenerate_financial_tables(date(effective_end.year, 1, 1), effective_end)
+        matriz_dict = balance_al_corte(effective_end).matriz_dict()
+    else:
+        matriz_dict = obtener_snapshot(year).matriz
+
+    # 1. Calcula las tres hojas con el plan compilado (sin eval por línea):
+    hojas = calcular_resumen_financiero(matriz_dict)
+    RESUMEN_ACTIVO, RESUMEN_PASIVO, RESUMEN_RESULTADO = hojas['activo'], hojas['pasivo'], hojas['resultado']
 
     # 2. Arma la tabla con tres bloques en la misma hoja:
     resumen = [
@@ -1387,12 +1181,15 @@ def dashboard(request):
     """
     year, start_date, end_date = get_panel_date_range(request)
 
-    # 1) Procesos previos (igual que la app que sí te funciona)
+    # 1) Último snapshot (se regenera en segundo plano tras las escrituras)
+    snapshot = None
     try:
-        regenerate_financial_tables(start_date, end_date)
+        snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
     except Exception as e:
         # No detengas el dashboard por errores de regeneración
         messages.warning(request, f"Advertencia en regeneración: {e}")
+    snapshot_calculado = snapshot.calculado if snapshot else None
+    snapshot_desactualizado = snapshot.desactualizado if snapshot else False
 
     # 2) Lee ResumenMensual ya actualizado
     qs = (
@@ -1432,6 +1229,8 @@ def dashboard(request):
             'panel_year': year,
             'panel_start_date': start_date,
             'panel_end_date': end_date,
+            'snapshot_calculado': snapshot_calculado,
+            'snapshot_desactualizado': snapshot_desactualizado,
         }
         return render(request, 'bronz_app/resumen_mensual.html', contexto)
 
@@ -1482,75 +1281,20 @@ def dashboard(request):
         'panel_year': year,
         'panel_start_date': start_date,
         'panel_end_date': end_date,
+        'snapshot_calculado': snapshot_calculado,
+        'snapshot_desactualizado': snapshot_desactualizado,
     })
 
 
 # ---------------------------------------------
 # ACTUALIZAR RESUMEN MENSUAL (igual a la app OK)
 # ---------------------------------------------
-CUENTAS_VENTAS = [3010101, 3010111]
-CUENTA_COSTO = [3010200, 3010201, 3010202, 3010203,3010205,3010211,3010212,3010213,3010214,3010215,3010216, 3020200,3010300,3010400,3020500,3020600,3020700,3020800,3020900,3030100]
 
 def actualizar_resumen_mensual(request):
-    # Regenera orígenes
+    # Regenera orígenes (la última etapa ya recalcula ResumenMensual si hubo cambios)
     year, start_date, end_date = get_panel_date_range(request)
     regenerate_financial_tables(start_date, end_date)
-
-    # Recalcula saldos por mes directamente desde los movimientos
-    saldos_mensuales = defaultdict(lambda: defaultdict(lambda: {'debitos': 0, 'creditos': 0}))
-
-    debitos = MovimientoUnificadoDebito.objects.annotate(
-        mes=TruncMonth('fecha')
-    ).values('mes', 'cta_debito').annotate(total=Sum('monto_debito'))
-
-    for row in debitos:
-        mes = row['mes']
-        cuenta = str(row['cta_debito'])
-        saldos_mensuales[mes][cuenta]['debitos'] += row['total'] or 0
-
-    creditos = MovimientoUnificadoCredito.objects.annotate(
-        mes=TruncMonth('fecha')
-    ).values('mes', 'cta_credito').annotate(total=Sum('monto_credito'))
-
-    for row in creditos:
-        mes = row['mes']
-        cuenta = str(row['cta_credito'])
-        saldos_mensuales[mes][cuenta]['creditos'] += row['total'] or 0
-
-    CUENTA_COSTO_STR = [str(c) for c in CUENTA_COSTO]
-    CUENTAS_VENTAS_STR = [str(c) for c in CUENTAS_VENTAS]
-
-    for mes, cuentas in saldos_mensuales.items():
-        ventas = sum(
-            cuentas.get(c, {}).get('creditos', 0) - cuentas.get(c, {}).get('debitos', 0)
-            for c in CUENTAS_VENTAS_STR
-        )
-        costo_venta = sum(
-            cuentas.get(c, {}).get('debitos', 0) - cuentas.get(c, {}).get('creditos', 0)
-            for c in CUENTA_COSTO_STR
-        )
-        utilidad = ventas - costo_venta
-        margen_bruto = utilidad
-
-        ResumenMensual.objects.update_or_create(
-            mes=mes,
-            defaults={
-                'ventas': ventas,
-                'costos': costo_venta,
-                'utilidad': utilidad,
-                'margen_bruto': margen_bruto
-            }
-        )
-
-    # Actualiza utilidad acumulada en BD
-    resumenes = ResumenMensual.objects.order_by('mes')
-    acumulado = 0
-    for r in resumenes:
-        acumulado += r.utilidad or 0
-        if r.utilidad_acumulada != acumulado:
-            r.utilidad_acumulada = acumulado
-            r.save(update_fields=['utilidad_acumulada'])
-
+    regenerar_resumen_mensual()
     return redirect('dashboard')
 
 # ————————————————————————————————————————————————————————
@@ -1683,9 +1427,9 @@ FILAS_CALCULADAS = [
 
 def tabla_resultados_mensual(request):
 
-     # Procesos previos (puedes incluir solo los necesarios para el financiero)
+    # Último snapshot (se regenera en segundo plano tras las escrituras)
     year, start_date, end_date = get_panel_date_range(request)
-    regenerate_financial_tables(start_date, end_date)
+    snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
 
     año = year
     mes_actual = end_date.month
@@ -1750,6 +1494,8 @@ def tabla_resultados_mensual(request):
         "panel_year": year,
         "panel_start_date": start_date,
         "panel_end_date": end_date,
+        "snapshot_calculado": snapshot.calculado,
+        "snapshot_desactualizado": snapshot.desactualizado,
     })
 
 
@@ -1760,11 +1506,9 @@ from bronz_app.utils_balance import calcular_resultados_mensuales
 def actualizar_resultados_mensuales(request):
     year, start_date, end_date = get_panel_date_range(request)
     try:
-        regenerate_financial_tables(start_date, end_date)
-        calcular_resultados_mensuales(año=year)
-        messages.success(request, f"Resultados detallados recalculados para {year}.")
+        _encolar_y_avisar(request, 'resultados_mensuales', año=year)
     except Exception as e:
-        messages.error(request, f"Error al recalcular resultados detallados: {e}")
+        messages.error(request, f"Error al encolar resultados detallados: {e}")
     return redirect('tabla_resultados_mensual')
 
 
@@ -1787,7 +1531,7 @@ import pandas as pd
 from .models import VentasConsulta, ResumenDebito, ResumenCredito
 from .utils import (regenerar_ventas_consulta, 
 )
-from .cod_cuentas_balance import balance_rows
+from .motor_balance import balance_resumenes
 
 
 # -----------------------------
@@ -1900,34 +1644,12 @@ def construir_resumen_tiendas(qs):
 # -----------------------------
 # Matriz de cuentas (gastos)
 # -----------------------------
-def obtener_matriz_dict():
+def obtener_matriz_dict(anio=None):
     """
-    Reconstruye los resúmenes y arma un diccionario de saldos por código para
-    poder mapear gastos tienda vía 'gasto_key' (p.ej., 'Pe:3010211').
+    Arma un diccionario de saldos por código (del año, o de todos si anio=None)
+    para poder mapear gastos tienda vía 'gasto_key' (p.ej., 'Pe:3010211').
     """
-    # Procesos previos (ajusta a lo indispensable si quieres rendimiento)
-
-    debitos_dict = {d.cuenta_debito: float(d.total_debito) for d in ResumenDebito.objects.all()}
-    creditos_dict = {c.cuenta_credito: float(c.total_credito) for c in ResumenCredito.objects.all()}
-
-    matriz_dict = {}
-    for fila in balance_rows:
-        codigo = str(fila["codigo"])
-        debito = debitos_dict.get(int(codigo), 0.0)
-        credito = creditos_dict.get(int(codigo), 0.0)
-        saldo_deudor = debito - credito if debito > credito else 0.0
-        saldo_acreedor = credito - debito if credito > debito else 0.0
-
-        # Activo/Pasivo
-        if 1010100 <= int(codigo) <= 2040000:
-            matriz_dict[f"A:{codigo}"] = saldo_deudor
-            matriz_dict[f"P:{codigo}"] = saldo_acreedor
-        # Patrimonio/Gastos
-        elif 3010100 <= int(codigo) <= 3010300:
-            matriz_dict[f"Pe:{codigo}"] = saldo_deudor
-            matriz_dict[f"G:{codigo}"] = saldo_acreedor
-
-    return matriz_dict
+    return balance_resumenes(anio).matriz_dict()
 
 
 # -----------------------------
@@ -1962,9 +1684,9 @@ def _acumular_por_tienda(queryset_ventas, keys_tiendas):
 @staff_member_required
 def resumen_ventas_tiendas_view(request):
     year, start_date, end_date = get_panel_date_range(request)
-    regenerate_financial_tables(start_date, end_date)
+    snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
 
-    matriz_dict = obtener_matriz_dict()
+    matriz_dict = snapshot.matriz
     ventas = VentasConsulta.objects.filter(fecha__gte=start_date, fecha__lte=end_date)
 
     datos_por_tienda, total_ventas, total_costo = _acumular_por_tienda(ventas, TIENDAS)
@@ -2020,6 +1742,8 @@ def resumen_ventas_tiendas_view(request):
         "panel_year": year,
         "panel_start_date": start_date,
         "panel_end_date": end_date,
+        "snapshot_calculado": snapshot.calculado,
+        "snapshot_desactualizado": snapshot.desactualizado,
     })
 
 
@@ -2029,9 +1753,9 @@ def resumen_ventas_tiendas_view(request):
 @staff_member_required
 def exportar_resumen_ventas_tiendas_excel(request):
     year, start_date, end_date = get_panel_date_range(request)
-    regenerate_financial_tables(start_date, end_date)
+    snapshot = obtener_snapshot(year, refrescar=bool(request.GET.get('refrescar')))
 
-    matriz_dict = obtener_matriz_dict()
+    matriz_dict = snapshot.matriz
     ventas = VentasConsulta.objects.filter(fecha__gte=start_date, fecha__lte=end_date)
 
     datos_por_tienda, total_ventas, total_costo = _acumular_por_tienda(ventas, TIENDAS)
@@ -2103,3 +1827,41 @@ def chatbot_view(request):
 def ventas_dashboard_view(request):
     """Vista para mostrar el dashboard de ventas Shopify."""
     return render(request, "bronz_app/ventas_dashboard.html")
+
+
+# ============================================
+# Métricas del coordinador de regeneración
+# ============================================
+
+@staff_member_required
+def metricas_regeneracion_view(request):
+    """Contadores de regeneraciones ejecutadas / coalescidas (JSON)."""
+    return JsonResponse(metricas_regeneracion())
+
+
+# ============================================
+# Trabajos en segundo plano: estado y avisos
+# ============================================
+
+from django.shortcuts import get_object_or_404
+from .models import TrabajoFondo
+
+@login_required
+def estado_trabajo(request, pk):
+    """Estado/progreso de un trabajo (JSON) para el aviso de home."""
+    trabajo = get_object_or_404(TrabajoFondo, pk=pk)
+    return JsonResponse(trabajo_a_dict(trabajo))
+
+
+@login_required
+def trabajos_recientes(request):
+    """Últimos trabajos del usuario (JSON)."""
+    trabajos = TrabajoFondo.objects.filter(usuario=request.user).order_by('-creado')[:20]
+    return JsonResponse([trabajo_a_dict(t) for t in trabajos], safe=False)
+
+
+@login_required
+def cerrar_aviso_trabajo(request, pk):
+    if request.method == 'POST':
+        TrabajoFondo.objects.filter(pk=pk, usuario=request.user).update(visto=True)
+    return redirect('home')
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, IntegerField, Value
+
+from bronz_app.models import MovimientoUnificadoCredito, MovimientoUnificadoDebito
+
+# Backend opcional para PostgreSQL: union_debitos y union_creditos pasan a ser
+# vistas materializadas sobre las tablas fuente y se actualizan con
+# REFRESH MATERIALIZED VIEW CONCURRENTLY (los lectores nunca ven la unión vacía).
+
+MODELOS_UNION = (MovimientoUnificadoDebito, MovimientoUnificadoCredito)
+
+# id estable = parte * FACTOR_ID + pk de la fila origen (requerido por el índice único)
+FACTOR_ID = 10_000_000_000
+
+
+def usar_vistas_materializadas(using=DEFAULT_DB_ALIAS):
+    return (
+        getattr(settings, 'BRONZ_UNION_BACKEND', 'tabla') == 'vista_materializada'
+        and connections[using].vendor == 'postgresql'
+    )
+
+
+def es_vista_materializada(modelo, using=DEFAULT_DB_ALIAS):
+    """True si la unión de `modelo` está instalada como vista materializada y el setting la habilita."""
+    if modelo not in MODELOS_UNION or not usar_vistas_materializadas(using):
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_matviews WHERE matviewname = %s", [modelo._meta.db_table])
+        return cursor.fetchone() is not None
+
+
+def _definicion(modelo):
+    from bronz_app.utils import COLUMNAS_CREDITO, COLUMNAS_DEBITO, partes_credito, partes_debito
+
+    if modelo is MovimientoUnificadoDebito:
+        partes, columnas = partes_debito(), COLUMNAS_DEBITO
+    else:
+        partes, columnas = partes_credito(), COLUMNAS_CREDITO
+
+    con_clave = [
+        qs.annotate(parte=Value(i, output_field=IntegerField()), origen_id=F('pk'))
+        for i, qs in enumerate(partes, start=1)
+    ]
+    primera, *resto = con_clave
+    return primera.union(*resto, all=True), columnas
+
+
+def sql_vista(modelo, using=DEFAULT_DB_ALIAS):
+    """SELECT (sin parámetros) que define la vista materializada de `modelo`."""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    union_qs, columnas = _definicion(modelo)
+    select_sql, params = union_qs.query.get_compiler(using=using).as_sql()
+    lista = ', '.join(f"u.{qn(c)}" for c in columnas)
+    sql = (
+        f"SELECT (u.parte::bigint * {FACTOR_ID} + u.origen_id) AS id, {lista} "
+        f"FROM ({select_sql}) AS u"
+    )
+    return connection.ops.compose_sql(sql, params)
+
+
+def crear_vista_materializada(modelo, using=DEFAULT_DB_ALIAS):
+    """Reemplaza la tabla de `modelo` por una vista materializada con índice único en id."""
+    connection = connections[using]
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    nombre = modelo._meta.db_table
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+            cursor.execute(f"CREATE MATERIALIZED VIEW {tabla} AS {sql_vista(modelo, using)}")
+            cursor.execute(f'CREATE UNIQUE INDEX "{nombre}_mv_id" ON {tabla} (id)')
+        # Los mismos índices (fecha, cuenta+fecha) que tiene la tabla normal
+        with connection.schema_editor() as schema_editor:
+            for indice in modelo._meta.indexes:
+                schema_editor.add_index(modelo, indice)
+
+
+def eliminar_vista_materializada(modelo, using=DEFAULT_DB_ALIAS):
+    """Vuelve al backend de tabla: borra la vista y recrea la tabla vacía (correr procesar_todo después)."""
+    connection = connections[using]
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {tabla}")
+        with connection.schema_editor() as editor:
+            editor.create_model(modelo)
+
+
+def refrescar_vista_materializada(modelo, using=DEFAULT_DB_ALIAS):
+    """REFRESH … CONCURRENTLY: los lectores siguen viendo la versión anterior mientras tanto."""
+    connection = connections[using]
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {tabla}")
+        cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+        return cursor.fetchone()[0]
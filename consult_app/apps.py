@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ConsultasAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'consult_app'
+
+    def ready(self):
+        from consult_app.cierres_stock import conectar_senales
+        conectar_senales()
@@ -0,0 +1,415 @@
+# consult_app/cierres_stock.py
+
+import threading
+import zlib
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import ExtractMonth, ExtractYear, Lower, Trim
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from bronz_app.kits import explotar_ventas
+from bronz_app.models import ComponenteKit, EntradaProductos, Kit, Ventas
+from bronz_app.rangos_sucios import al_cerrar_lote, en_lote
+from consult_app.models import (
+    AjusteInventarioTienda,
+    BodegaTienda,
+    CierreStockTienda,
+    EnviosATiendas,
+    InventarioInicialTiendas,
+)
+
+# IDs de respaldo si la tienda no existe por nombre en BodegaTienda
+IDS_RESPALDO = {
+    "Oficina": 1,
+    "Falabella": 2,
+    "Tienda3": 3,
+    "Tienda4": 4,
+    "Bodega": 5,  # Bodega es una tienda más (vende online)
+    "Otro": 6,
+}
+
+# Compradores que se atienden desde Bodega (venta online)
+COMPRADORES_BODEGA = ["", "nan", "shopify", "uber eats", "ubereats", "mercado libre"]
+
+# Advisory lock de PostgreSQL para escribir cierres (ver _bloquear_cierres)
+CLAVE_CANDADO = zlib.crc32(b"consult_app.cierres_stock")
+
+MODELOS_FUENTE = (InventarioInicialTiendas, EnviosATiendas, AjusteInventarioTienda, EntradaProductos, Ventas)
+
+
+def resolver_ids(tiendas):
+    """{nombre de referencia: id} desde la lista de tiendas ya leída (sin consultas por nombre)."""
+    por_nombre = {}
+    for t in sorted(tiendas, key=lambda t: t["nombre"]):
+        por_nombre.setdefault(t["nombre"].lower(), t["id"])
+    return {nombre: por_nombre.get(nombre.lower()) or respaldo for nombre, respaldo in IDS_RESPALDO.items()}
+
+
+def _fuentes(ids):
+    """
+    concepto → (queryset, expresión de tienda, expresión de SKU, cantidad a sumar).
+    Los conceptos de Oficina van a su ID; el consumo explota las ventas de kits
+    en sus componentes (join con la lista de materiales).
+    """
+    oficina = Value(ids["Oficina"], output_field=IntegerField())
+    tienda_venta = Case(
+        When(comprador__isnull=True, then=Value(ids["Bodega"])),
+        When(comp_norm__in=COMPRADORES_BODEGA, then=Value(ids["Bodega"])),
+        When(Q(comp_norm__contains="falabella"), then=Value(ids["Falabella"])),
+        When(comp_norm="tienda3", then=Value(ids["Tienda3"])),
+        When(comp_norm="tienda4", then=Value(ids["Tienda4"])),
+        default=Value(ids["Otro"]),
+        output_field=IntegerField(),
+    )
+    ventas = Ventas.objects.annotate(comp_norm=Lower(Trim("comprador")))
+    sku = F("sku")
+    return {
+        CierreStockTienda.INICIAL: (InventarioInicialTiendas.objects.all(), F("tienda_id"), sku, "cantidad"),
+        CierreStockTienda.RECIBIDO: (EnviosATiendas.objects.all(), F("tienda_bodega_id"), sku, "cantidad"),
+        CierreStockTienda.ENVIADO: (EnviosATiendas.objects.all(), oficina, sku, "cantidad"),
+        CierreStockTienda.ENTRADAS: (EntradaProductos.objects.all(), oficina, sku, "cantidad_ingresada"),
+        CierreStockTienda.VENTAS: (ventas, tienda_venta, sku, "cantidad"),
+        CierreStockTienda.AJUSTES: (AjusteInventarioTienda.objects.all(), F("tienda_id"), sku, "cantidad"),
+        CierreStockTienda.CONSUMO: (explotar_ventas(ventas), tienda_venta, F("componente"), "consumo"),
+    }
+
+
+# ——————————————————————————————————————————————————————————————
+# FECHAS DE CIERRE
+# ——————————————————————————————————————————————————————————————
+
+def _a_fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _fin_de_mes(anio, mes):
+    return date(anio, mes, monthrange(anio, mes)[1])
+
+
+def _cierre_anterior(fecha):
+    """Último fin de mes <= fecha."""
+    fin = _fin_de_mes(fecha.year, fecha.month)
+    return fin if fin == fecha else fecha.replace(day=1) - timedelta(days=1)
+
+
+def _cierres_entre(desde, hasta):
+    """Fines de mes desde el mes de `desde` hasta `hasta` (ambos fin de mes)."""
+    fin = _fin_de_mes(desde.year, desde.month)
+    while fin <= hasta:
+        yield fin
+        siguiente = fin + timedelta(days=1)
+        fin = _fin_de_mes(siguiente.year, siguiente.month)
+
+
+# ——————————————————————————————————————————————————————————————
+# LECTURA DE MOVIMIENTOS Y CIERRES
+# ——————————————————————————————————————————————————————————————
+
+def _movimientos(ids, desde, hasta, por_mes=False):
+    """
+    Sumas de movimientos en (desde, hasta] (desde=None: desde el inicio), una
+    consulta por concepto. Devuelve {periodo: {concepto: {(tienda_id, sku): cantidad}}}
+    con periodo (año, mes) si por_mes, o None.
+    """
+    resultado = defaultdict(lambda: defaultdict(dict))
+    for concepto, (qs, tienda, sku_mov, campo) in _fuentes(ids).items():
+        qs = qs.filter(fecha__lte=hasta)
+        if desde is not None:
+            qs = qs.filter(fecha__gt=desde)
+        qs = qs.annotate(id_tienda=tienda, sku_mov=sku_mov)
+        if por_mes:
+            filas = (
+                qs.annotate(anio_mov=ExtractYear("fecha"), mes_mov=ExtractMonth("fecha"))
+                .values_list("anio_mov", "mes_mov", "id_tienda", "sku_mov")
+                .annotate(total=Sum(campo))
+                .order_by()
+            )
+            for anio, mes, tienda_id, sku, total in filas:
+                resultado[(anio, mes)][concepto][(tienda_id, sku)] = total or 0
+        else:
+            filas = qs.values_list("id_tienda", "sku_mov").annotate(total=Sum(campo)).order_by()
+            for tienda_id, sku, total in filas:
+                resultado[None][concepto][(tienda_id, sku)] = total or 0
+    return resultado
+
+
+def _vacio():
+    return {concepto: {} for concepto, _ in CierreStockTienda.CONCEPTOS}
+
+
+def _sumar(acumulado, movimientos):
+    for concepto, filas in movimientos.items():
+        destino = acumulado[concepto]
+        for clave, cantidad in filas.items():
+            destino[clave] = destino.get(clave, 0) + cantidad
+
+
+def _leer_cierre(fecha_cierre):
+    acumulado = _vacio()
+    filas = CierreStockTienda.objects.filter(fecha_cierre=fecha_cierre).values_list("concepto", "tienda_id", "sku", "cantidad")
+    for concepto, tienda_id, sku, cantidad in filas:
+        acumulado[concepto][(tienda_id, sku)] = cantidad
+    return acumulado
+
+
+def _bloquear_cierres():
+    """
+    Serializa, hasta el fin de la transacción, quien escribe cierres: dos
+    ajustes simultáneos no deben sumar dos veces la misma diferencia ni un
+    cierre nuevo partir de uno a medio ajustar. SQLite ya serializa las escrituras.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CLAVE_CANDADO])
+
+
+def _ultimo_cierre(hasta=None):
+    qs = CierreStockTienda.objects.all()
+    if hasta is not None:
+        qs = qs.filter(fecha_cierre__lte=hasta)
+    return qs.aggregate(m=Max("fecha_cierre"))["m"]
+
+
+def _construir_cierres(ids, hasta):
+    """
+    Crea los cierres de cada fin de mes después del último existente hasta
+    `hasta` (sin ninguno: desde el inicio) con una pasada agrupada por mes. Los
+    meses sin movimientos repiten el cierre anterior. Devuelve el acumulado a `hasta`.
+    """
+    with transaction.atomic():
+        _bloquear_cierres()
+        ultimo = _ultimo_cierre()
+        if ultimo is not None and ultimo >= hasta:
+            return _leer_cierre(hasta)  # otra consulta los creó mientras se esperaba el candado
+        acumulado = _leer_cierre(ultimo) if ultimo else _vacio()
+        por_mes = _movimientos(ids, ultimo, hasta, por_mes=True)
+        if ultimo:
+            desde = ultimo + timedelta(days=1)
+        elif por_mes:
+            desde = date(*min(por_mes), 1)
+        else:
+            return acumulado  # sin historia todavía
+
+        nuevos = []
+        for fin in _cierres_entre(desde, hasta):
+            _sumar(acumulado, por_mes.get((fin.year, fin.month), {}))
+            nuevos += [
+                CierreStockTienda(fecha_cierre=fin, concepto=concepto, tienda_id=tienda_id, sku=sku, cantidad=cantidad)
+                for concepto, filas in acumulado.items()
+                for (tienda_id, sku), cantidad in filas.items()
+            ]
+        # ignore_conflicts: sin candado (SQLite) dos consultas pueden crear el mismo mes, con los mismos valores
+        CierreStockTienda.objects.bulk_create(nuevos, batch_size=2000, ignore_conflicts=True)
+    return acumulado
+
+
+def acumulados_al(fecha_corte, ids):
+    """
+    {concepto: {(tienda_id, sku): cantidad}} acumulado desde el inicio hasta
+    fecha_corte: el cierre mensual anterior (una lectura, sin importar el largo
+    de la historia) más los movimientos del mes en curso.
+
+    Escritura diferida: los cierres se mantienen al escribir movimientos
+    (actualizar_cierres), pero los de meses posteriores al último cierre
+    (meses nuevos, la primera consulta o tras invalidarlos todos) se crean
+    aquí, desde el último cierre existente.
+    """
+    cierre = _cierre_anterior(fecha_corte)
+    if _ultimo_cierre(cierre) == cierre:
+        acumulado = _leer_cierre(cierre)
+    else:
+        acumulado = _construir_cierres(ids, cierre)
+    if fecha_corte > cierre:
+        _sumar(acumulado, _movimientos(ids, cierre, fecha_corte)[None])
+    return acumulado
+
+
+# ——————————————————————————————————————————————————————————————
+# ACTUALIZACIÓN AL ESCRIBIR MOVIMIENTOS
+# ——————————————————————————————————————————————————————————————
+
+def _por_claves(claves):
+    condicion = Q()
+    for concepto, (tienda_id, sku) in claves:
+        condicion |= Q(concepto=concepto, tienda_id=tienda_id, sku=sku)
+    return condicion
+
+
+def _lotes(items, tamano=500):
+    items = list(items)
+    for i in range(0, len(items), tamano):
+        yield items[i:i + tamano]
+
+
+def _ajustar_mes(ids, fin, ultimo):
+    """
+    Lleva a los cierres el cambio de movimientos del mes `fin`. Recalcula el
+    movimiento neto del mes (una pasada acotada a ese mes), lo compara con el
+    que reflejan los cierres (cierre del mes - cierre anterior) y suma la
+    diferencia de cada clave a todos los cierres >= fin con un UPDATE. Una
+    clave que aparece crea sus filas hasta su primer cierre existente; una que
+    desaparece (sin movimientos hasta ese mes) se borra hasta su próximo movimiento.
+    """
+    anterior = fin.replace(day=1) - timedelta(days=1)
+    base, actual = _leer_cierre(anterior), _leer_cierre(fin)
+    nuevo = _movimientos(ids, anterior, fin)[None]
+
+    diferencias, aparecen, desaparecen = {}, {}, set()
+    for concepto, _ in CierreStockTienda.CONCEPTOS:
+        previo, cierre, mes = base[concepto], actual[concepto], nuevo.get(concepto, {})
+        for clave in set(cierre) | set(mes):
+            diferencia = mes.get(clave, 0) - (cierre.get(clave, 0) - previo.get(clave, 0))
+            if diferencia:
+                diferencias[(concepto, clave)] = diferencia
+            if clave not in cierre:
+                aparecen[(concepto, clave)] = mes[clave]
+            elif clave not in previo and clave not in mes:
+                desaparecen.add((concepto, clave))
+
+    for lote in _lotes(diferencias.items()):
+        casos = [
+            When(Q(concepto=concepto, tienda_id=tienda_id, sku=sku), then=F("cantidad") + diferencia)
+            for (concepto, (tienda_id, sku)), diferencia in lote
+        ]
+        CierreStockTienda.objects.filter(_por_claves(c for c, _ in lote), fecha_cierre__gte=fin).update(
+            cantidad=Case(*casos, default=F("cantidad"), output_field=IntegerField())
+        )
+
+    if aparecen:
+        # Hasta el primer cierre posterior que ya la tenga (esos recibieron la diferencia arriba)
+        primeros = {}
+        for lote in _lotes(aparecen):
+            filas = (
+                CierreStockTienda.objects.filter(_por_claves(lote), fecha_cierre__gt=fin)
+                .values_list("concepto", "tienda_id", "sku")
+                .annotate(primero=Min("fecha_cierre"))
+                .order_by()
+            )
+            primeros.update({(concepto, (tienda_id, sku)): primero for concepto, tienda_id, sku, primero in filas})
+        CierreStockTienda.objects.bulk_create(
+            [
+                CierreStockTienda(fecha_cierre=mes, concepto=concepto, tienda_id=tienda_id, sku=sku, cantidad=cantidad)
+                for (concepto, (tienda_id, sku)), cantidad in aparecen.items()
+                for mes in _cierres_entre(fin, ultimo)
+                if mes < primeros.get((concepto, (tienda_id, sku)), date.max)
+            ],
+            batch_size=2000,
+        )
+
+    if desaparecen:
+        # Caso raro (se borró o movió el primer movimiento de la clave): busca su próximo movimiento
+        por_mes = _movimientos(ids, fin, ultimo, por_mes=True)
+        borrar = Q()
+        for concepto, clave in desaparecen:
+            meses = [date(*periodo, 1) for periodo, conceptos in por_mes.items() if clave in conceptos.get(concepto, {})]
+            hasta = min(meses) - timedelta(days=1) if meses else ultimo
+            borrar |= _por_claves([(concepto, clave)]) & Q(fecha_cierre__gte=fin, fecha_cierre__lte=hasta)
+        CierreStockTienda.objects.filter(borrar).delete()
+
+
+def actualizar_cierres(meses):
+    """Ajusta los cierres existentes por los movimientos cambiados en los meses dados (fines de mes)."""
+    with transaction.atomic():
+        _bloquear_cierres()
+        ultimo = _ultimo_cierre()
+        meses = sorted(m for m in meses if ultimo is not None and m <= ultimo)
+        if not meses:
+            return  # los meses aún sin cierre se crean al consultarlos
+        ids = resolver_ids(list(BodegaTienda.objects.values("id", "nombre")))
+        for fin in meses:
+            _ajustar_mes(ids, fin, ultimo)
+
+
+# ——————————————————————————————————————————————————————————————
+# INVALIDACIÓN
+# ——————————————————————————————————————————————————————————————
+
+# Fines de mes a ajustar dentro de agrupar_rangos_sucios(), por hilo (None: borrar todos)
+_pendientes = threading.local()
+
+
+def invalidar_cierres(desde=None, hasta=None):
+    """
+    Ajusta los cierres por movimientos cambiados en [desde, hasta] (hasta=None:
+    solo el día `desde`). Sin fechas borra todos los cierres (cambió cómo se
+    clasifican los movimientos) y se reconstruyen en la próxima consulta.
+    """
+    desde = _a_fecha(desde)
+    if desde is None:
+        _invalidar_meses(None)
+        return
+    hasta = _a_fecha(hasta) or desde
+    _invalidar_meses(set(_cierres_entre(desde, _fin_de_mes(hasta.year, hasta.month))))
+
+
+def _invalidar_meses(meses):
+    """Dentro de agrupar_rangos_sucios() los meses se acumulan y se ajustan una vez al cierre del bloque."""
+    if en_lote():
+        previos = getattr(_pendientes, "meses", set())
+        _pendientes.meses = None if previos is None or meses is None else previos | meses
+        return
+    _aplicar(meses)
+
+
+def _invalidar_pendientes():
+    meses, _pendientes.meses = getattr(_pendientes, "meses", set()), set()
+    if meses is None or meses:
+        _aplicar(meses)
+
+
+al_cerrar_lote(_invalidar_pendientes, orden=30)
+
+
+def _aplicar(meses):
+    if meses is None:
+        CierreStockTienda.objects.all().delete()
+    else:
+        actualizar_cierres(meses)
+
+
+def _mes(fecha):
+    fecha = _a_fecha(fecha)
+    return _fin_de_mes(fecha.year, fecha.month)
+
+
+def _antes_de_guardar(sender, instance, raw=False, **kwargs):
+    # Si se mueve la fecha de un registro existente, su mes anterior también cambia.
+    # Se ajusta después de guardar: aquí la fila aún tiene los valores antiguos.
+    if raw or instance.pk is None:
+        return
+    fecha_anterior = sender.objects.filter(pk=instance.pk).values_list("fecha", flat=True).first()
+    instance._mes_cierre_anterior = _mes(fecha_anterior) if fecha_anterior else None
+
+
+def _despues_de_guardar(sender, instance, **kwargs):
+    meses = {_mes(instance.fecha)}
+    anterior = getattr(instance, "_mes_cierre_anterior", None)
+    if anterior:
+        meses.add(anterior)
+    _invalidar_meses(meses)
+
+
+def _despues_de_borrar(sender, instance, **kwargs):
+    _invalidar_meses({_mes(instance.fecha)})
+
+
+def _invalidar_todo(sender, instance, **kwargs):
+    # Los nombres de tienda definen cómo se clasifican las ventas y la lista de
+    # materiales cuánto consume cada venta de kit: cambian todos los cierres
+    invalidar_cierres()
+
+
+def conectar_senales():
+    for modelo in MODELOS_FUENTE:
+        uid = f"cierres_stock_{modelo.__name__}"
+        pre_save.connect(_antes_de_guardar, sender=modelo, dispatch_uid=f"{uid}_pre")
+        post_save.connect(_despues_de_guardar, sender=modelo, dispatch_uid=f"{uid}_post")
+        post_delete.connect(_despues_de_borrar, sender=modelo, dispatch_uid=f"{uid}_del")
+    for modelo in (BodegaTienda, Kit, ComponenteKit):
+        uid = f"cierres_stock_{modelo.__name__}"
+        post_save.connect(_invalidar_todo, sender=modelo, dispatch_uid=f"{uid}_post")
+        post_delete.connect(_invalidar_todo, sender=modelo, dispatch_uid=f"{uid}_del")
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consult_app', '0001_initial'),
+    ]
+
+    operations = [
+        # Sin RunPython: los cierres se construyen en la primera consulta del informe
+        migrations.CreateModel(
+            name='CierreStockTienda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_cierre', models.DateField(verbose_name='Fecha de cierre')),
+                ('concepto', models.CharField(choices=[('inicial', 'Stock inicial'), ('recibido', 'Recibido desde Oficina'), ('enviado', 'Enviado por Oficina'), ('entradas', 'Entradas en Oficina'), ('ventas', 'Ventas'), ('ajustes', 'Ajustes')], max_length=10)),
+                ('tienda_id', models.IntegerField(verbose_name='Tienda')),
+                ('sku', models.CharField(max_length=6, verbose_name='SKU')),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Cierre de Stock Tienda',
+                'verbose_name_plural': 'Cierres de Stock Tienda',
+                'db_table': 'cierre_stock_tienda',
+                'unique_together': {('fecha_cierre', 'concepto', 'tienda_id', 'sku')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def vaciar_cierres(apps, schema_editor):
+    # Los cierres existentes no tienen el concepto 'consumo': se reconstruyen en la próxima consulta
+    CierreStockTienda = apps.get_model('consult_app', 'CierreStockTienda')
+    CierreStockTienda.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consult_app', '0002_cierrestocktienda'),
+        ('bronz_app', '0028_kits'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cierrestocktienda',
+            name='concepto',
+            field=models.CharField(choices=[('inicial', 'Stock inicial'), ('recibido', 'Recibido desde Oficina'), ('enviado', 'Enviado por Oficina'), ('entradas', 'Entradas en Oficina'), ('ventas', 'Ventas'), ('ajustes', 'Ajustes'), ('consumo', 'Consumo por ventas de kits')], max_length=10),
+        ),
+        migrations.RunPython(vaciar_cierres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def vaciar_cierres(apps, schema_editor):
+    # Los cierres existentes son acumulados, no movimientos del mes: se recalculan en la próxima consulta
+    CierreStockTienda = apps.get_model('consult_app', 'CierreStockTienda')
+    CierreStockTienda.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consult_app', '0003_cierre_consumo_kits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MesCierreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_cierre', models.DateField(unique=True, verbose_name='Fecha de cierre')),
+                ('vigente', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Mes de Cierre de Stock',
+                'verbose_name_plural': 'Meses de Cierre de Stock',
+                'db_table': 'mes_cierre_stock',
+            },
+        ),
+        migrations.RunPython(vaciar_cierres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def vaciar_cierres(apps, schema_editor):
+    # Los cierres vuelven a ser acumulados (0004 los dejó como movimientos del mes): se reconstruyen en la próxima consulta
+    CierreStockTienda = apps.get_model('consult_app', 'CierreStockTienda')
+    CierreStockTienda.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consult_app', '0004_mescierrestock'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='MesCierreStock',
+        ),
+        migrations.RunPython(vaciar_cierres, migrations.RunPython.noop),
+    ]
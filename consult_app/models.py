@@ -164,6 +164,51 @@ class AjusteInventarioTienda(models.Model):
     def __str__(self):
         return f"{self.fecha} | {self.sku.sku} | {self.tienda} | {self.cantidad:+d}"
 
+#_______________________________________________________________
+# CIERRES MENSUALES DE STOCK POR TIENDA
+#_______________________________________________________________
+
+class CierreStockTienda(models.Model):
+    """
+    Acumulado de cada concepto del informe de inventario por tienda al cierre de
+    un mes (desde el inicio de la historia). Tabla derivada: un movimiento nuevo,
+    modificado o borrado suma su diferencia a los cierres desde su mes; los meses
+    posteriores al último cierre se crean al consultarlos.
+    """
+    INICIAL = 'inicial'
+    RECIBIDO = 'recibido'
+    ENVIADO = 'enviado'
+    ENTRADAS = 'entradas'
+    VENTAS = 'ventas'
+    AJUSTES = 'ajustes'
+    CONSUMO = 'consumo'
+    CONCEPTOS = [
+        (INICIAL, 'Stock inicial'),
+        (RECIBIDO, 'Recibido desde Oficina'),
+        (ENVIADO, 'Enviado por Oficina'),
+        (ENTRADAS, 'Entradas en Oficina'),
+        (VENTAS, 'Ventas'),
+        (AJUSTES, 'Ajustes'),
+        (CONSUMO, 'Consumo por ventas de kits'),
+    ]
+
+    fecha_cierre = models.DateField(verbose_name="Fecha de cierre")
+    concepto = models.CharField(max_length=10, choices=CONCEPTOS)
+    # Sin FK: las ventas se clasifican con IDs de respaldo que pueden no existir en BodegaTienda
+    tienda_id = models.IntegerField(verbose_name="Tienda")
+    sku = models.CharField(max_length=6, verbose_name="SKU")
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "cierre_stock_tienda"
+        verbose_name = "Cierre de Stock Tienda"
+        verbose_name_plural = "Cierres de Stock Tienda"
+        unique_together = ('fecha_cierre', 'concepto', 'tienda_id', 'sku')
+
+    def __str__(self):
+        return f"{self.fecha_cierre} | {self.concepto} | {self.tienda_id} | {self.sku} | {self.cantidad}"
+
+
 # ——————————————————————————————————————————————————————————————
 # TABLA Proyección de Ventas (para comparativa anual)
 # ——————————————————————————————————————————————————————————————
@@ -1,3 +1,161 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from bronz_app.models import Catalogo, EntradaProductos, Ventas
+from bronz_app.rangos_sucios import agrupar_rangos_sucios
+from consult_app.cierres_stock import _leer_cierre, _movimientos, _sumar, _vacio, acumulados_al, resolver_ids
+from consult_app.models import (
+    AjusteInventarioTienda,
+    BodegaTienda,
+    CierreStockTienda,
+    EnviosATiendas,
+    InventarioInicialTiendas,
+)
+
+CORTES = [
+    date(2023, 12, 31), date(2024, 1, 31), date(2024, 2, 14), date(2024, 3, 31),
+    date(2024, 6, 30), date(2024, 9, 17), date(2025, 1, 31),
+]
+
+
+# ——————————————————————————————————————————————————————————————
+# CIERRES MENSUALES DE STOCK POR TIENDA
+# ——————————————————————————————————————————————————————————————
+
+class CierresStockTests(TestCase):
+    """acumulados_al con cierres (también tras ajustarlos al escribir) == la suma de todos los movimientos, sin cierres."""
+
+    def setUp(self):
+        self.productos = [
+            Catalogo.objects.create(
+                sku=sku, fecha_ingreso=date(2024, 1, 1), categoria='Aros', producto=f'Producto {sku}',
+                numero_lote='1', costo_promedio_neto=Decimal('100'),
+            )
+            for sku in ('BB0101', 'BB0102')
+        ]
+        self.tiendas = [BodegaTienda.objects.create(nombre=n) for n in ('Oficina', 'Falabella', 'Tienda3', 'Bodega')]
+        aro, collar = self.productos
+        oficina, falabella, tienda3, _ = self.tiendas
+        with agrupar_rangos_sucios():
+            for mes in range(1, 9):
+                InventarioInicialTiendas.objects.create(fecha=date(2024, mes, 1), sku=aro, tienda=falabella, cantidad=mes)
+                EntradaProductos.objects.create(
+                    fecha=date(2024, mes, 2), sku=collar, cantidad_ingresada=10, costo_con_iva=Decimal('119'),
+                )
+                EnviosATiendas.objects.create(fecha=date(2024, mes, 5), sku=collar, tienda_bodega=tienda3, cantidad=3)
+                Ventas.objects.create(
+                    fecha=date(2024, mes, 9), sku=aro, cantidad=1, valor_unitario_venta=1190,
+                    comprador='Falabella SA' if mes % 2 else 'tienda3',
+                )
+                AjusteInventarioTienda.objects.create(fecha=date(2024, mes, 20), sku=collar, tienda=oficina, cantidad=-1)
+
+    def ids(self):
+        return resolver_ids(list(BodegaTienda.objects.values('id', 'nombre')))
+
+    def sin_cierres(self, corte):
+        acumulado = _vacio()
+        _sumar(acumulado, _movimientos(self.ids(), None, corte)[None])
+        return acumulado
+
+    def assertIgualSinCierres(self):
+        for corte in CORTES:
+            with self.subTest(corte=corte):
+                self.assertEqual(acumulados_al(corte, self.ids()), self.sin_cierres(corte))
+
+    def cierres(self):
+        return sorted(set(CierreStockTienda.objects.values_list('fecha_cierre', flat=True)))
+
+    def assertCierresAjustados(self, cierres):
+        """Los cierres ya guardados, ajustados al escribir (sin borrar ni reconstruir meses), valen lo mismo que sin cierres."""
+        self.assertEqual(self.cierres(), cierres)
+        for fin in cierres:
+            with self.subTest(cierre=fin):
+                self.assertEqual(_leer_cierre(fin), self.sin_cierres(fin))
+
+    def test_primera_consulta_construye_los_cierres(self):
+        self.assertIgualSinCierres()
+        self.assertEqual(self.cierres()[0], date(2024, 1, 31))
+        self.assertEqual(self.cierres()[-1], date(2025, 1, 31))
+
+    def test_lectura_del_cierre_no_depende_del_largo_de_la_historia(self):
+        self.assertIgualSinCierres()
+        ids = self.ids()
+        # Último cierre <= corte y sus filas: sin movimientos del mes en curso ni suma sobre meses
+        with self.assertNumQueries(2):
+            acumulados_al(date(2024, 12, 31), ids)
+
+    def test_envio_retroactivo_ajusta_los_cierres_posteriores(self):
+        self.assertIgualSinCierres()
+        cierres = self.cierres()
+        _, collar = self.productos
+        _, falabella, _, _ = self.tiendas
+
+        EnviosATiendas.objects.create(fecha=date(2024, 3, 3), sku=collar, tienda_bodega=falabella, cantidad=7)
+        self.assertCierresAjustados(cierres)
+        self.assertIgualSinCierres()
+
+    def test_edicion_movimiento_y_borrado(self):
+        self.assertIgualSinCierres()
+        cierres = self.cierres()
+        aro, collar = self.productos
+
+        envio = EnviosATiendas.objects.get(fecha=date(2024, 6, 5))
+        envio.cantidad = 9
+        envio.save()
+        self.assertCierresAjustados(cierres)
+
+        # Mover a un mes anterior ajusta el mes de origen y el de destino
+        envio.fecha = date(2024, 2, 20)
+        envio.save()
+        self.assertCierresAjustados(cierres)
+
+        # Otro comprador: la venta pasa a otra tienda
+        venta = Ventas.objects.get(fecha=date(2024, 3, 9))
+        venta.comprador = 'nan'
+        venta.save()
+        self.assertCierresAjustados(cierres)
+
+        AjusteInventarioTienda.objects.filter(fecha=date(2024, 4, 20)).delete()
+        Ventas.objects.get(fecha=date(2024, 5, 9)).delete()
+        self.assertCierresAjustados(cierres)
+        self.assertIgualSinCierres()
+
+    def test_clave_nueva_y_clave_que_desaparece(self):
+        self.assertIgualSinCierres()
+        cierres = self.cierres()
+        aro, collar = self.productos
+        _, _, _, bodega = self.tiendas
+
+        # Primera vez de (Bodega, aro) en marzo y otra vez en junio
+        marzo = AjusteInventarioTienda.objects.create(fecha=date(2024, 3, 10), sku=aro, tienda=bodega, cantidad=4)
+        AjusteInventarioTienda.objects.create(fecha=date(2024, 6, 10), sku=aro, tienda=bodega, cantidad=-1)
+        self.assertCierresAjustados(cierres)
+
+        # Sin el de marzo la clave no existe hasta junio
+        marzo.delete()
+        self.assertCierresAjustados(cierres)
+        self.assertNotIn((bodega.id, 'BB0101'), _leer_cierre(date(2024, 5, 31))['ajustes'])
+
+    def test_lote_ajusta_varios_meses(self):
+        self.assertIgualSinCierres()
+        cierres = self.cierres()
+        with agrupar_rangos_sucios():
+            for envio in EnviosATiendas.objects.filter(fecha__month__in=[2, 5, 7]):
+                envio.cantidad += 2
+                envio.save()
+        self.assertCierresAjustados(cierres)
+
+    def test_movimiento_anterior_a_la_historia(self):
+        self.assertIgualSinCierres()
+        _, collar = self.productos
+        EnviosATiendas.objects.create(fecha=date(2023, 11, 15), sku=collar, tienda_bodega=self.tiendas[1], cantidad=2)
+        self.assertEqual(self.cierres()[0], date(2023, 11, 30))
+        self.assertIgualSinCierres()
+
+    def test_tienda_nueva_reconstruye_todo(self):
+        self.assertIgualSinCierres()
+        BodegaTienda.objects.create(nombre='Tienda4')
+        self.assertFalse(CierreStockTienda.objects.exists())
+        self.assertIgualSinCierres()
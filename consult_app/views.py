@@ -4,6 +4,8 @@ from django.core.paginator import Paginator
 from .models import ProductoRentable
 from bronz_app.utils import (regenerar_ventas_consulta,poblar_movimientos_unificados_credito,poblar_movimientos_unificados_debito,
     regenerar_resumenes_credito_debito,)
+from bronz_app.coordinador_regeneracion import regenerar_coordinado
+from bronz_app.cubo import movimientos_por_cuenta
 from django.db.models import Value, IntegerField, Case, When
 from django.db.models.functions import Coalesce, Lower, Trim
 import pandas as pd
@@ -40,10 +42,7 @@ def productos_rentables(request):
     ProductoRentable.objects.all().delete()
 
     # Procesos previos (puedes incluir solo los necesarios para el financiero)
-    regenerar_ventas_consulta()
-    poblar_movimientos_unificados_debito()
-    poblar_movimientos_unificados_credito()
-    regenerar_resumenes_credito_debito()
+    regenerar_coordinado()
 
     ventas = VentasConsulta.objects.annotate(
         venta_neta_total_fila=ExpressionWrapper(F('cantidad') * F('venta_neta_iva'), output_field=FloatField()),
@@ -159,14 +158,16 @@ from django.db.models.functions import Coalesce, Lower, Trim
 # MODELOS (ajusta las rutas si fuese necesario)
 from bronz_app.models import Catalogo, EntradaProductos, Ventas
 from .models import (
-    BodegaTienda, EnviosATiendas, InventarioInicialTiendas, AjusteInventarioTienda
+    BodegaTienda, EnviosATiendas, InventarioInicialTiendas, AjusteInventarioTienda, CierreStockTienda
 )
+from .cierres_stock import IDS_RESPALDO, acumulados_al, resolver_ids
+from bronz_app.kits import lista_de_materiales
 
 # --------------------------------------------------------------------------------------
 # CONFIG
 # --------------------------------------------------------------------------------------
-OFICINA_ID_DEF = 1
-BODEGA_ID_DEF  = 5  # Bodega es una tienda más (vende online)
+OFICINA_ID_DEF = IDS_RESPALDO["Oficina"]
+BODEGA_ID_DEF  = IDS_RESPALDO["Bodega"]  # Bodega es una tienda más (vende online)
 
 # --------------------------------------------------------------------------------------
 # HELPERS
@@ -244,66 +245,6 @@ def _sumas_finales(items):
     return tot
 
 
-# ---- AJUSTE PACK: BB0003 -> BB0001 + BB0002 ---------------------------------
-def _ajustar_pack_bb0003(filas, oficina_id, pack_sku="BB0003", sku_a="BB0001", sku_b="BB0002"):
-    """
-    Mueve las ventas del SKU pack (BB0003) hacia BB0001 y BB0002 por tienda
-    y deja las ventas de BB0003 en 0. Ajusta stock_actual y valor_inventario.
-    MUTACIÓN IN-PLACE sobre 'filas'.
-    """
-    idx = {(row["tienda_id"], row["sku"]): row for row in filas}
-
-    for (tid, sku), r3 in list(idx.items()):
-        if sku != pack_sku:
-            continue
-        v3 = int(r3.get("ventas") or 0)
-        if v3 <= 0:
-            continue
-
-        # Asegura filas destino por tienda (si no existen, las crea con ceros)
-        for base_sku in (sku_a, sku_b):
-            if (tid, base_sku) not in idx:
-                row_nueva = {
-                    "tienda_id": tid,
-                    "tienda": r3.get("tienda"),
-                    "sku": base_sku,
-                    "producto": "",
-                    "categoria": r3.get("categoria", ""),
-                    "stock_inicial": 0,
-                    "enviado": 0,
-                    "recibido": 0,
-                    "ventas": 0,
-                    "ajustes": 0,
-                    "stock_actual": 0,
-                    "costo_unitario": _to_decimal_safe(0),
-                    "valor_inventario": _to_decimal_safe(0),
-                }
-                filas.append(row_nueva)
-                idx[(tid, base_sku)] = row_nueva
-
-        r1 = idx[(tid, sku_a)]
-        r2 = idx[(tid, sku_b)]
-
-        # Sumar ventas del pack a ambos SKUs base
-        r1["ventas"] = int(r1.get("ventas") or 0) + v3
-        r2["ventas"] = int(r2.get("ventas") or 0) + v3
-
-        # En tiendas (no Oficina) las ventas descuentan stock; al pack se le revierte
-        if tid != oficina_id:
-            r1["stock_actual"] = int(r1.get("stock_actual") or 0) - v3
-            r2["stock_actual"] = int(r2.get("stock_actual") or 0) - v3
-            r3["stock_actual"] = int(r3.get("stock_actual") or 0) + v3
-
-        # Dejar el pack sin ventas
-        r3["ventas"] = 0
-
-        # Recalcular valores inventario
-        r1["valor_inventario"] = _to_decimal_safe(r1["stock_actual"]) * _to_decimal_safe(r1["costo_unitario"])
-        r2["valor_inventario"] = _to_decimal_safe(r2["stock_actual"]) * _to_decimal_safe(r2["costo_unitario"])
-        r3["valor_inventario"] = _to_decimal_safe(r3["stock_actual"]) * _to_decimal_safe(r3["costo_unitario"])
-
-
-
 # --------------------------------------------------------------------------------------
 # CÁLCULO DE FILAS (DETALLE POR TIENDA/SKU)
 # --------------------------------------------------------------------------------------
@@ -312,84 +253,21 @@ def _calcular_filas(fecha_corte):
     tiendas = list(BodegaTienda.objects.all().values("id", "nombre"))
     tienda_by_id = {t["id"]: t["nombre"] for t in tiendas}
 
-    # Inventario inicial por tienda/sku
-    ini_qs = (
-        InventarioInicialTiendas.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("tienda_id", "sku__sku")
-        .annotate(stock_inicial=Coalesce(Sum("cantidad"), Value(0, output_field=IntegerField())))
-    )
-    inicial = {(r["tienda_id"], r["sku__sku"]): r["stock_inicial"] for r in ini_qs}
-
-    # Envíos desde Oficina a tiendas => recibido por tienda
-    envios_qs = (
-        EnviosATiendas.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("tienda_bodega_id", "sku__sku")
-        .annotate(recibido=Coalesce(Sum("cantidad"), Value(0, output_field=IntegerField())))
-    )
-    recibido_por_tienda = {(r["tienda_bodega_id"], r["sku__sku"]): r["recibido"] for r in envios_qs}
-
-    # Total Enviado por Oficina (para fila de Oficina)
-    enviados_oficina_qs = (
-        EnviosATiendas.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("sku__sku")
-        .annotate(enviado=Coalesce(Sum("cantidad"), Value(0, output_field=IntegerField())))
-    )
-    enviado_oficina_por_sku = {r["sku__sku"]: r["enviado"] for r in enviados_oficina_qs}
-
-    # Entradas en Oficina (recibido_oficina)
-    entradas_oficina_qs = (
-        EntradaProductos.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("sku__sku")
-        .annotate(entradas=Coalesce(Sum("cantidad_ingresada"), Value(0, output_field=IntegerField())))
-    )
-    recibido_oficina_por_sku = {r["sku__sku"]: r["entradas"] for r in entradas_oficina_qs}
-
-    # Resolver IDs por nombre (con fallback)
-    nombres_ref = ["Oficina", "Falabella", "Tienda3", "Tienda4", "Bodega", "Otro"]
-    tienda_id_map = {
-        n: BodegaTienda.objects.filter(nombre__iexact=n).values_list("id", flat=True).first()
-        for n in nombres_ref
-    }
-    OFICINA_ID   = tienda_id_map.get("Oficina")   or OFICINA_ID_DEF
-    FALABELLA_ID = tienda_id_map.get("Falabella") or 2
-    TIENDA3_ID   = tienda_id_map.get("Tienda3")   or 3
-    TIENDA4_ID   = tienda_id_map.get("Tienda4")   or 4
-    BODEGA_ID    = tienda_id_map.get("Bodega")    or BODEGA_ID_DEF
-    OTRO_ID      = tienda_id_map.get("Otro")      or 6
-
-    # Ventas por tienda (clasificación por 'comprador')
-    ventas_qs = (
-        Ventas.objects
-        .filter(fecha__lte=fecha_corte)
-        .annotate(comp_norm=Lower(Trim("comprador")))
-        .annotate(
-            tienda_id=Case(
-                When(comprador__isnull=True, then=Value(BODEGA_ID)),
-                When(comp_norm__in=["", "nan", "shopify", "uber eats", "ubereats", "mercado libre"], then=Value(BODEGA_ID)),
-                When(Q(comp_norm__contains="falabella"), then=Value(FALABELLA_ID)),
-                When(comp_norm="tienda3", then=Value(TIENDA3_ID)),
-                When(comp_norm="tienda4", then=Value(TIENDA4_ID)),
-                default=Value(OTRO_ID),
-                output_field=IntegerField(),
-            )
-        )
-        .values("tienda_id", "sku__sku")
-        .annotate(ventas=Coalesce(Sum("cantidad"), Value(0, output_field=IntegerField())))
-    )
-    ventas_por_tienda = {(r["tienda_id"], r["sku__sku"]): r["ventas"] for r in ventas_qs}
-
-    # Ajustes por tienda
-    ajustes_qs = (
-        AjusteInventarioTienda.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("tienda_id", "sku__sku")
-        .annotate(ajustes=Coalesce(Sum("cantidad"), Value(0, output_field=IntegerField())))
-    )
-    ajustes_por_tienda = {(r["tienda_id"], r["sku__sku"]): r["ajustes"] for r in ajustes_qs}
+    # Resolver IDs por nombre (con fallback) desde la lista ya leída
+    tienda_id_map = resolver_ids(tiendas)
+    OFICINA_ID = tienda_id_map["Oficina"]
+    BODEGA_ID  = tienda_id_map["Bodega"]
+
+    # Acumulados desde el inicio: último cierre mensual + movimientos del mes en curso.
+    # Ventas por tienda según 'comprador'; envíos y entradas de Oficina van al ID de Oficina.
+    acumulados = acumulados_al(fecha_corte, tienda_id_map)
+    inicial = acumulados[CierreStockTienda.INICIAL]
+    recibido_por_tienda = acumulados[CierreStockTienda.RECIBIDO]
+    ventas_por_tienda = acumulados[CierreStockTienda.VENTAS]
+    ajustes_por_tienda = acumulados[CierreStockTienda.AJUSTES]
+    consumo_por_tienda = acumulados[CierreStockTienda.CONSUMO]  # componentes consumidos por ventas de kits
+    enviado_oficina_por_sku = {sku: c for (_tid, sku), c in acumulados[CierreStockTienda.ENVIADO].items()}
+    recibido_oficina_por_sku = {sku: c for (_tid, sku), c in acumulados[CierreStockTienda.ENTRADAS].items()}
 
     # Universo de claves (tienda, sku)
     claves = set()
@@ -397,11 +275,15 @@ def _calcular_filas(fecha_corte):
     claves.update(recibido_por_tienda.keys())
     claves.update(ventas_por_tienda.keys())
     claves.update(ajustes_por_tienda.keys())
+    claves.update(consumo_por_tienda.keys())
 
     # Asegurar fila de Oficina para cualquier SKU con envíos/entradas
     for sku in set(enviado_oficina_por_sku.keys()).union(recibido_oficina_por_sku.keys()):
         claves.add((OFICINA_ID, sku))
 
+    # Kits sin stock propio: sus ventas pasan a los componentes (lista de materiales)
+    sin_stock_propio = {sku for sku, (descuenta, _) in lista_de_materiales().items() if not descuenta}
+
     # Info de producto
     todos_skus = sorted({sku for (_tid, sku) in claves})
     info_prod = {
@@ -416,7 +298,8 @@ def _calcular_filas(fecha_corte):
     for (tid, sku) in sorted(claves, key=lambda x: (x[0], x[1])):
         es_oficina = (tid == OFICINA_ID)
         stock_inicial = int(inicial.get((tid, sku), 0))
-        ventas = int(ventas_por_tienda.get((tid, sku), 0))
+        ventas = 0 if sku in sin_stock_propio else int(ventas_por_tienda.get((tid, sku), 0))
+        ventas += int(consumo_por_tienda.get((tid, sku), 0))
         ajustes = int(ajustes_por_tienda.get((tid, sku), 0))
 
         if es_oficina:
@@ -451,6 +334,10 @@ def _calcular_filas(fecha_corte):
     # Devolver filas, tiendas y IDs reales (para la plantilla)
     return filas, tiendas, {"OFICINA_ID": OFICINA_ID, "BODEGA_ID": BODEGA_ID}
 
+def _entradas_oficina(filas, oficina_id):
+    """Entradas de productos por SKU: ya acumuladas como 'recibido' en las filas de Oficina."""
+    return {f["sku"]: f["recibido"] for f in filas if f["tienda_id"] == oficina_id}
+
 # --------------------------------------------------------------------------------------
 # VIEW PRINCIPAL
 # --------------------------------------------------------------------------------------
@@ -488,17 +375,8 @@ def informe_inventario_tiendas(request):
         filas, tiendas = res
         ids = {"OFICINA_ID": OFICINA_ID_DEF, "BODEGA_ID": BODEGA_ID_DEF}
 
-    # 2) Ajuste del pack (antes del consolidado y de los totales)
-    _ajustar_pack_bb0003(filas, ids["OFICINA_ID"])
-
-    # 3) Consolidado por SKU (Recibido = entradas de productos)
-    entradas_qs = (
-        EntradaProductos.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("sku__sku")
-        .annotate(entradas=Coalesce(Sum("cantidad_ingresada"), Value(0, output_field=IntegerField())))
-    )
-    entradas_por_sku = {r["sku__sku"]: r["entradas"] for r in entradas_qs}
+    # 2) Consolidado por SKU (Recibido = entradas de productos)
+    entradas_por_sku = _entradas_oficina(filas, ids["OFICINA_ID"])
 
     consolidado_map = {}
     for f in filas:
@@ -528,11 +406,11 @@ def informe_inventario_tiendas(request):
 
     consolidado = sorted(consolidado_map.values(), key=lambda x: x["sku"])
 
-    # 4) Totales (deterministas)
+    # 3) Totales (deterministas)
     totales_detalle     = _sumas_finales(filas)
     totales_consolidado = _sumas_finales(consolidado)
 
-    # 5) Completar context (una sola vez)
+    # 4) Completar context (una sola vez)
     context.update({
         "OFICINA_ID": ids["OFICINA_ID"],
         "BODEGA_ID":  ids["BODEGA_ID"],
@@ -549,7 +427,7 @@ def informe_inventario_tiendas(request):
         "total_consol_valor":  totales_consolidado["valor_inventario"],
     })
 
-    # 6) Render
+    # 5) Render
     return render(request, "consult_app/inventario_tiendas.html", context)
 
 
@@ -561,19 +439,10 @@ def exportar_inventario_tiendas_excel(request):
     from openpyxl.utils import get_column_letter
 
     fecha_corte = _parse_fecha_corte(request)
-    filas, *_ = _calcular_filas(fecha_corte)  # toma solo 'filas'
-
-    # --- AJUSTE FINAL PACK BB0003 ---
-    _ajustar_pack_bb0003(filas, ids["OFICINA_ID"])
+    filas, _tiendas, ids = _calcular_filas(fecha_corte)
 
     # Consolidado por SKU (Entradas de productos)
-    entradas_qs = (
-        EntradaProductos.objects
-        .filter(fecha__lte=fecha_corte)
-        .values("sku__sku")
-        .annotate(entradas=Coalesce(Sum("cantidad_ingresada"), Value(0, output_field=IntegerField())))
-    )
-    entradas_por_sku = {r["sku__sku"]: r["entradas"] for r in entradas_qs}
+    entradas_por_sku = _entradas_oficina(filas, ids["OFICINA_ID"])
 
     consolidado_map = {}
     for f in filas:
@@ -771,10 +640,7 @@ from datetime import date
 
 def parse_fecha_es(fecha_str: str):
 
-    regenerar_ventas_consulta()
-    poblar_movimientos_unificados_debito()
-    poblar_movimientos_unificados_credito()
-    regenerar_resumenes_credito_debito()
+    regenerar_coordinado()
 
    
     if not fecha_str:
@@ -1091,10 +957,7 @@ def movimientos_cuenta_endpoint(request):
     En otro caso, delega a movimientos_cuenta_view.
     FILTRADO POR AÑO FISCAL seleccionado en el panel.
     """
-    regenerar_ventas_consulta()
-    poblar_movimientos_unificados_debito()
-    poblar_movimientos_unificados_credito()
-    regenerar_resumenes_credito_debito()
+    regenerar_coordinado()
 
     if (request.GET.get("export") or "").lower() != "excel":
         return movimientos_cuenta_view(request)
@@ -1258,13 +1121,7 @@ from django.db.models import Sum, Count
 
 def movimientos_por_rango_view(request):
 
-    regenerar_ventas_consulta()
-    poblar_movimientos_unificados_debito()
-    poblar_movimientos_unificados_credito()
-    regenerar_resumenes_credito_debito()
-    
-    DebitoModel  = apps.get_model('bronz_app', 'MovimientoUnificadoDebito')
-    CreditoModel = apps.get_model('bronz_app', 'MovimientoUnificadoCredito')
+    regenerar_coordinado()
 
     desde_raw = (request.GET.get("desde") or "").strip()
     hasta_raw = (request.GET.get("hasta") or "").strip()
@@ -1293,45 +1150,8 @@ def movimientos_por_rango_view(request):
     total_creditos = 0
 
     if desde and hasta and not error_msg:
-        # Agregaciones por cuenta en el rango
-        deb_agg = (DebitoModel.objects
-                .filter(fecha__gte=desde, fecha__lte=hasta)
-                .values("cta_debito")
-                .annotate(total_debito=Sum("monto_debito"),
-                    n_debito=Count("id"))
-                .order_by())
-        cred_agg = (CreditoModel.objects
-                    .filter(fecha__gte=desde, fecha__lte=hasta)
-                    .values("cta_credito")
-                    .annotate(total_credito=Sum("monto_credito"),
-                    n_credito=Count("id"))
-                    .order_by())
-
-        # Merge por cuenta
-        index = {}
-        for d in deb_agg:
-            cta = d["cta_debito"]
-            index[cta] = {
-                "cuenta": cta,
-                "total_debito": d["total_debito"] or 0,
-                "n_debito": d["n_debito"] or 0,
-                "total_credito": 0,
-                "n_credito": 0,
-            }
-        for c in cred_agg:
-            cta = c["cta_credito"]
-            item = index.get(cta)
-            if not item:
-                item = {
-                    "cuenta": cta,
-                    "total_debito": 0,
-                    "n_debito": 0,
-                    "total_credito": 0,
-                    "n_credito": 0,
-                }
-                index[cta] = item
-            item["total_credito"] += c["total_credito"] or 0
-            item["n_credito"] += c["n_credito"] or 0
+        # Totales por cuenta en el rango (cubo cuenta × mes si son meses completos)
+        index = {item["cuenta"]: item for item in movimientos_por_cuenta(desde, hasta)}
 
         # Construye filas y totales globales
         for cta, item in index.items():
@@ -1365,9 +1185,6 @@ def movimientos_por_rango_view(request):
 # Exportar a Excel
 
 def exportar_movimientos_rango_excel(request):
-    DebitoModel  = apps.get_model('bronz_app', 'MovimientoUnificadoDebito')
-    CreditoModel = apps.get_model('bronz_app', 'MovimientoUnificadoCredito')
-
     desde_raw = (request.GET.get("desde") or "").strip()
     hasta_raw = (request.GET.get("hasta") or "").strip()
     desde = parse_fecha_es(desde_raw) if desde_raw else None
@@ -1380,43 +1197,7 @@ def exportar_movimientos_rango_excel(request):
     total_creditos = 0
 
     if desde and hasta:
-        deb_agg = (DebitoModel.objects
-                   .filter(fecha__gte=desde, fecha__lte=hasta)
-                   .values("cta_debito")
-                   .annotate(total_debito=Sum("monto_debito"),
-                             n_debito=Count("id"))
-                   .order_by())
-        cred_agg = (CreditoModel.objects
-                    .filter(fecha__gte=desde, fecha__lte=hasta)
-                    .values("cta_credito")
-                    .annotate(total_credito=Sum("monto_credito"),
-                              n_credito=Count("id"))
-                    .order_by())
-
-        index = {}
-        for d in deb_agg:
-            cta = d["cta_debito"]
-            index[cta] = {
-                "cuenta": cta,
-                "total_debito": d["total_debito"] or 0,
-                "n_debito": d["n_debito"] or 0,
-                "total_credito": 0,
-                "n_credito": 0,
-            }
-        for c in cred_agg:
-            cta = c["cta_credito"]
-            item = index.get(cta)
-            if not item:
-                item = {
-                    "cuenta": cta,
-                    "total_debito": 0,
-                    "n_debito": 0,
-                    "total_credito": 0,
-                    "n_credito": 0,
-                }
-                index[cta] = item
-            item["total_credito"] += c["total_credito"] or 0
-            item["n_credito"] += c["n_credito"] or 0
+        index = {item["cuenta"]: item for item in movimientos_por_cuenta(desde, hasta)}
 
         for cta, item in index.items():
             saldo = (item["total_debito"] or 0) - (item["total_credito"] or 0)
@@ -1476,10 +1257,7 @@ from .utils.comparativa import generar_comparativa
 
 def comparativa_ventas(request):
 
-    regenerar_ventas_consulta()
-    poblar_movimientos_unificados_debito()
-    poblar_movimientos_unificados_credito()
-    regenerar_resumenes_credito_debito()
+    regenerar_coordinado()
 
     anio_actual = int(request.GET.get('anio', datetime.now().year))
     datos = generar_comparativa(anio_actual)